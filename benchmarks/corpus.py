@@ -0,0 +1,322 @@
+# -*- coding: utf-8 -*-
+
+"""Generator for synthetic e-mails used by the benchmarks.
+
+Each generator returns the raw bytes of an e-mail stressing a particular part of the parser.
+The output only depends on the given seed, thus benchmark results are comparable between runs.
+
+The corpus can also be written to disk, e.g. for profiling with other tools::
+
+    python -m benchmarks.corpus /tmp/corpus
+"""
+
+from __future__ import annotations
+
+import argparse
+import email.encoders
+import email.header
+import email.mime.application
+import email.mime.base
+import email.mime.message
+import email.mime.multipart
+import email.mime.text
+import email.utils
+import os
+import random
+import typing
+
+# The largest of the sample e-mails, see scale_sample().
+SAMPLE_LARGE = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'samples', 'sample_large.eml')
+
+_WORDS = ('lorem', 'ipsum', 'dolor', 'sit', 'amet', 'invoice', 'payment', 'account', 'update', 'please', 'review',
+          'the', 'attached', 'document', 'before', 'friday', 'regards', 'meeting', 'report', 'quarterly')
+_TLDS = ('com', 'org', 'net', 'lu', 'de', 'fr', 'io', 'co.uk')
+_MAILERS = ('postfix', 'Microsoft SMTP Server', 'Exim 4.92', 'sendmail 8.15.2')
+
+# Texts and charsets for e-mails using non UTF-8 encodings.
+_CHARSET_TEXTS = (('iso-2022-jp', 'こんにちは、請求書を添付します。ご確認ください。'),
+                  ('koi8-r', 'Здравствуйте, счёт во вложении. Пожалуйста, проверьте.'),
+                  ('windows-1252', 'Grüße, anbei die Rechnung für März – bitte prüfen.'),
+                  ('gb2312', '您好，附件是发票，请查收。'),
+                  ('iso-8859-7', 'Γεια σας, επισυνάπτεται το τιμολόγιο.'),
+                  ('big5', '您好，附件是發票，請查收。'),
+                  )
+
+
+def _domain(rnd: random.Random) -> str:
+    return '{}{}.{}'.format(rnd.choice(_WORDS), rnd.randint(1, 999), rnd.choice(_TLDS))
+
+
+def _address(rnd: random.Random) -> str:
+    return '{}.{}@{}'.format(rnd.choice(_WORDS), rnd.choice(_WORDS), _domain(rnd))
+
+
+def _ip(rnd: random.Random) -> str:
+    return '{}.{}.{}.{}'.format(rnd.randint(1, 223), rnd.randint(0, 255), rnd.randint(0, 255), rnd.randint(1, 254))
+
+
+def _date(rnd: random.Random) -> str:
+    return email.utils.formatdate(rnd.randint(1262304000, 1735689600), localtime=False)
+
+
+def _random_bytes(rnd: random.Random, size: int) -> bytes:
+    return rnd.getrandbits(size * 8).to_bytes(size, 'little')
+
+
+def _text(rnd: random.Random, words: int) -> str:
+    return ' '.join(rnd.choice(_WORDS) for _ in range(words))
+
+
+def _received(rnd: random.Random) -> str:
+    """Return a received header value, in one of the typical formats."""
+    src = _domain(rnd)
+    by = _domain(rnd)
+    kind = rnd.randrange(4)
+
+    if kind == 0:
+        return 'from {} ({} [{}]) by {} ({}) with ESMTPS id {:X} for <{}>; {}'.format(
+            src, src, _ip(rnd), by, rnd.choice(_MAILERS), rnd.getrandbits(40), _address(rnd), _date(rnd))
+    if kind == 1:
+        return 'from {} (HELO {}) ({}) by {} with SMTP; {}'.format(src, src, _ip(rnd), by, _date(rnd))
+    if kind == 2:
+        return 'by {} (Postfix, from userid {}) id {:X}; {}'.format(by, rnd.randint(0, 1000), rnd.getrandbits(40), _date(rnd))
+
+    return 'from [{}] (port={} helo=[{}]) by {} with esmtpsa (TLS1.2) tls TLS_ECDHE_RSA_WITH_AES_256_GCM_SHA384 (Exim 4.92) (envelope-from <{}>) id 1{:X}; {}'.format(
+        _ip(rnd), rnd.randint(1024, 65535), _ip(rnd), by, _address(rnd), rnd.getrandbits(40), _date(rnd))
+
+
+def _multipart(rnd: random.Random, subtype: str) -> email.mime.multipart.MIMEMultipart:
+    # the boundary is generated explicitly, as the default one is random
+    return email.mime.multipart.MIMEMultipart(subtype, boundary='=============={:020d}=='.format(rnd.getrandbits(63)))
+
+
+def _set_headers(msg: email.message.Message, rnd: random.Random, hops: int = 3) -> None:
+    for _ in range(hops):
+        msg['Received'] = _received(rnd)
+
+    msg['From'] = _address(rnd)
+    msg['To'] = ', '.join(_address(rnd) for _ in range(rnd.randint(1, 3)))
+    msg['Subject'] = _text(rnd, 6)
+    msg['Date'] = _date(rnd)
+    msg['Message-ID'] = '<{:x}@{}>'.format(rnd.getrandbits(64), _domain(rnd))
+
+
+def _html(rnd: random.Random, size: int) -> str:
+    """Return an HTML document of about *size* characters, full of links, addresses and IPs."""
+    parts = ['<html><head><title>{}</title></head><body>\n'.format(_text(rnd, 4))]
+    length = len(parts[0])
+
+    while length < size:
+        kind = rnd.randrange(5)
+
+        if kind == 0:
+            chunk = '<a href="https://{}/{}/{}?id={}">{}</a>\n'.format(_domain(rnd), rnd.choice(_WORDS), rnd.choice(_WORDS), rnd.getrandbits(32), _text(rnd, 3))
+        elif kind == 1:
+            chunk = '<img src="http://{}/img/{}.png" alt="{}">\n'.format(_domain(rnd), rnd.getrandbits(24), rnd.choice(_WORDS))
+        elif kind == 2:
+            chunk = '<p>Contact {} or visit {} ({}).</p>\n'.format(_address(rnd), _domain(rnd), _ip(rnd))
+        else:
+            chunk = '<p>{}</p>\n'.format(_text(rnd, 30))
+
+        parts.append(chunk)
+        length += len(chunk)
+
+    parts.append('</body></html>\n')
+
+    return ''.join(parts)
+
+
+def _attachment(rnd: random.Random, size: int, index: int) -> email.mime.base.MIMEBase:
+    kind = rnd.randrange(3)
+
+    if kind == 0:
+        data = b'%PDF-1.5\n' + _random_bytes(rnd, size)
+        part = email.mime.application.MIMEApplication(data, 'pdf')
+        filename = 'document_{}.pdf'.format(index)
+    elif kind == 1:
+        data = b'\x89PNG\r\n\x1a\n' + _random_bytes(rnd, size)
+        part = email.mime.base.MIMEBase('image', 'png')
+        part.set_payload(data)
+        email.encoders.encode_base64(part)
+        filename = 'image_{}.png'.format(index)
+    else:
+        data = _text(rnd, size // 6).encode('ascii')
+        part = email.mime.text.MIMEText(data.decode('ascii'), 'plain', 'us-ascii')
+        filename = 'notes_{}.txt'.format(index)
+
+    part.add_header('Content-Disposition', 'attachment', filename=filename)
+
+    return part
+
+
+def many_hops(seed: int = 0, hops: int = 60) -> bytes:
+    """E-mail with a long chain of received headers."""
+    rnd = random.Random(seed)
+    msg = email.mime.text.MIMEText(_text(rnd, 200), 'plain', 'us-ascii')
+    _set_headers(msg, rnd, hops=hops)
+
+    return msg.as_bytes()
+
+
+def large_html(seed: int = 0, size: int = 2 * 1024 * 1024) -> bytes:
+    """E-mail with a large HTML body full of URLs, next to a plain text alternative."""
+    rnd = random.Random(seed)
+    msg = _multipart(rnd, 'alternative')
+    _set_headers(msg, rnd)
+    msg.attach(email.mime.text.MIMEText(_text(rnd, 300), 'plain', 'us-ascii'))
+    msg.attach(email.mime.text.MIMEText(_html(rnd, size), 'html', 'utf-8'))
+
+    return msg.as_bytes()
+
+
+def deep_multipart(seed: int = 0, depth: int = 40) -> bytes:
+    """E-mail with deeply nested multipart containers, each holding a text part."""
+    rnd = random.Random(seed)
+    msg = _multipart(rnd, 'mixed')
+    _set_headers(msg, rnd)
+
+    current = msg
+    for _ in range(depth):
+        current.attach(email.mime.text.MIMEText(_text(rnd, 50), 'plain', 'us-ascii'))
+        child = _multipart(rnd, rnd.choice(('mixed', 'alternative', 'related')))
+        current.attach(child)
+        current = child
+
+    current.attach(_attachment(rnd, 4096, 0))
+
+    return msg.as_bytes()
+
+
+def many_attachments(seed: int = 0, count: int = 200, size: int = 16 * 1024) -> bytes:
+    """E-mail with many attachments of different types."""
+    rnd = random.Random(seed)
+    msg = _multipart(rnd, 'mixed')
+    _set_headers(msg, rnd)
+    msg.attach(email.mime.text.MIMEText(_text(rnd, 100), 'plain', 'us-ascii'))
+
+    for index in range(count):
+        msg.attach(_attachment(rnd, size, index))
+
+    return msg.as_bytes()
+
+
+def nested_rfc822(seed: int = 0, depth: int = 10) -> bytes:
+    """E-mail forwarding an e-mail as attachment, which itself forwards an e-mail, and so on."""
+    rnd = random.Random(seed)
+    inner: email.message.Message = email.mime.text.MIMEText(_text(rnd, 100), 'plain', 'us-ascii')
+    _set_headers(inner, rnd)
+
+    for _ in range(depth):
+        outer = _multipart(rnd, 'mixed')
+        _set_headers(outer, rnd)
+        outer.attach(email.mime.text.MIMEText('Forwarded: {}'.format(_text(rnd, 30)), 'plain', 'us-ascii'))
+        outer.attach(_attachment(rnd, 2048, 0))
+        outer.attach(email.mime.message.MIMEMessage(inner))
+        inner = outer
+
+    return inner.as_bytes()
+
+
+def odd_charsets(seed: int = 0, repeat: int = 200) -> bytes:
+    """E-mail with encoded-word headers and bodies in various legacy charsets."""
+    rnd = random.Random(seed)
+    msg = _multipart(rnd, 'mixed')
+    _set_headers(msg, rnd)
+
+    charset, text = rnd.choice(_CHARSET_TEXTS)
+    del msg['Subject']
+    msg['Subject'] = email.header.Header(text, charset)
+
+    for charset, text in _CHARSET_TEXTS:
+        msg.attach(email.mime.text.MIMEText('\n'.join([text] * repeat), 'plain', charset))
+
+    return msg.as_bytes()
+
+
+def large_attachment(seed: int = 0, size: int = 8 * 1024 * 1024) -> bytes:
+    """E-mail with a single large binary attachment."""
+    rnd = random.Random(seed)
+    msg = _multipart(rnd, 'mixed')
+    _set_headers(msg, rnd)
+    msg.attach(email.mime.text.MIMEText(_text(rnd, 100), 'plain', 'us-ascii'))
+
+    part = email.mime.application.MIMEApplication(b'PK\x03\x04' + _random_bytes(rnd, size), 'zip')
+    part.add_header('Content-Disposition', 'attachment', filename='archive.zip')
+    msg.attach(part)
+
+    return msg.as_bytes()
+
+
+def scale_sample(path: str = SAMPLE_LARGE, size: int = 32 * 1024 * 1024) -> bytes:
+    """Return an e-mail from disk with its largest attachment repeated until the e-mail has about *size* bytes.
+
+    The other parts of the e-mail are kept, the result is at least as large as the original e-mail.
+
+    Args:
+        path (str, optional): Path to the e-mail. Default: samples/sample_large.eml.
+        size (int, optional): Approximate size of the returned e-mail. Default: 32 MiB.
+
+    Returns:
+        bytes: The raw scaled e-mail.
+    """
+    with open(path, 'rb') as fp:
+        msg = email.message_from_bytes(fp.read())
+
+    part = max((x for x in msg.walk() if x.get_filename()), key=lambda x: len(x.get_payload()))
+    data = part.get_payload(decode=True)
+
+    # base64 grows the data by a third
+    length = max(len(data), size * 3 // 4)
+    data = (data * (length // len(data) + 1))[:length]
+
+    del part['Content-Transfer-Encoding']
+    part.set_payload(data)
+    email.encoders.encode_base64(part)
+
+    return msg.as_bytes()
+
+
+# Name and generator of all kinds of e-mails in the corpus.
+GENERATORS: typing.Dict[str, typing.Callable[..., bytes]] = {
+    'many_hops': many_hops,
+    'large_html': large_html,
+    'deep_multipart': deep_multipart,
+    'many_attachments': many_attachments,
+    'nested_rfc822': nested_rfc822,
+    'odd_charsets': odd_charsets,
+    'large_attachment': large_attachment,
+}
+
+
+def generate(seed: int = 0) -> typing.Dict[str, bytes]:
+    """Generate one e-mail of each kind.
+
+    Args:
+        seed (int, optional): Seed of the random generator. Default: 0.
+
+    Returns:
+        dict: A dict with as key the name of the kind and value the raw e-mail.
+    """
+    return {name: func(seed) for name, func in GENERATORS.items()}
+
+
+def main() -> None:
+    """Write the corpus to a directory."""
+    parser = argparse.ArgumentParser(description='Write the synthetic benchmark corpus to a directory.')
+    parser.add_argument('outdir', help='Directory the e-mails are written to.')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the random generator.')
+    options = parser.parse_args()
+
+    os.makedirs(options.outdir, exist_ok=True)
+
+    for name, raw in generate(options.seed).items():
+        path = os.path.join(options.outdir, '{}.eml'.format(name))
+
+        with open(path, 'wb') as fp:
+            fp.write(raw)
+
+        print('{}: {} bytes'.format(path, len(raw)))
+
+
+if __name__ == '__main__':
+    main()
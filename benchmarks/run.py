@@ -0,0 +1,341 @@
+# -*- coding: utf-8 -*-
+
+"""Run the eml_parser benchmarks on the synthetic corpus, see benchmarks/corpus.py.
+
+Every scenario is run *--repeat* times after a warm-up run; the caches of eml_parser are
+cleared before every run. The throughput is reported based on the median run, the peak
+memory usage is measured with tracemalloc in a separate run.
+
+Besides parsing each e-mail of the corpus from bytes, the corpus and a copy of
+samples/sample_large.eml scaled to *--large-size* MiB are written to a temporary directory for benchmarking the memory-mapped
+file path of ``EmlParser.decode_email()`` and the batch API ``EmlParser.decode_many()``, both
+in-process and in a pool of worker processes. Note that tracemalloc neither sees the pages of
+memory-mapped files nor the memory of worker processes.
+
+Results are written as JSON and can be compared to the results of a previous run, e.g.
+of the last release, failing with exit code 1 if a scenario got slower or uses more memory::
+
+    python -m benchmarks.run --output baseline.json
+    # ... apply changes ...
+    python -m benchmarks.run --output current.json --compare baseline.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import datetime
+import email
+import email.policy
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+import typing
+
+import eml_parser
+import eml_parser.decode
+import eml_parser.routing
+from benchmarks import corpus
+
+# Version of the format of the results file.
+RESULTS_VERSION = 1
+
+# Number of worker processes used by the decode_many.pool scenario.
+DECODE_MANY_WORKERS = 4
+
+
+class Scenario:
+    """A benchmark scenario, calling *func* once for every item."""
+
+    def __init__(self, name: str, func: typing.Callable[[typing.Any], typing.Any], items: typing.Sequence[typing.Any], size: int) -> None:
+        """Initialisation.
+
+        Args:
+            name (str): Name of the scenario.
+            func (callable): The function to benchmark, called with each item.
+            items (sequence): The items to process in each run.
+            size (int): Total number of bytes of the items, used for calculating the throughput in MB/s.
+        """
+        self.name = name
+        self.func = func
+        self.items = items
+        self.size = size
+
+    def run(self) -> float:
+        """Process all items once, returning the elapsed time in seconds."""
+        _clear_caches()
+        func = self.func
+
+        start = time.perf_counter()
+        for item in self.items:
+            func(item)
+
+        return time.perf_counter() - start
+
+    def peak_memory(self) -> int:
+        """Process all items once, returning the peak memory allocated in bytes."""
+        _clear_caches()
+
+        tracemalloc.start()
+        try:
+            for item in self.items:
+                self.func(item)
+
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+
+def _clear_caches() -> None:
+    eml_parser.decode.charset_cache.clear()
+    eml_parser.decode.date_cache.clear()
+
+
+def _decode_email_bytes(raw: bytes) -> dict:
+    # a new instance is used for every e-mail, thus the routing cache is not shared between e-mails
+    return eml_parser.EmlParser().decode_email_bytes(raw)
+
+
+def _decode_email(path: str) -> dict:
+    return eml_parser.EmlParser().decode_email(path)
+
+
+def _decode_email_file_bytes(path: str) -> dict:
+    # reading the whole file and parsing the bytes, for comparison with the memory-mapped decode_email()
+    with open(path, 'rb') as fp:
+        return eml_parser.EmlParser().decode_email_bytes(fp.read())
+
+
+def _decode_many(paths: typing.Sequence[str], workers: int) -> None:
+    for _, result in eml_parser.EmlParser().decode_many(paths, workers=workers):
+        if isinstance(result, Exception):
+            raise result
+
+
+def _decode_many_serial(paths: typing.Sequence[str]) -> None:
+    _decode_many(paths, 1)
+
+
+def _decode_many_pool(paths: typing.Sequence[str]) -> None:
+    _decode_many(paths, DECODE_MANY_WORKERS)
+
+
+def _write(path: str, raw: bytes) -> str:
+    with open(path, 'wb') as fp:
+        fp.write(raw)
+
+    return path
+
+
+def _decode_string(item: typing.Tuple[bytes, typing.Optional[str]]) -> str:
+    return eml_parser.decode.decode_string(*item)
+
+
+def build_scenarios(seed: int = 0, workdir: typing.Optional[str] = None, large_size: int = 32 * 1024 * 1024) -> typing.List[Scenario]:
+    """Create all scenarios based on the corpus generated using *seed*.
+
+    Args:
+        seed (int, optional): Seed of the corpus generator. Default: 0.
+        workdir (str, optional): Directory the e-mails are written to for the scenarios parsing files.
+                                 These scenarios are skipped if not given.
+        large_size (int, optional): Size in bytes samples/sample_large.eml is scaled to. Default: 32 MiB.
+
+    Returns:
+        list: The scenarios.
+    """
+    messages = corpus.generate(seed)
+    scenarios = [Scenario('decode_email_bytes.{}'.format(name), _decode_email_bytes, [raw], len(raw)) for name, raw in messages.items()]
+
+    if workdir is not None:
+        raw = corpus.scale_sample(size=large_size)
+        path = _write(os.path.join(workdir, 'sample_large_scaled.eml'), raw)
+        del raw
+        scenarios.append(Scenario('decode_email.sample_large_scaled', _decode_email, [path], os.path.getsize(path)))
+        scenarios.append(Scenario('decode_email_file_bytes.sample_large_scaled', _decode_email_file_bytes, [path], os.path.getsize(path)))
+
+        paths = [_write(os.path.join(workdir, '{}.eml'.format(name)), raw) for name, raw in messages.items()]
+        path = paths[list(messages).index('large_attachment')]
+        scenarios.append(Scenario('decode_email.large_attachment', _decode_email, [path], os.path.getsize(path)))
+
+        size = sum(os.path.getsize(x) for x in paths)
+        scenarios.append(Scenario('decode_many.serial', _decode_many_serial, [paths], size))
+        scenarios.append(Scenario('decode_many.pool', _decode_many_pool, [paths], size))
+
+    parsed = [email.message_from_bytes(raw, policy=email.policy.default) for raw in messages.values()]
+
+    received = [str(line) for msg in parsed for part in msg.walk() for line in part.get_all('received', [])]
+    scenarios.append(Scenario('parserouting', eml_parser.routing.parserouting, received, sum(len(x) for x in received)))
+
+    # each payload is decoded once using its declared charset and once using charset detection
+    payloads = [(part.get_payload(decode=True), part.get_content_charset()) for msg in parsed for part in msg.walk() if part.get_content_maintype() == 'text']
+    payloads += [(payload, None) for payload, _ in payloads]
+    scenarios.append(Scenario('decode_string', _decode_string, payloads, sum(len(x[0]) for x in payloads)))
+
+    attachments = [part.get_payload(decode=True) for part in parsed[list(messages).index('many_attachments')].walk() if part.get_filename()]
+    scenarios.append(Scenario('get_file_hash', eml_parser.EmlParser.get_file_hash, attachments, sum(len(x) for x in attachments)))
+
+    attachments = [part.get_payload(decode=True) for part in parsed[list(messages).index('large_attachment')].walk() if part.get_filename()]
+    scenarios.append(Scenario('get_file_hash.large_attachment', eml_parser.EmlParser.get_file_hash, attachments, sum(len(x) for x in attachments)))
+
+    bodies = [part.get_content() for part in parsed[list(messages).index('large_html')].walk() if part.get_content_maintype() == 'text']
+    scenarios.append(Scenario('body_iocs', eml_parser.EmlParser.get_iocs_ondata, bodies, sum(len(x.encode('utf-8')) for x in bodies)))
+
+    return scenarios
+
+
+def run_scenario(scenario: Scenario, repeat: int = 5, memory: bool = True) -> typing.Dict[str, typing.Any]:
+    """Benchmark a single scenario.
+
+    Args:
+        scenario (Scenario): The scenario to run.
+        repeat (int, optional): Number of timed runs. Default: 5.
+        memory (bool, optional): Measure the peak memory usage in an additional run. Default: True.
+
+    Returns:
+        dict: The results of the scenario.
+    """
+    scenario.run()
+    timings = [scenario.run() for _ in range(repeat)]
+    median = statistics.median(timings)
+
+    result: typing.Dict[str, typing.Any] = {'items': len(scenario.items),
+                                            'bytes': scenario.size,
+                                            'repeat': repeat,
+                                            'min_s': min(timings),
+                                            'median_s': median,
+                                            'items_per_s': len(scenario.items) / median if median else None,
+                                            'mb_per_s': scenario.size / median / 1e6 if median else None,
+                                            }
+
+    if memory:
+        result['peak_memory_bytes'] = scenario.peak_memory()
+
+    return result
+
+
+def run(seed: int = 0,
+        repeat: int = 5,
+        memory: bool = True,
+        only: typing.Optional[typing.Sequence[str]] = None,
+        large_size: int = 32 * 1024 * 1024
+        ) -> typing.Dict[str, typing.Any]:
+    """Run all benchmark scenarios.
+
+    Args:
+        seed (int, optional): Seed of the corpus generator. Default: 0.
+        repeat (int, optional): Number of timed runs per scenario. Default: 5.
+        memory (bool, optional): Measure the peak memory usage of every scenario. Default: True.
+        only (sequence, optional): Only run the scenarios whose name contains one of these strings.
+        large_size (int, optional): Size in bytes samples/sample_large.eml is scaled to. Default: 32 MiB.
+
+    Returns:
+        dict: The results, in the format of the results file.
+    """
+    results = {}
+
+    with tempfile.TemporaryDirectory() as workdir:
+        for scenario in build_scenarios(seed, workdir=workdir, large_size=large_size):
+            if only and not any(x in scenario.name for x in only):
+                continue
+
+            results[scenario.name] = run_scenario(scenario, repeat=repeat, memory=memory)
+
+    return {'version': RESULTS_VERSION,
+            'meta': {'date': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                     'python': platform.python_version(),
+                     'implementation': platform.python_implementation(),
+                     'platform': platform.platform(),
+                     'seed': seed,
+                     'large_size': large_size,
+                     },
+            'results': results,
+            }
+
+
+def compare(current: typing.Dict[str, typing.Any], baseline: typing.Dict[str, typing.Any], threshold: float = 0.1) -> typing.List[str]:
+    """Compare results to those of a baseline run.
+
+    Args:
+        current (dict): The results to check.
+        baseline (dict): The results to compare to.
+        threshold (float, optional): Allowed relative increase of the median time and peak memory usage. Default: 0.1.
+
+    Returns:
+        list: Descriptions of the regressions found, empty if there are none.
+    """
+    regressions = []
+
+    for name, result in current['results'].items():
+        base = baseline['results'].get(name)
+        if base is None:
+            continue
+
+        for key, label in (('median_s', 'time'), ('peak_memory_bytes', 'peak memory')):
+            if not base.get(key) or result.get(key) is None:
+                continue
+
+            ratio = result[key] / base[key]
+            if ratio > 1 + threshold:
+                regressions.append('{}: {} increased by {:.1%}'.format(name, label, ratio - 1))
+
+    return regressions
+
+
+def _format_result(name: str, result: typing.Dict[str, typing.Any], base: typing.Optional[typing.Dict[str, typing.Any]]) -> str:
+    line = '{:<44} {:>10.2f} items/s {:>9.2f} MB/s'.format(name, result['items_per_s'] or 0, result['mb_per_s'] or 0)
+
+    if 'peak_memory_bytes' in result:
+        line += ' {:>9.1f} MiB peak'.format(result['peak_memory_bytes'] / 2 ** 20)
+
+    if base is not None and base.get('median_s'):
+        line += ' {:>+8.1%} time'.format(result['median_s'] / base['median_s'] - 1)
+
+    return line
+
+
+def main() -> int:
+    """Run the benchmarks from the command line."""
+    parser = argparse.ArgumentParser(description='Run the eml_parser benchmarks.')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the corpus generator.')
+    parser.add_argument('--repeat', type=int, default=5, help='Number of timed runs per scenario.')
+    parser.add_argument('--no-memory', action='store_true', help='Do not measure the peak memory usage.')
+    parser.add_argument('--only', action='append', help='Only run scenarios whose name contains this string, may be given multiple times.')
+    parser.add_argument('--large-size', type=int, default=32, help='Size in MiB samples/sample_large.eml is scaled to. Default: 32')
+    parser.add_argument('--output', help='Write the results as JSON to this file.')
+    parser.add_argument('--compare', help='Compare the results to those in this file, exiting with 1 on regressions.')
+    parser.add_argument('--threshold', type=float, default=0.1, help='Allowed relative increase of time and memory when comparing. Default: 0.1')
+    options = parser.parse_args()
+
+    baseline = None
+    if options.compare:
+        with open(options.compare, 'r', encoding='utf-8') as fp:
+            baseline = json.load(fp)
+
+    results = run(seed=options.seed, repeat=options.repeat, memory=not options.no_memory, only=options.only,
+                  large_size=options.large_size * 2 ** 20)
+
+    for name, result in results['results'].items():
+        print(_format_result(name, result, baseline['results'].get(name) if baseline else None))
+
+    if options.output:
+        with open(options.output, 'w', encoding='utf-8') as fp:
+            json.dump(results, fp, indent=2, sort_keys=True)
+
+    if baseline is not None:
+        regressions = compare(results, baseline, options.threshold)
+
+        for regression in regressions:
+            print('REGRESSION {}'.format(regression))
+
+        if regressions:
+            return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
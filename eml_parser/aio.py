@@ -0,0 +1,266 @@
+# -*- coding: utf-8 -*-
+
+"""This module contains an asyncio front-end for EmlParser.
+
+Parsing an e-mail is CPU-bound and takes from a few up to hundreds of milliseconds for large
+e-mails, thus calling EmlParser directly from a coroutine blocks the event loop. AsyncEmlParser
+runs the parser in a pool of worker threads or processes instead::
+
+    async with eml_parser.aio.AsyncEmlParser(executor='process') as aep:
+        parsed = await aep.decode_email_bytes(raw_email)
+
+        async for index, result in aep.decode_many(queue_reader()):
+            ...
+
+Worker threads still compete with the event loop for the GIL, which is released at least every
+*sys.getswitchinterval()* seconds (5ms by default). Use worker processes if the latency of the
+event loop has to stay flat regardless of the parse load.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import collections
+import collections.abc
+import concurrent.futures
+import logging
+import os
+import typing
+
+import eml_parser.eml_parser
+
+logger = logging.getLogger(__name__)
+
+EXECUTORS = ('thread', 'process')
+
+
+def _decode_worker(item: typing.Any, ignore_bad_start: bool) -> dict:
+    """Decode an e-mail using the parser of the current worker process, see eml_parser.eml_parser._init_worker()."""
+    parser = eml_parser.eml_parser._worker_parser  # pylint: disable=protected-access
+    if parser is None:
+        raise RuntimeError('Worker process has not been initialised.')
+
+    if isinstance(item, (bytes, bytearray, memoryview)):
+        return parser.decode_email_bytes(bytes(item), ignore_bad_start=ignore_bad_start)
+
+    return parser.decode_email(item, ignore_bad_start=ignore_bad_start)
+
+
+class AsyncEmlParser:
+    """Decode e-mails from asyncio code without blocking the event loop.
+
+    At most *max_concurrency* e-mails are decoded at the same time. Further calls wait until
+    a slot is free, which provides backpressure to producers awaiting them.
+
+    Cancelling a call which waits for a slot, or whose e-mail has not been picked up by a worker
+    yet, removes it from the queue. An e-mail which is already being decoded cannot be interrupted,
+    its slot is released once the worker is done with it. Use the *time_budget* limit of the parser
+    (see EmlParser) to bound the time spent per e-mail.
+    """
+
+    def __init__(self,
+                 parser: typing.Optional[eml_parser.eml_parser.EmlParser] = None,
+                 executor: str = 'thread',
+                 workers: typing.Optional[int] = None,
+                 max_concurrency: typing.Optional[int] = None,
+                 **kwargs: typing.Any
+                 ) -> None:
+        """Initialisation.
+
+        Args:
+            parser (EmlParser, optional): The parser to use. By default a parser is created using *kwargs*.
+            executor (str, optional): Run the parser in a pool of worker *thread*s or *process*es. Worker processes
+                                      create their own parser from the configuration of *parser* once, at start-up.
+                                      Default: thread.
+            workers (int, optional): Number of workers. Default: the number of CPUs.
+            max_concurrency (int, optional): Maximum number of e-mails decoded at the same time. Default: *workers*.
+            **kwargs: Passed to EmlParser() if no parser is given, e.g. *include_raw_body* or *limits*.
+        """
+        if parser is not None and kwargs:
+            raise ValueError('Either pass a parser or the arguments to create one, not both.')
+
+        if executor not in EXECUTORS:
+            raise ValueError('Unknown executor "{}", supported are: {}'.format(executor, ', '.join(EXECUTORS)))
+
+        if workers is None:
+            workers = os.cpu_count() or 1
+
+        if workers < 1:
+            raise ValueError('workers must be >= 1')
+
+        if max_concurrency is None:
+            max_concurrency = workers
+
+        if max_concurrency < 1:
+            raise ValueError('max_concurrency must be >= 1')
+
+        self.parser = parser if parser is not None else eml_parser.eml_parser.EmlParser(**kwargs)
+        self.executor_type = executor
+        self.workers = workers
+        self.max_concurrency = max_concurrency
+
+        self._executor: concurrent.futures.Executor
+        if executor == 'process':
+            self._executor = concurrent.futures.ProcessPoolExecutor(max_workers=workers,
+                                                                    initializer=eml_parser.eml_parser._init_worker,  # pylint: disable=protected-access
+                                                                    initargs=(self.parser._config,))  # pylint: disable=protected-access
+        else:
+            self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix='eml_parser')
+
+        # Created on first use, as it has to be bound to the running event loop on Python < 3.10.
+        self._semaphore: typing.Optional[asyncio.Semaphore] = None
+        self._closed = False
+
+    async def __aenter__(self) -> AsyncEmlParser:
+        """Return the parser."""
+        return self
+
+    async def __aexit__(self, *exc_info: typing.Any) -> None:
+        """Shut down the workers, see :meth:`aclose`."""
+        await self.aclose()
+
+    def close(self) -> None:
+        """Shut down the workers without waiting for them, e-mails not being decoded yet are dropped."""
+        self._closed = True
+        self._executor.shutdown(wait=False)
+
+    async def aclose(self) -> None:
+        """Shut down the workers, waiting for the e-mails being decoded without blocking the event loop."""
+        self._closed = True
+        await asyncio.get_running_loop().run_in_executor(None, self._executor.shutdown)
+
+    async def _run(self, item: typing.Any, ignore_bad_start: bool) -> dict:
+        """Decode an e-mail (bytes or path) in a worker, once a slot is free."""
+        if self._closed:
+            raise RuntimeError('AsyncEmlParser has been closed.')
+
+        loop = asyncio.get_running_loop()
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        semaphore = self._semaphore
+        await semaphore.acquire()
+
+        try:
+            if self.executor_type == 'process':
+                future = self._executor.submit(_decode_worker, item, ignore_bad_start)
+            elif isinstance(item, (bytes, bytearray, memoryview)):
+                future = self._executor.submit(self.parser.decode_email_bytes, bytes(item), ignore_bad_start)
+            else:
+                future = self._executor.submit(self.parser.decode_email, item, ignore_bad_start)
+        except BaseException:
+            semaphore.release()
+            raise
+
+        # The slot is released when the worker is done, not when the caller stops waiting, as a
+        # running worker cannot be interrupted.
+        def release(_: concurrent.futures.Future) -> None:
+            try:
+                loop.call_soon_threadsafe(semaphore.release)
+            except RuntimeError:
+                # the event loop has been closed in the meantime
+                pass
+
+        future.add_done_callback(release)
+
+        result = await asyncio.wrap_future(future)
+
+        if self.executor_type == 'process' and self.parser.stats_callback is not None:
+            # as in EmlParser.decode_many(), the callback is called in this process
+            self.parser.stats_callback(result['_stats'] if self.parser.include_stats else result.pop('_stats'))
+
+        return result
+
+    async def decode_email_bytes(self, eml_file: bytes, ignore_bad_start: bool = False) -> dict:
+        """Decode a raw e-mail in a worker, see :meth:`EmlParser.decode_email_bytes`.
+
+        Args:
+            eml_file (bytes): Contents of the raw EML file passed to this function as string.
+            ignore_bad_start (bool, optional): Ignore invalid file start for this run.
+
+        Returns:
+            dict: A dictionary with the content of the EML parsed and broken down into
+                  key-value pairs.
+        """
+        return await self._run(eml_file, ignore_bad_start)
+
+    async def decode_email(self, eml_file: 'os.PathLike[str]', ignore_bad_start: bool = False) -> dict:
+        """Decode an EML file in a worker, which reads the file itself, see :meth:`EmlParser.decode_email`.
+
+        Args:
+            eml_file (os.PathLike): Path to the file to be parsed.
+            ignore_bad_start (bool, optional): Ignore invalid file start for this run.
+
+        Returns:
+            dict: A dictionary with the content of the EML parsed and broken down into
+                  key-value pairs.
+        """
+        return await self._run(eml_file, ignore_bad_start)
+
+    async def _run_indexed(self, index: int, item: typing.Any) -> typing.Tuple[int, typing.Union[dict, Exception]]:
+        try:
+            return index, await self._run(item, False)
+        except Exception as e:  # pylint: disable=broad-except
+            logger.debug('Exception occurred while decoding e-mail #{}'.format(index), exc_info=True)
+            return index, e
+
+    async def decode_many(self,
+                          items: typing.Union[typing.Iterable[typing.Any], typing.AsyncIterable[typing.Any]],
+                          ordered: bool = True
+                          ) -> typing.AsyncIterator[typing.Tuple[int, typing.Union[dict, Exception]]]:
+        """Decode a batch of e-mails, see :meth:`EmlParser.decode_many`.
+
+        The input is consumed lazily: only a bounded number of e-mails, twice *max_concurrency*,
+        is read ahead of the results consumed. Errors are not raised but returned in place of the
+        result. If the iteration is stopped early, the e-mails read ahead are cancelled.
+
+        Args:
+            items: An iterable or asynchronous iterable of raw e-mails (bytes) and/or paths to EML files.
+            ordered: If True (default), results are yielded in input order, else as soon as they are available.
+
+        Yields:
+            tuple: Tuples of the form *(index, result)* with *index* being the position of the e-mail
+                   in *items* and *result* either the parsed e-mail or the exception which occurred while
+                   decoding it.
+        """
+        max_pending = self.max_concurrency * 2
+        pending: typing.Deque[asyncio.Future] = collections.deque()
+
+        try:
+            index = 0
+            async for item in _iterate(items):
+                pending.append(asyncio.ensure_future(self._run_indexed(index, item)))
+                index += 1
+
+                if len(pending) >= max_pending:
+                    yield await _next_result(pending, ordered)
+
+            while pending:
+                yield await _next_result(pending, ordered)
+        finally:
+            for task in pending:
+                task.cancel()
+
+
+async def _iterate(items: typing.Union[typing.Iterable[typing.Any], typing.AsyncIterable[typing.Any]]) -> typing.AsyncIterator[typing.Any]:
+    """Iterate over an iterable or an asynchronous iterable."""
+    if isinstance(items, collections.abc.AsyncIterable):
+        async for item in items:
+            yield item
+    else:
+        for item in items:
+            yield item
+
+
+async def _next_result(pending: typing.Deque[asyncio.Future], ordered: bool) -> typing.Any:
+    """Remove the first, or if not *ordered* the first finished, task from *pending* and return its result."""
+    if ordered:
+        task = pending.popleft()
+    else:
+        await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        # at least one task is done
+        task = [x for x in pending if x.done()][0]
+        pending.remove(task)
+
+    return await task
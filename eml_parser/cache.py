@@ -0,0 +1,434 @@
+# -*- coding: utf-8 -*-
+
+"""This module contains the caches used for memoizing expensive parsing steps.
+
+:class:`LRUCache` keeps its entries in memory, :class:`SQLiteCache` keeps them in an SQLite
+database, which can be shared between processes (e.g. the worker processes of
+EmlParser.decode_many()) and runs.
+"""
+
+from __future__ import annotations
+
+import abc
+import collections
+import datetime
+import json
+import logging
+import os
+import sqlite3
+import threading
+import typing
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+# Key marking the objects which are not supported by JSON (datetimes, bytes) in serialized values.
+# Keys of the cached dicts starting with "$" are escaped by another "$", thus parsed e-mail data
+# (e.g. header names) can never be mistaken for such an object.
+_TYPE_KEY = '$type'
+
+
+def _json_encode(obj: typing.Any) -> typing.Any:
+    """Convert a value to JSON serializable objects, tagging datetimes and bytes in order to restore them."""
+    if isinstance(obj, dict):
+        return {('$' + k if isinstance(k, str) and k.startswith('$') else k): _json_encode(v) for k, v in obj.items()}
+
+    if isinstance(obj, (list, tuple)):
+        return [_json_encode(x) for x in obj]
+
+    if isinstance(obj, datetime.datetime):
+        return {_TYPE_KEY: 'datetime', 'value': obj.isoformat()}
+
+    if isinstance(obj, (bytes, bytearray)):
+        # attachment data, which is base64 encoded already
+        return {_TYPE_KEY: 'bytes', 'value': bytes(obj).decode('ascii')}
+
+    return obj
+
+
+def _json_object_hook(obj: typing.Dict[str, typing.Any]) -> typing.Any:
+    """Restore the objects converted by _json_encode().
+
+    Raises:
+        ValueError: If a tagged object is invalid.
+    """
+    if _TYPE_KEY in obj:
+        kind, value = obj[_TYPE_KEY], obj.get('value')
+
+        if not isinstance(value, str):
+            raise ValueError('Invalid value of tagged object')
+
+        if kind == 'datetime':
+            return datetime.datetime.fromisoformat(value)
+
+        if kind == 'bytes':
+            return value.encode('ascii')
+
+        raise ValueError('Unknown type of tagged object: {}'.format(kind))
+
+    if any(x.startswith('$') for x in obj):
+        return {(k[1:] if k.startswith('$') else k): v for k, v in obj.items()}
+
+    return obj
+
+
+class Cache(abc.ABC):
+    """Base class of the caches, mapping string keys to values."""
+
+    @abc.abstractmethod
+    def get(self, key: typing.Hashable, default: typing.Any = None) -> typing.Any:
+        """Return the value cached for *key*, or *default* if there is none."""
+
+    @abc.abstractmethod
+    def put(self, key: typing.Hashable, value: typing.Any) -> None:
+        """Cache *value* for *key*."""
+
+    @abc.abstractmethod
+    def clear(self) -> None:
+        """Remove all entries and reset the statistics."""
+
+    @abc.abstractmethod
+    def info(self) -> typing.Dict[str, typing.Any]:
+        """Return the cache statistics, at least *hits*, *misses*, *maxsize* and *currsize*."""
+
+    def hit_rate(self) -> float:
+        """Return the share of lookups which were hits, between 0 and 1."""
+        info = self.info()
+        lookups = info['hits'] + info['misses']
+
+        return info['hits'] / lookups if lookups else 0.0
+
+
+class LRUCache(Cache):
+    """A thread-safe, size bounded mapping evicting the least recently used entries.
+
+    Hits and misses of :meth:`get` are counted, see :meth:`info`.
+    A pickled cache is restored empty, as its content is only an optimisation.
+    """
+
+    def __init__(self, maxsize: int = 1024) -> None:
+        """Initialisation.
+
+        Args:
+            maxsize (int, optional): Maximum number of entries, 0 disables caching. Default: 1024.
+        """
+        if maxsize < 0:
+            raise ValueError('maxsize must not be negative')
+
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data: collections.OrderedDict = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """Return the number of cached entries."""
+        return len(self._data)
+
+    def __contains__(self, key: typing.Hashable) -> bool:
+        """Check whether *key* is cached, without counting a hit or miss."""
+        return key in self._data
+
+    def __getstate__(self) -> typing.Dict[str, typing.Any]:
+        """Only pickle the configuration of the cache."""
+        return {'maxsize': self.maxsize}
+
+    def __setstate__(self, state: typing.Dict[str, typing.Any]) -> None:
+        """Restore an empty cache."""
+        self.__init__(state['maxsize'])  # type: ignore  # pylint: disable=unnecessary-dunder-call
+
+    def get(self, key: typing.Hashable, default: typing.Any = None) -> typing.Any:
+        """Return the value cached for *key*, or *default* if there is none.
+
+        Args:
+            key: The key to look up.
+            default (optional): Value returned if *key* is not cached. Default: None.
+
+        Returns:
+            The cached value or *default*.
+        """
+        with self._lock:
+            value = self._data.get(key, _MISSING)
+
+            if value is _MISSING:
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+
+            return value
+
+    def put(self, key: typing.Hashable, value: typing.Any) -> None:
+        """Cache *value* for *key*, evicting the least recently used entry if the cache is full.
+
+        Args:
+            key: The key to cache the value for.
+            value: The value to cache.
+        """
+        if self.maxsize == 0:
+            return
+
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        """Remove all entries and reset the hit and miss counters."""
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def info(self) -> typing.Dict[str, int]:
+        """Return the cache statistics.
+
+        Returns:
+            dict: A dict containing *hits*, *misses*, *maxsize* and *currsize*.
+        """
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'maxsize': self.maxsize, 'currsize': len(self._data)}
+
+
+# The total size of the values is kept up to date by triggers, in order not to sum it up for every insert.
+_SQLITE_SCHEMA = '''
+BEGIN;
+CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS cache_size (id INTEGER PRIMARY KEY CHECK (id = 0), total INTEGER NOT NULL);
+INSERT OR IGNORE INTO cache_size (id, total) VALUES (0, 0);
+CREATE TRIGGER IF NOT EXISTS cache_insert AFTER INSERT ON cache BEGIN UPDATE cache_size SET total = total + NEW.size WHERE id = 0; END;
+CREATE TRIGGER IF NOT EXISTS cache_delete AFTER DELETE ON cache BEGIN UPDATE cache_size SET total = total - OLD.size WHERE id = 0; END;
+COMMIT;
+'''
+
+
+class SQLiteCache(Cache):
+    """A size bounded cache stored in an SQLite database, which may be shared between processes.
+
+    Values are stored as JSON, thus only JSON serializable values (dicts, lists, strings, numbers, ...),
+    as well as datetimes and bytes as found in parsed e-mails, can be cached. The cache is bounded by
+    the number of entries and optionally by the size of the stored values. When it is full, the oldest
+    entries are evicted, reads do not update the database. Put an in-memory LRU cache in front of it using *memory_size* in order to keep the
+    most recently used entries close.
+
+    Every thread and process opens its own connection, thus a pickled cache (e.g. sent to a
+    worker process) uses the same database. Database errors, e.g. if it is locked for too long,
+    are logged and handled as cache misses.
+    """
+
+    def __init__(self,
+                 path: 'os.PathLike[str]',
+                 maxsize: int = 100000,
+                 memory_size: int = 0,
+                 timeout: float = 30.0,
+                 maxbytes: typing.Optional[int] = None
+                 ) -> None:
+        """Initialisation.
+
+        Args:
+            path (os.PathLike): Path of the database, which is created if it does not exist.
+            maxsize (int, optional): Maximum number of entries in the database. Default: 100000.
+            maxbytes (int, optional): Maximum total size of the serialized values in the database, in bytes.
+                                      Values larger than this are not cached. Default: no limit.
+            memory_size (int, optional): Number of entries kept in an in-memory LRU cache in front of the database,
+                                         0 disables it. Default: 0.
+            timeout (float, optional): Seconds to wait for a database locked by another process. Default: 30.
+        """
+        if maxsize < 1:
+            raise ValueError('maxsize must be >= 1')
+
+        if maxbytes is not None and maxbytes < 1:
+            raise ValueError('maxbytes must be >= 1')
+
+        self.path = os.fspath(path)
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self.memory_size = memory_size
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self._memory = LRUCache(memory_size)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+        # create the table right away, in order to report problems early
+        self._connection()
+
+    def __getstate__(self) -> typing.Dict[str, typing.Any]:
+        """Only pickle the configuration of the cache."""
+        return {'path': self.path, 'maxsize': self.maxsize, 'memory_size': self.memory_size, 'timeout': self.timeout, 'maxbytes': self.maxbytes}
+
+    def __setstate__(self, state: typing.Dict[str, typing.Any]) -> None:
+        """Open the same database."""
+        self.__init__(**state)  # type: ignore  # pylint: disable=unnecessary-dunder-call
+
+    def _connection(self) -> sqlite3.Connection:
+        """Return the connection of the current thread, opening it if required."""
+        connection = getattr(self._local, 'connection', None)
+
+        # connections must not be used in a forked process
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            # the delete trigger has to fire for entries replaced by INSERT OR REPLACE as well
+            connection.execute('PRAGMA recursive_triggers=ON')
+            connection.executescript(_SQLITE_SCHEMA)
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+
+        return connection
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def get(self, key: typing.Hashable, default: typing.Any = None) -> typing.Any:
+        """Return the value cached for *key*, or *default* if there is none.
+
+        Args:
+            key (str): The key to look up.
+            default (optional): Value returned if *key* is not cached. Default: None.
+
+        Returns:
+            The cached value or *default*.
+        """
+        value = self._memory.get(key, _MISSING)
+
+        if value is _MISSING:
+            try:
+                row = self._connection().execute('SELECT value FROM cache WHERE key = ?', (str(key),)).fetchone()
+            except sqlite3.Error as e:
+                logger.debug('Error reading from the cache: %s', e)
+                self._count('errors')
+                row = None
+
+            if row is None:
+                self._count('misses')
+                return default
+
+            try:
+                value = json.loads(row[0], object_hook=_json_object_hook)
+            except (ValueError, TypeError) as e:
+                # e.g. written by an incompatible version
+                logger.debug('Error decoding cached value: %s', e)
+                self._count('errors')
+                self._count('misses')
+                return default
+
+            self._memory.put(key, value)
+
+        self._count('hits')
+
+        return value
+
+    def put(self, key: typing.Hashable, value: typing.Any) -> None:
+        """Cache *value* for *key*, evicting the oldest entries if the cache is full.
+
+        Args:
+            key (str): The key to cache the value for.
+            value: The value to cache, which must be JSON serializable.
+        """
+        data = json.dumps(_json_encode(value), separators=(',', ':'))
+        size = len(data.encode('utf-8'))
+
+        if self.maxbytes is not None and size > self.maxbytes:
+            return
+
+        self._memory.put(key, value)
+
+        try:
+            connection = self._connection()
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                rowid = connection.execute('INSERT OR REPLACE INTO cache (key, value, size) VALUES (?, ?, ?)', (str(key), data, size)).lastrowid
+                # Replaced and evicted entries leave gaps in the rowids, thus the entries are only counted
+                # if there may be more than maxsize of them, i.e. the rowids span more than maxsize.
+                first_rowid = connection.execute('SELECT MIN(rowid) FROM cache').fetchone()[0]
+                if rowid is not None and first_rowid is not None and rowid - first_rowid >= self.maxsize:
+                    self._evict_count(connection, self.maxsize)
+
+                if self.maxbytes is not None:
+                    self._evict_bytes(connection, self.maxbytes)
+            except BaseException:
+                connection.execute('ROLLBACK')
+                raise
+            connection.execute('COMMIT')
+        except sqlite3.Error as e:
+            logger.debug('Error writing to the cache: %s', e)
+            self._count('errors')
+
+    @staticmethod
+    def _evict_count(connection: sqlite3.Connection, maxsize: int) -> None:
+        """Evict the oldest entries until there are at most *maxsize* entries."""
+        excess = connection.execute('SELECT COUNT(*) FROM cache').fetchone()[0] - maxsize
+
+        if excess > 0:
+            # new entries get the highest rowid
+            connection.execute('DELETE FROM cache WHERE rowid IN (SELECT rowid FROM cache ORDER BY rowid LIMIT ?)', (excess,))
+
+    @staticmethod
+    def _evict_bytes(connection: sqlite3.Connection, maxbytes: int) -> None:
+        """Evict the oldest entries until the total size of the values is at most *maxbytes*."""
+        excess = connection.execute('SELECT total FROM cache_size WHERE id = 0').fetchone()[0] - maxbytes
+
+        while excess > 0:
+            last_rowid = None
+
+            for rowid, size in connection.execute('SELECT rowid, size FROM cache ORDER BY rowid LIMIT 64').fetchall():
+                last_rowid = rowid
+                excess -= size
+
+                if excess <= 0:
+                    break
+
+            if last_rowid is None:
+                break
+
+            connection.execute('DELETE FROM cache WHERE rowid <= ?', (last_rowid,))
+
+    def clear(self) -> None:
+        """Remove all entries and reset the statistics."""
+        self._connection().execute('DELETE FROM cache')
+
+        self._memory.clear()
+
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+            self.errors = 0
+
+    def __len__(self) -> int:
+        """Return the number of entries in the database."""
+        return self._connection().execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+
+    def info(self) -> typing.Dict[str, typing.Any]:
+        """Return the cache statistics.
+
+        The hits, misses and errors are those of this instance, the size is the one of the database.
+
+        Returns:
+            dict: A dict containing *hits*, *misses*, *errors*, *maxsize*, *currsize*, *maxbytes* and *currbytes*
+                  (total size of the values).
+        """
+        connection = self._connection()
+        currsize = connection.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        currbytes = connection.execute('SELECT total FROM cache_size WHERE id = 0').fetchone()[0]
+
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'errors': self.errors, 'maxsize': self.maxsize, 'currsize': currsize,
+                    'maxbytes': self.maxbytes, 'currbytes': currbytes}
+
+    def close(self) -> None:
+        """Close the connection of the current thread."""
+        connection = getattr(self._local, 'connection', None)
+
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
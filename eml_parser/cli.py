@@ -0,0 +1,390 @@
+# -*- coding: utf-8 -*-
+
+"""This module contains the eml-parser command-line tool, parsing large numbers of e-mails in parallel.
+
+Inputs may be EML files, directories (walked recursively), glob patterns, mbox files or a
+single e-mail read from stdin (*-*)::
+
+    eml-parser --workers 8 --output results.ndjson --extract-attachments attachments/ incident/
+    find incident/ -name '*.eml' -mtime -1 | eml-parser --files-from - --output recent.ndjson
+    eml-parser --output-dir results/ incident/
+    eml-parser --mbox archive.mbox > results.ndjson
+
+Directories are walked lazily while the e-mails are parsed, thus parsing starts immediately and
+the tree is never listed in memory as a whole. Worker processes read the files themselves.
+"""
+
+from __future__ import annotations
+
+import argparse
+import base64
+import fnmatch
+import glob
+import hashlib
+import logging
+import os
+import pathlib
+import sys
+import tempfile
+import time
+import typing
+
+import eml_parser.cache
+import eml_parser.eml_parser
+import eml_parser.export
+import eml_parser.readers
+
+logger = logging.getLogger(__name__)
+
+# Key of an e-mail: its source (shown to the user and added to the result) and the relative path
+# of its result file when writing one JSON file per e-mail.
+_Key = typing.Tuple[str, str]
+
+
+def walk(root: 'os.PathLike[str]', pattern: str = '*') -> typing.Iterator[pathlib.Path]:
+    """Recursively list the files of a directory whose name matches a pattern.
+
+    The order is stable: the files of a directory, sorted by name, are listed before the files of its sub-directories.
+
+    Directories which cannot be read are logged and skipped, symbolic links to directories are not followed.
+
+    Args:
+        root (os.PathLike): The directory.
+        pattern (str, optional): Shell-style pattern the file names have to match, see fnmatch. Default: all files.
+
+    Yields:
+        pathlib.Path: Paths of the files.
+    """
+    stack = [os.fspath(root)]
+
+    while stack:
+        directory = stack.pop()
+
+        try:
+            with os.scandir(directory) as it:
+                entries = sorted(it, key=lambda x: x.name)
+        except OSError as e:
+            logger.warning('Cannot read directory %s: %s', directory, e)
+            continue
+
+        sub_directories = []
+
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    sub_directories.append(entry.path)
+                elif entry.is_file() and fnmatch.fnmatch(entry.name, pattern):
+                    yield pathlib.Path(entry.path)
+            except OSError as e:
+                logger.warning('Cannot read %s: %s', entry.path, e)
+
+        stack.extend(reversed(sub_directories))
+
+
+class Progress:
+    """Prints the number of e-mails parsed and the throughput to stderr."""
+
+    def __init__(self, interval: float = 1.0, enabled: bool = True, attachments: bool = False) -> None:
+        """Initialisation.
+
+        Args:
+            interval (float, optional): Seconds between progress lines. Default: 1.
+            enabled (bool, optional): Print progress lines while running, else only the summary. Default: True.
+            attachments (bool, optional): Include the number of attachments extracted. Default: False.
+        """
+        self.interval = interval
+        self.enabled = enabled
+        self.show_attachments = attachments
+        self.parsed = 0
+        self.errors = 0
+        self.attachments = 0
+        self.started = time.monotonic()
+        self._next = self.started + interval
+
+    def update(self, error: bool, attachments: int = 0) -> None:
+        """Count an e-mail and print a progress line if due."""
+        if error:
+            self.errors += 1
+        else:
+            self.parsed += 1
+
+        self.attachments += attachments
+
+        if self.enabled:
+            now = time.monotonic()
+            if now >= self._next:
+                self._next = now + self.interval
+                self._print(now)
+
+    def summary(self) -> None:
+        """Print the final line."""
+        self._print(time.monotonic())
+
+    def _print(self, now: float) -> None:
+        elapsed = max(now - self.started, 1e-9)
+        line = '{} e-mails parsed, {} errors'.format(self.parsed, self.errors)
+        if self.show_attachments:
+            line += ', {} attachments extracted'.format(self.attachments)
+
+        print('{} in {:.1f}s ({:.1f} e-mails/s)'.format(line, elapsed, (self.parsed + self.errors) / elapsed), file=sys.stderr, flush=True)
+
+
+def _read_lines(path: str) -> typing.Iterator[str]:
+    """Yield the lines of a text file, or of stdin if *path* is *-*."""
+    if path == '-':
+        yield from sys.stdin
+        return
+
+    with open(path, encoding='utf-8') as fp:
+        yield from fp
+
+
+def _iter_inputs(args: argparse.Namespace, progress: Progress) -> typing.Iterator[typing.Tuple[_Key, typing.Union[bytes, pathlib.Path]]]:
+    """Yield the e-mails to parse as *((source, result_name), e-mail)* tuples, the e-mail being a path or bytes.
+
+    Mbox files which cannot be read are logged and counted as errors.
+    """
+    inputs: typing.Iterable[str] = args.inputs
+
+    if args.files_from is not None:
+        inputs = (x.rstrip('\r\n') for x in _read_lines(args.files_from) if x.strip())
+
+    for value in inputs:
+        if value == '-':
+            yield ('<stdin>', 'stdin'), sys.stdin.buffer.read()
+            continue
+
+        path = pathlib.Path(value)
+
+        if not path.exists() and any(x in value for x in '*?['):
+            paths = [pathlib.Path(x) for x in sorted(glob.iglob(value, recursive=True))]
+        else:
+            paths = [path]
+
+        for path in paths:
+            if path.is_dir():
+                for file_path in walk(path, args.pattern):
+                    yield (str(file_path), file_path.relative_to(path).as_posix()), file_path
+            elif args.mbox:
+                try:
+                    for offset, raw_email in eml_parser.readers.iter_mbox(path, mboxrd=args.mboxrd):
+                        yield ('{}:{}'.format(path, offset), '{}/{}'.format(path.name, offset)), raw_email
+                except OSError as e:
+                    logger.error('%s: %s: %s', path, type(e).__name__, e)
+                    progress.update(True)
+            else:
+                yield (str(path), path.name), path
+
+
+def _unique_result_names(items: typing.Iterable[typing.Tuple[_Key, typing.Any]]) -> typing.Iterator[typing.Tuple[_Key, typing.Any]]:
+    """Rename the result files which would overwrite the one of an earlier e-mail.
+
+    Result files are named after the path of the e-mail relative to its input, thus e.g. *a/x.eml* and
+    *b/x.eml* both result in *x.eml.json*. The later one gets the start of the SHA-256 hash of its source
+    appended instead, e.g. *x.eml.3f2a9c1e.json*.
+    """
+    seen: typing.Set[str] = set()
+
+    for (source, result_name), item in items:
+        if result_name in seen:
+            digest = hashlib.sha256(source.encode('utf-8', 'surrogateescape')).hexdigest()[:8]
+            unique_name = '{}.{}'.format(result_name, digest)
+
+            # the same input may be given twice
+            counter = 1
+            while unique_name in seen:
+                counter += 1
+                unique_name = '{}.{}.{}'.format(result_name, digest, counter)
+
+            logger.warning('%s: result file %s.json is already used by another e-mail, writing %s.json instead', source, result_name, unique_name)
+            result_name = unique_name
+
+        seen.add(result_name)
+        yield (source, result_name), item
+
+
+def extract_attachments(parsed: dict, directory: pathlib.Path) -> int:
+    """Write the attachments of a parsed e-mail to a content-addressed directory layout.
+
+    Every attachment is written to *directory/ab/cd/abcd...*, *abcd...* being the SHA-256 hash of its
+    content, thus attachments found in many e-mails are only stored once. The files are written
+    atomically, in order to allow multiple processes to extract to the same directory.
+
+    Args:
+        parsed (dict): The parsed e-mail, including the attachment data (*include_attachment_data*).
+        directory (pathlib.Path): Base directory.
+
+    Returns:
+        int: The number of attachments written, i.e. not already present.
+    """
+    written = 0
+
+    for attachment in parsed.get('attachment', []):
+        raw = attachment.get('raw')
+        if raw is None:
+            continue
+
+        data = base64.b64decode(raw)
+        sha256 = attachment.get('hash', {}).get('sha256') or hashlib.sha256(data).hexdigest()
+        path = directory / sha256[:2] / sha256[2:4] / sha256
+
+        if path.exists():
+            continue
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        fd, tmp_path = tempfile.mkstemp(dir=str(path.parent), prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as fp:
+                fp.write(data)
+            os.replace(tmp_path, str(path))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+        written += 1
+
+    return written
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='eml-parser', description='Parse e-mails in parallel and write the results as JSON.')
+    parser.add_argument('inputs', nargs='*', metavar='INPUT',
+                        help='EML files, directories (walked recursively), glob patterns (e.g. "dump/**/*.eml"), '
+                             'mbox files (with --mbox) or "-" for a single e-mail read from stdin.')
+    parser.add_argument('--files-from', metavar='FILE', help='Read the inputs from a file, one per line ("-" for stdin).')
+    parser.add_argument('--pattern', default='*', help='Only parse files in directories whose name matches this pattern (default: %(default)s).')
+    parser.add_argument('--mbox', action='store_true', help='The input files are mbox files.')
+    parser.add_argument('--mboxrd', action='store_true', help='The input files are mbox files in the mboxrd format.')
+
+    output = parser.add_argument_group('output')
+    output.add_argument('--output', '-o', default='-', metavar='FILE', help='Write the results as NDJSON to this file (default: stdout).')
+    output.add_argument('--output-dir', metavar='DIR', help='Write the result of every e-mail to its own JSON file in this directory instead, named after the path of the e-mail '
+                             'relative to its input directory (or its file name); if that name is already used, the start of the hash of the path of the e-mail is appended.')
+    output.add_argument('--extract-attachments', metavar='DIR', help='Write the attachments to this directory, as DIR/ab/cd/<sha256>.')
+    output.add_argument('--sort-keys', action='store_true', help='Sort the keys of the JSON objects.')
+    output.add_argument('--utc', action='store_true', help='Convert datetimes to UTC instead of keeping their UTC offset.')
+
+    parsing = parser.add_argument_group('parsing')
+    parsing.add_argument('--workers', '-j', type=int, help='Number of worker processes (default: number of CPUs).')
+    parsing.add_argument('--chunksize', type=int, default=8, help='Number of e-mails sent to a worker at once (default: %(default)s).')
+    parsing.add_argument('--ordered', action='store_true', help='Write the results in input order.')
+    parsing.add_argument('--include-raw-body', action='store_true', help='Include the raw bodies in the results.')
+    parsing.add_argument('--include-attachment-data', action='store_true', help='Include the base64 encoded attachments in the results.')
+    parsing.add_argument('--include-part-id', action='store_true', help='Add a part_id to every body and attachment.')
+    parsing.add_argument('--email-force-tld', action='store_true', help='Only match e-mail addresses with a TLD.')
+    parsing.add_argument('--no-attachments', action='store_true', help='Do not parse attachments.')
+    parsing.add_argument('--attachment-cache', metavar='FILE',
+                         help='Cache the hashes and mime-types of attachments in this SQLite database, shared by the workers and across runs.')
+    parsing.add_argument('--result-cache', metavar='FILE',
+                         help='Cache the results in this SQLite database, thus e-mails parsed before (e.g. duplicates) are not parsed again.')
+    parsing.add_argument('--fields', help='Only return these comma-separated fields, e.g. "header.from,attachment.hash.sha256".')
+
+    parser.add_argument('--progress', action='store_true', help='Print the progress to stderr every second.')
+    parser.add_argument('--quiet', '-q', action='store_true', help='Do not print a summary to stderr.')
+    parser.add_argument('--verbose', '-v', action='store_true', help='Log the problems worked around while parsing e-mails.')
+
+    return parser
+
+
+def main(argv: typing.Optional[typing.List[str]] = None) -> int:
+    """Run the command-line tool.
+
+    Args:
+        argv (list, optional): Command line arguments. Default: sys.argv[1:].
+
+    Returns:
+        int: The exit code, 1 if any e-mail could not be parsed.
+    """
+    parser = _build_parser()
+    args = parser.parse_args(argv)
+    args.mbox = args.mbox or args.mboxrd
+
+    if not args.inputs and args.files_from is None:
+        parser.error('no inputs given')
+
+    if args.mbox and '-' in args.inputs:
+        parser.error('reading mbox files from stdin is not supported')
+
+    if args.chunksize < 1:
+        parser.error('--chunksize must be >= 1')
+
+    logging.basicConfig(level=logging.WARNING, format='%(levelname)s %(message)s')
+    if not args.verbose:
+        # malformed e-mails are common in large dumps, only report e-mails which cannot be parsed at all
+        logging.getLogger('eml_parser').setLevel(logging.CRITICAL)
+        logger.setLevel(logging.WARNING)
+
+    fields = None if args.fields is None else [x.strip() for x in args.fields.split(',') if x.strip()]
+    if fields is not None and args.extract_attachments:
+        fields.append('attachment.raw')
+
+    ep = eml_parser.eml_parser.EmlParser(include_raw_body=args.include_raw_body,
+                                         include_attachment_data=args.include_attachment_data or bool(args.extract_attachments),
+                                         include_part_id=args.include_part_id,
+                                         email_force_tld=args.email_force_tld,
+                                         parse_attachments=not args.no_attachments,
+                                         fields=fields,
+                                         attachment_cache=None if not args.attachment_cache else eml_parser.cache.SQLiteCache(args.attachment_cache, memory_size=1024),
+                                         result_cache=None if not args.result_cache else eml_parser.cache.SQLiteCache(args.result_cache))
+
+    attachment_dir = None if not args.extract_attachments else pathlib.Path(args.extract_attachments)
+    output_dir = None if not args.output_dir else pathlib.Path(args.output_dir)
+    progress = Progress(enabled=args.progress, attachments=attachment_dir is not None)
+
+    if output_dir is not None:
+        fp = None
+    elif args.output == '-':
+        fp = sys.stdout.buffer
+    else:
+        fp = open(args.output, 'wb')  # pylint: disable=consider-using-with
+
+    writer = eml_parser.export.NDJSONWriter(fp if fp is not None else sys.stdout.buffer, sort_keys=args.sort_keys, utc=args.utc)
+
+    try:
+        items = _iter_inputs(args, progress)
+        if output_dir is not None:
+            items = _unique_result_names(items)
+
+        results = eml_parser.readers.decode_keyed(ep, items, workers=args.workers, ordered=args.ordered, chunksize=args.chunksize)
+
+        for (source, result_name), result in results:
+            if not isinstance(result, dict):
+                logger.error('%s: %s: %s', source, type(result).__name__, result)
+                progress.update(True)
+                continue
+
+            attachments = 0
+            if attachment_dir is not None:
+                attachments = extract_attachments(result, attachment_dir)
+
+                if not args.include_attachment_data:
+                    for attachment in result.get('attachment', []):
+                        attachment.pop('raw', None)
+
+            result['_source'] = source
+
+            if output_dir is not None:
+                path = output_dir / (result_name + '.json')
+                path.parent.mkdir(parents=True, exist_ok=True)
+                path.write_bytes(writer.dumps(result))
+            else:
+                writer.write(result)
+
+            progress.update(False, attachments)
+    except KeyboardInterrupt:
+        return 130
+    finally:
+        if fp is not None:
+            fp.flush()
+            if fp is not sys.stdout.buffer:
+                fp.close()
+
+        if not args.quiet:
+            progress.summary()
+
+    return 1 if progress.errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
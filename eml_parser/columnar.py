@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+
+"""This module contains the functions used for exporting batches of parsed e-mails to columnar formats.
+
+Parsed e-mails are flattened into four tables with a fixed schema, linked by the *key* of the e-mail:
+
+* *messages*: one row per e-mail, containing the main header fields and the information parsed from the received header fields.
+* *received*: one row per received header field (hop), in the order they appear in the e-mail.
+* *bodies*: one row per body, containing its hash and the (hashes of the) URLs, e-mail addresses, domains and IPs found.
+* *attachments*: one row per attachment, containing its file name, size, mime-type and hashes.
+
+The tables are returned as `Apache Arrow <https://arrow.apache.org/>`_ record batches, or written to Parquet files.
+This requires pyarrow to be installed (*pip install eml_parser[columnar]*).
+"""
+
+from __future__ import annotations
+
+import os
+import pathlib
+import typing
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+# Names of the tables.
+TABLES = ('messages', 'received', 'bodies', 'attachments')
+
+# Columns of the bodies table holding lists of indicators.
+_BODY_IOC_COLUMNS = ('uri', 'email', 'domain', 'ip', 'uri_hash', 'email_hash', 'domain_hash', 'ip_hash')
+
+# Hash algorithms with a column of their own in the attachments table.
+_ATTACHMENT_HASH_COLUMNS = ('md5', 'sha1', 'sha256', 'sha512')
+
+SCHEMAS: typing.Dict[str, typing.Any] = {}
+
+if pa is not None:
+    _strings = pa.list_(pa.string())
+    _timestamp = pa.timestamp('us', tz='UTC')
+
+    SCHEMAS = {
+        'messages': pa.schema([('key', pa.string()),
+                               ('subject', pa.string()),
+                               ('from', pa.string()),
+                               ('to', _strings),
+                               ('cc', _strings),
+                               ('delivered_to', _strings),
+                               ('date', _timestamp),
+                               ('message_id', pa.string()),
+                               ('received_ip', _strings),
+                               ('received_domain', _strings),
+                               ('received_email', _strings),
+                               ('received_foremail', _strings),
+                               ('defect', _strings),
+                               ('body_count', pa.int32()),
+                               ('attachment_count', pa.int32()),
+                               ('limits_hit', _strings),
+                               ]),
+        'received': pa.schema([('key', pa.string()),
+                               ('hop', pa.int32()),
+                               ('from', _strings),
+                               ('by', _strings),
+                               ('with', pa.string()),
+                               ('for', _strings),
+                               ('date', _timestamp),
+                               ('warning', _strings),
+                               ('src', pa.string()),
+                               ]),
+        'bodies': pa.schema([('key', pa.string()),
+                             ('index', pa.int32()),
+                             ('content_type', pa.string()),
+                             ('hash', pa.string()),
+                             ('part_id', pa.string()),
+                             ] + [(x, _strings) for x in _BODY_IOC_COLUMNS]),
+        'attachments': pa.schema([('key', pa.string()),
+                                  ('index', pa.int32()),
+                                  ('filename', pa.string()),
+                                  ('extension', pa.string()),
+                                  ('size', pa.int64()),
+                                  ('mime_type', pa.string()),
+                                  ('mime_type_short', pa.string()),
+                                  ('part_id', pa.string()),
+                                  ] + [(x, pa.string()) for x in _ATTACHMENT_HASH_COLUMNS]),
+    }
+
+
+def _require_pyarrow() -> None:
+    if pa is None:
+        raise ImportError('pyarrow is required for columnar export, install it using "pip install eml_parser[columnar]".')
+
+
+def _first(values: typing.Optional[typing.List[str]]) -> typing.Optional[str]:
+    return values[0] if values else None
+
+
+def to_record_batches(results: typing.Iterable[typing.Tuple[typing.Any, typing.Any]]) -> typing.Dict[str, typing.Any]:
+    """Flatten a batch of parsed e-mails into record batches.
+
+    Args:
+        results (iterable): Tuples of the form *(key, parsed_email)*, as yielded by EmlParser.decode_many(),
+                            eml_parser.readers.decode_mbox(), etc. The key is stored as a string in the *key*
+                            column of all tables. Results which are not dicts (i.e. exceptions) are skipped.
+
+    Returns:
+        dict: A dict with as key the name of the table and value a *pyarrow.RecordBatch*, see SCHEMAS.
+    """
+    _require_pyarrow()
+
+    columns: typing.Dict[str, typing.Dict[str, typing.List[typing.Any]]] = {table: {name: [] for name in SCHEMAS[table].names} for table in TABLES}
+    messages = columns['messages']
+    received = columns['received']
+    bodies = columns['bodies']
+    attachments = columns['attachments']
+
+    for key, parsed in results:
+        if not isinstance(parsed, dict):
+            continue
+
+        key = str(key)
+        header = parsed.get('header', {})
+        body = parsed.get('body') or []
+        attachment = parsed.get('attachment') or []
+
+        messages['key'].append(key)
+        messages['subject'].append(header.get('subject'))
+        messages['from'].append(header.get('from'))
+        messages['date'].append(header.get('date'))
+        messages['message_id'].append(_first(header.get('header', {}).get('message-id')))
+        for name in ('to', 'cc', 'delivered_to', 'received_ip', 'received_domain', 'received_email', 'received_foremail', 'defect'):
+            messages[name].append(header.get(name))
+        messages['body_count'].append(len(body))
+        messages['attachment_count'].append(len(attachment))
+        messages['limits_hit'].append(parsed.get('limits_hit'))
+
+        for hop, routing in enumerate(header.get('received') or []):
+            received['key'].append(key)
+            received['hop'].append(hop)
+            for name in ('from', 'by', 'with', 'for', 'date', 'warning', 'src'):
+                received[name].append(routing.get(name))
+
+        for index, bodie in enumerate(body):
+            bodies['key'].append(key)
+            bodies['index'].append(index)
+            for name in ('content_type', 'hash', 'part_id') + _BODY_IOC_COLUMNS:
+                bodies[name].append(bodie.get(name))
+
+        for index, attach in enumerate(attachment):
+            attachments['key'].append(key)
+            attachments['index'].append(index)
+            for name in ('filename', 'extension', 'size', 'mime_type', 'mime_type_short', 'part_id'):
+                attachments[name].append(attach.get(name))
+
+            hashes = attach.get('hash') or {}
+            for name in _ATTACHMENT_HASH_COLUMNS:
+                attachments[name].append(hashes.get(name))
+
+    return {table: pa.RecordBatch.from_pydict(columns[table], schema=SCHEMAS[table]) for table in TABLES}
+
+
+class ParquetWriter:
+    """Write batches of parsed e-mails to one Parquet file per table in a directory.
+
+    Every call of :meth:`write` adds a row group to each file, thus results can be written in
+    batches of bounded size, e.g. while iterating over EmlParser.decode_many()::
+
+        with eml_parser.columnar.ParquetWriter('out') as writer:
+            writer.write_all(ep.decode_many(paths))
+    """
+
+    def __init__(self, directory: 'os.PathLike[str]', batch_size: int = 10000, compression: str = 'zstd') -> None:
+        """Initialisation.
+
+        Args:
+            directory (os.PathLike): Directory the files (e.g. *messages.parquet*) are written to, created if required.
+            batch_size (int, optional): Number of e-mails per row group when using :meth:`write_all`. Default: 10000.
+            compression (str, optional): Compression codec, as supported by pyarrow. Default: zstd.
+        """
+        _require_pyarrow()
+
+        if batch_size < 1:
+            raise ValueError('batch_size must be >= 1')
+
+        self.directory = pathlib.Path(directory)
+        self.batch_size = batch_size
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._writers = {table: pq.ParquetWriter(str(self.directory / '{}.parquet'.format(table)), SCHEMAS[table], compression=compression)
+                         for table in TABLES}
+
+    def __enter__(self) -> ParquetWriter:
+        """Return the writer."""
+        return self
+
+    def __exit__(self, *exc_info: typing.Any) -> None:
+        """Close the files."""
+        self.close()
+
+    def write(self, results: typing.Iterable[typing.Tuple[typing.Any, typing.Any]]) -> None:
+        """Write a batch of parsed e-mails, see to_record_batches().
+
+        Args:
+            results (iterable): Tuples of the form *(key, parsed_email)*.
+        """
+        for table, batch in to_record_batches(results).items():
+            self._writers[table].write_batch(batch)
+
+    def write_all(self, results: typing.Iterable[typing.Tuple[typing.Any, typing.Any]]) -> None:
+        """Write parsed e-mails in batches of *batch_size* e-mails.
+
+        Args:
+            results (iterable): Tuples of the form *(key, parsed_email)*, e.g. a generator.
+        """
+        batch = []
+
+        for result in results:
+            batch.append(result)
+
+            if len(batch) == self.batch_size:
+                self.write(batch)
+                batch = []
+
+        if batch:
+            self.write(batch)
+
+    def close(self) -> None:
+        """Close the files."""
+        for writer in self._writers.values():
+            writer.close()
+
+
+def write_parquet(results: typing.Iterable[typing.Tuple[typing.Any, typing.Any]], directory: 'os.PathLike[str]', batch_size: int = 10000) -> None:
+    """Write parsed e-mails to one Parquet file per table in a directory, see ParquetWriter.
+
+    Args:
+        results (iterable): Tuples of the form *(key, parsed_email)*, e.g. a generator.
+        directory (os.PathLike): Directory the files are written to.
+        batch_size (int, optional): Number of e-mails per row group. Default: 10000.
+    """
+    with ParquetWriter(directory, batch_size=batch_size) as writer:
+        writer.write_all(results)
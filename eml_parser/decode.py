@@ -11,12 +11,16 @@ import email.errors
 import email.header
 import email.policy
 import email.utils
+import hashlib
 import json
 import logging
+import threading
+import time
 import typing
 
 import dateutil.parser
 
+import eml_parser.cache
 import eml_parser.regex
 
 #
@@ -59,6 +63,23 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+# Charset detection is run on at most this number of bytes at the start of a string.
+CHARSET_SAMPLE_SIZE = 64 * 1024
+
+# Detected charsets, keyed by the declared charset and the hash of the sample.
+charset_cache = eml_parser.cache.LRUCache(maxsize=1024)
+
+# Returned for missing or invalid dates.
+DEFAULT_DATE = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+# Parsed dates, as the same timestamps are found in many received lines.
+date_cache = eml_parser.cache.LRUCache(maxsize=4096)
+
+_MONTHS = {m: i for i, m in enumerate(('jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec'), 1)}
+
+_charset_stats: typing.Dict[str, float] = {'ascii': 0, 'utf-8': 0, 'detected': 0, 'detect_time': 0.0}
+_charset_stats_lock = threading.Lock()
+
 
 def decode_field(field: str) -> str:
     """Try to get the specified field using the Header module.
@@ -92,12 +113,71 @@ def decode_field(field: str) -> str:
     return string
 
 
+def _count_charset_stat(key: str, value: float = 1) -> None:
+    with _charset_stats_lock:
+        _charset_stats[key] += value
+
+
+def charset_detection_info() -> typing.Dict[str, typing.Any]:
+    """Return statistics about the charset detection done by decode_string().
+
+    Returns:
+        dict: A dict containing the number of strings decoded as *ascii* and *utf-8* without detection,
+              the number of strings run through charset detection (*detected*), the total time spent
+              in charset detection in seconds (*detect_time*) and the statistics of the cache (*cache*).
+    """
+    with _charset_stats_lock:
+        info: typing.Dict[str, typing.Any] = dict(_charset_stats)
+
+    info['cache'] = charset_cache.info()
+
+    return info
+
+
+def detect_charset(string: bytes, encoding: typing.Optional[str] = None) -> typing.Optional[str]:
+    """Detect the charset of a bytes string using the chardet module.
+
+    Only the first CHARSET_SAMPLE_SIZE bytes are used for the detection and
+    the results are cached, thus identical strings are detected only once.
+
+    Args:
+        string (bytes): The bytes string to detect the charset of.
+        encoding (str, optional): The (wrong) declared encoding of the string.
+
+    Returns:
+        str: The detected charset, or None if it is ascii or unknown.
+    """
+    if chardet is None:
+        return None
+
+    sample = string[:CHARSET_SAMPLE_SIZE]
+    key = (encoding, hashlib.blake2b(sample, digest_size=16).digest())
+
+    charset = charset_cache.get(key, False)
+    if charset is not False:
+        return charset
+
+    start = time.perf_counter()
+    enc = chardet.detect(sample)
+    _count_charset_stat('detect_time', time.perf_counter() - start)
+    _count_charset_stat('detected')
+
+    if not (enc['confidence'] is None or enc['encoding'] is None) and not (enc['confidence'] == 1 and enc['encoding'] == 'ascii'):
+        charset = enc['encoding']
+    else:
+        charset = None
+
+    charset_cache.put(key, charset)
+
+    return charset
+
+
 def decode_string(string: bytes, encoding: typing.Optional[str]) -> str:
     """Try anything possible to parse an encoded bytes string and return the result.
 
-    We do this using the encoding hint, if this fails, we try to detect the correct
-    encoding using the chardet module, if that failed we try latin-1, utf-8 and
-    as a last resort ascii.
+    We do this using the encoding hint, if this fails and the string is neither ascii
+    nor valid utf-8, we try to detect the correct encoding using the chardet module,
+    if that failed we try latin-1, utf-8 and as a last resort ascii.
     In any case we always return something.
 
     Args:
@@ -117,11 +197,24 @@ def decode_string(string: bytes, encoding: typing.Optional[str]) -> str:
             pass
 
     if chardet:
-        enc = chardet.detect(string)
-        if not (enc['confidence'] is None or enc['encoding'] is None) and not (enc['confidence'] == 1 and enc['encoding'] == 'ascii'):
-            value = string.decode(enc['encoding'], 'replace')
+        value = ''
+
+        if string.isascii():
+            # 7-bit escape sequence based encodings (ISO-2022-*, HZ) still need to be detected
+            if b'\x1b' not in string and b'~{' not in string:
+                _count_charset_stat('ascii')
+                return string.decode('ascii')
         else:
-            value = string.decode('ascii', 'replace')
+            try:
+                value = string.decode('utf-8-sig')
+            except UnicodeDecodeError:
+                pass
+            else:
+                _count_charset_stat('utf-8')
+
+        if value == '':
+            charset = detect_charset(string, encoding)
+            value = string.decode(charset or 'ascii', 'replace')
     else:
         text = ''
 
@@ -141,7 +234,7 @@ def decode_string(string: bytes, encoding: typing.Optional[str]) -> str:
     return value
 
 
-def workaround_bug_27257(msg: email.message.Message, header: str) -> typing.List[str]:
+def workaround_bug_27257(msg: email.message.Message, header: str, email_regex: typing.Optional[typing.Pattern[str]] = None) -> typing.List[str]:
     """Function to work around bug 27257 and just tries its best using \
     the compat32 policy to extract any meaningful information, i.e. \
     e-mail addresses.
@@ -149,15 +242,20 @@ def workaround_bug_27257(msg: email.message.Message, header: str) -> typing.List
     Args:
         msg (email.message.Message): An e-mail message object.
         header (str): The header field to decode.
+        email_regex (re.Pattern, optional): The regular expression used for matching e-mail addresses.
+                                            Default: eml_parser.regex.email_regex.
 
     Returns:
         list: Returns a list of strings which represent e-mail addresses.
     """
     return_value: typing.List[str] = []
 
+    if email_regex is None:
+        email_regex = eml_parser.regex.email_regex
+
     for value in workaround_field_value_parsing_errors(msg, header):
         if value != '':
-            m = eml_parser.regex.email_regex.findall(value)
+            m = email_regex.findall(value)
             if m:
                 return_value += list(set(m))
 
@@ -193,15 +291,49 @@ def workaround_field_value_parsing_errors(msg: email.message.Message, header: st
     return return_value
 
 
+def _parse_rfc5322_date(line: str) -> typing.Optional[datetime.datetime]:
+    """Parse the common RFC 5322 date format, e.g. "Mon, 12 Jun 2017 22:25:19 +0200 (CEST)".
+
+    Args:
+        line (str): A string which should be parsed.
+
+    Returns:
+        datetime.datetime: Returns a timezone aware datetime.datetime object, or None if the string is in another format.
+    """
+    m = eml_parser.regex.rfc5322_date_regex.match(line)
+    if m is None:
+        return None
+
+    day, month, year, hour, minute, second, sign, tz_hour, tz_minute, tz_name = m.groups()
+
+    if int(year) < 100:
+        # the e-mail module treats those as two digit years
+        return None
+
+    if tz_name is None:
+        offset = int(tz_hour) * 3600 + int(tz_minute) * 60
+        if sign == '-':
+            offset = -offset
+    else:
+        offset = 0
+
+    try:
+        return datetime.datetime(int(year), _MONTHS[month.lower()], int(day), int(hour), int(minute), int(second or 0),
+                                 tzinfo=datetime.timezone(datetime.timedelta(seconds=offset)))
+    except ValueError:
+        return None
+
+
 def robust_string2date(line: str) -> datetime.datetime:
     """Parses a date string to a datetime.datetime object using different methods.
 
     It is guaranteed to always return a valid datetime.datetime object.
-    If first tries the built-in email module method for parsing the date according
-    to related RFC's.
-    If this fails it returns, dateutil is tried. If that fails as well, a datetime.datetime
-    object representing "1970-01-01 00:00:00 +0000" is returned.
+    The common RFC 5322 format is parsed directly, else it first tries the built-in
+    email module method for parsing the date according to related RFC's.
+    If this fails it returns, dateutil is tried. If that fails as well, DEFAULT_DATE,
+    i.e. a datetime.datetime object representing "1970-01-01 00:00:00 +0000", is returned.
     In case there is no timezone information in the parsed date, we set it to UTC.
+    Results are cached in *date_cache*.
 
     Args:
         line (str): A string which should be parsed.
@@ -209,13 +341,21 @@ def robust_string2date(line: str) -> datetime.datetime:
     Returns:
         datetime.datetime: Returns a datetime.datetime object.
     """
-    # "." -> ":" replacement is for fixing bad clients (e.g. outlook express)
-    default_date = '1970-01-01T00:00:00+0000'
-
     # if the input is empty, we return a default date
     if line == '':
-        return dateutil.parser.parse(default_date)
+        return DEFAULT_DATE
+
+    date_ = date_cache.get(line)
+
+    if date_ is None:
+        date_ = _parse_rfc5322_date(line) or _robust_string2date(line)
+        date_cache.put(line, date_)
+
+    return date_
+
 
+def _robust_string2date(line: str) -> datetime.datetime:
+    """Parse a date string using the e-mail module or dateutil, see robust_string2date()."""
     try:
         date_ = email.utils.parsedate_to_datetime(line)
     except (TypeError, ValueError, LookupError):
@@ -225,7 +365,7 @@ def robust_string2date(line: str) -> datetime.datetime:
             date_ = dateutil.parser.parse(line)
         except (AttributeError, ValueError, OverflowError):
             # Now we are facing an invalid date.
-            return dateutil.parser.parse(default_date)
+            return DEFAULT_DATE
 
     if date_.tzname() is None:
         return date_.replace(tzinfo=datetime.timezone.utc)
@@ -9,26 +9,35 @@ from __future__ import annotations
 import base64
 import binascii
 import collections
+import concurrent.futures
+import copy
 import email
 import email.message
+import email.parser
 import email.policy
 import email.utils
 import hashlib
 import ipaddress
+import json
 import logging
+import mmap
+import os
 import os.path
 import re
+import threading
 import typing
 import urllib.parse
-import uuid
 import warnings
 from collections import Counter
 
-import dateutil.parser
-
+import eml_parser.cache
 import eml_parser.decode
+import eml_parser.hashing
+import eml_parser.limits
+import eml_parser.mime
 import eml_parser.regex
 import eml_parser.routing
+import eml_parser.stats
 
 #
 # Georges Toth (c) 2013-2014 <georges@trypill.org>
@@ -62,33 +71,72 @@ import eml_parser.routing
 
 logger = logging.getLogger(__name__)
 
-try:
-    import magic
-except ImportError:
-    magic = None
-else:
-    if not hasattr(magic, 'open'):
-        logger.warning('You are using python-magic, though this module requires file-magic. Disabling magic usage due to incompatibilities.')
-
-        magic = None
-
 __author__ = 'Toth Georges, Jung Paul'
 __email__ = 'georges@trypill.org, georges.toth@govcert.etat.lu'
 __copyright__ = 'Copyright 2013-2014 Georges Toth, Copyright 2013-present GOVCERT Luxembourg'
 __license__ = 'AGPL v3+'
 
+# Chunk size used when reading e-mails from files.
+READ_CHUNK_SIZE = 64 * 1024
+
+# Part of the key of cached results, to be increased whenever the structure of the results changes.
+RESULT_CACHE_VERSION = 1
 
-class EmlParser:
-    """eml-parser class."""
+
+class _ParseContext:
+    """State of a single parsing run.
+
+    Everything which is specific to the e-mail being parsed is kept in here instead of
+    on the EmlParser instance, which allows sharing a single instance between threads.
+    """
+
+    __slots__ = ('msg', 'email_regex', 'whiteip', 'whitefor', 'byhostentry', 'stats', 'limits')
 
     def __init__(self,
+                 msg: email.message.Message,
+                 email_regex: typing.Pattern[str],
+                 whiteip: typing.FrozenSet[str],
+                 whitefor: typing.FrozenSet[str],
+                 byhostentry: typing.Tuple[str, ...],
+                 stats: eml_parser.stats.ParseStats = eml_parser.stats.NULL_STATS,
+                 limits: eml_parser.limits.MessageLimits = eml_parser.limits.NO_LIMITS
+                 ) -> None:
+        self.msg = msg
+        self.email_regex = email_regex
+        self.whiteip = whiteip
+        self.whitefor = whitefor
+        self.byhostentry = byhostentry
+        self.stats = stats
+        self.limits = limits
+
+
+class EmlParser:
+    """eml-parser class.
+
+    Instances do not keep any state specific to a parsed e-mail, thus a single configured
+    instance may be shared between threads.
+    """
+
+    def __init__(self,  # pylint: disable=too-many-arguments
                  include_raw_body: bool = False,
                  include_attachment_data: bool = False,
                  pconf: typing.Optional[dict] = None,
                  policy: email.policy.Policy = email.policy.default,
                  ignore_bad_start: bool = False,
                  email_force_tld: bool = False,
-                 parse_attachments: bool = True
+                 parse_attachments: bool = True,
+                 *,
+                 body_window_size: int = 65536,
+                 hash_algorithms: typing.Iterable[str] = eml_parser.hashing.DEFAULT_ALGORITHMS,
+                 fields: typing.Optional[typing.Iterable[str]] = None,
+                 routing_cache_size: int = 1024,
+                 include_part_id: bool = False,
+                 mime_signatures: bool = False,
+                 include_stats: bool = False,
+                 stats_callback: typing.Optional[typing.Callable[[typing.Dict[str, typing.Any]], None]] = None,
+                 limits: typing.Optional[typing.Dict[str, typing.Any]] = None,
+                 attachment_cache: typing.Optional[eml_parser.cache.Cache] = None,
+                 result_cache: typing.Optional[eml_parser.cache.Cache] = None
                  ) -> None:
         """Initialisation.
 
@@ -109,7 +157,57 @@ class EmlParser:
             parse_attachments (bool, optional): Set this to false if you want to disable the parsing of attachments.
                                                 Please note that HTML attachments as well as other text data marked to be
                                                 in-lined, will always be parsed.
+            body_window_size (int, optional): Bodies are searched for URLs, e-mail addresses, etc. in chunks of
+                                              roughly this number of characters. Default is 65536.
+            hash_algorithms (iterable, optional): Hash algorithms to calculate for attachments, as supported by *hashlib.new*.
+                                                  Default is md5, sha1, sha256 and sha512.
+            fields (iterable, optional): Only return these fields of the result, given as dotted paths, e.g.
+                                         *{'header.from', 'header.subject', 'attachment.hash.sha256'}*.
+                                         Parsing stages whose output is not needed are skipped altogether,
+                                         e.g. received header parsing, body IOC extraction, mime-type detection
+                                         or hash algorithms. By default all fields are returned.
+            routing_cache_size (int, optional): Number of parsed received lines kept in an LRU cache, as the same
+                                                relays show up in many e-mails. 0 disables the cache. Default is 1024.
+            include_part_id (bool, optional): Add a *part_id* to each body and attachment, which is made up of the position
+                                              of the part in the MIME tree (e.g. 1.2) and the start of the SHA-256 hash of
+                                              its content, hence stable across runs. Default is False.
+            mime_signatures (bool, optional): Identify common attachment types (PDF, ZIP/OOXML, PNG, JPEG, GIF, MS-CFB, ELF, PE)
+                                              by their signature without using libmagic. The resulting *mime_type* descriptions are
+                                              less detailed. Default is False.
+            include_stats (bool, optional): Add a *_stats* section to the result, containing the wall-clock and CPU time spent
+                                            in each parsing stage as well as counters like the number of parts and bytes,
+                                            see eml_parser.stats.ParseStats. Default is False.
+            stats_callback (callable, optional): Function called with the statistics (as in the *_stats* section) of every
+                                                 parsed e-mail, e.g. for exporting them to a metrics system. When decoding
+                                                 e-mails in worker processes using decode_many(), it is called in the calling
+                                                 process. Default is None.
+            limits (dict, optional): Resource limits applied to every e-mail, a dict with any of the following keys:
+                                     *max_raw_size* (bytes of the raw e-mail parsed), *max_parts* (MIME parts processed),
+                                     *max_depth* (nesting depth of the MIME parts processed), *max_headers* (header fields and
+                                     received lines processed), *max_body_scan_bytes* (characters of the bodies searched for URLs,
+                                     e-mail addresses, etc.), *max_attachments_hashed* (attachments hashed) and *time_budget*
+                                     (seconds spent per e-mail, checked between parts, bodies and received lines).
+                                     If a limit is hit, the remaining data is skipped and the result is marked with
+                                     *truncated: True* and *limits_hit*, a list of the names of the limits hit.
+                                     Note that the time spent parsing the raw e-mail into a message object cannot be interrupted,
+                                     use *max_raw_size* to bound it. By default no limits are applied.
+            attachment_cache (eml_parser.cache.Cache, optional): Cache of the hashes and mime-types of attachments, keyed by the
+                                                                 size and BLAKE2b hash of their content, thus attachments found in
+                                                                 many e-mails (logos, campaigns) are only hashed and run through
+                                                                 libmagic once. Use an eml_parser.cache.LRUCache for a cache per
+                                                                 process, or an eml_parser.cache.SQLiteCache for a cache shared
+                                                                 between processes and runs. By default nothing is cached.
+            result_cache (eml_parser.cache.Cache, optional): Cache of whole results of decode_email_bytes() and decode_email(), keyed by
+                                                             the SHA-256 hash of the raw e-mail and a fingerprint of the configuration of
+                                                             the parser, thus e-mails parsed before (retries, duplicates) are not parsed
+                                                             again. Results truncated by the *time_budget* limit are not cached. The hits and
+                                                             misses are counted in the statistics (*result_cache_hits*, *result_cache_misses*),
+                                                             see *include_stats*, and by the cache itself, see eml_parser.cache.Cache.info().
+                                                             By default nothing is cached.
         """
+        if body_window_size < 1:
+            raise ValueError('body_window_size must be >= 1')
+
         self.include_raw_body = include_raw_body
         self.include_attachment_data = include_attachment_data
         # If no pconf was specified, default to empty dict
@@ -118,9 +216,49 @@ class EmlParser:
         self.ignore_bad_start = ignore_bad_start
         self.email_force_tld = email_force_tld
         self.parse_attachments = parse_attachments
+        self.body_window_size = body_window_size
+        self.routing_cache = eml_parser.cache.LRUCache(routing_cache_size)
+        self.include_part_id = include_part_id
+        self.mime_detector = eml_parser.mime.MimeDetector(signatures=mime_signatures)
+        self.include_stats = include_stats
+        self.stats_callback = stats_callback
+        self.limits = eml_parser.limits.check_limits(limits)
+
+        hash_algorithms = tuple(hash_algorithms)
+        self.fields = None if fields is None else frozenset(fields)
+        self._fields_tree = _build_fields_tree(self.fields)
+
+        self._want_received = self._wants_any('header.received', 'header.received_email', 'header.received_domain', 'header.received_ip',
+                                              'header.received_foremail', 'header.received_src')
+        self._want_header_fields = self._wants_any('header.header')
+        self._want_body = self._wants_any('body')
+        self._want_body_iocs = self._wants_any('body.uri', 'body.email', 'body.domain', 'body.ip',
+                                               'body.uri_hash', 'body.email_hash', 'body.domain_hash', 'body.ip_hash')
+        self._want_body_hash = self._wants_any('body.hash')
+        self._want_attachment = self._wants_any('attachment')
+        self._want_attachment_mime = self._wants_any('attachment.mime_type', 'attachment.mime_type_short')
+
+        if self.fields is None or self.fields & {'attachment', 'attachment.hash'}:
+            attachment_hash_algorithms = hash_algorithms
+        else:
+            # only calculate explicitly requested hashes, e.g. attachment.hash.sha256
+            attachment_hash_algorithms = tuple(sorted(x.split('.', 2)[2] for x in self.fields if x.startswith('attachment.hash.')))
+
+        self.hasher = eml_parser.hashing.Hasher(attachment_hash_algorithms)
+
+        self.attachment_cache = attachment_cache
+        # Cached results depend on the hash algorithms and on how mime-types are determined, which
+        # is part of the key as a cache may be shared by differently configured parsers.
+        if not self._want_attachment_mime:
+            mime_mode = 'none'
+        else:
+            mime_mode = '{}{}'.format('signatures+' if mime_signatures else '', 'magic' if eml_parser.mime.magic is not None else 'nomagic')
+        self._attachment_cache_prefix = '{}|{}|'.format(','.join(self.hasher.algorithms), mime_mode)
 
         if self.email_force_tld:
-            eml_parser.regex.email_regex = eml_parser.regex.email_force_tld_regex
+            self.email_regex = eml_parser.regex.email_force_tld_regex
+        else:
+            self.email_regex = eml_parser.regex.email_regex
 
         # If no whitelisting is required, set to emtpy list
         if 'whiteip' not in self.pconf:
@@ -129,8 +267,123 @@ class EmlParser:
         if 'whitefor' not in self.pconf:
             self.pconf['whitefor'] = []
 
+        # Only used by parse_email() and headeremail2list() if called without a message, kept for backwards compatibility.
         self.msg: typing.Optional[email.message.Message] = None
 
+        # Keep the constructor arguments around in order to be able to re-create an
+        # identically configured parser in worker processes (see decode_many).
+        self._config: typing.Dict[str, typing.Any] = {'include_raw_body': include_raw_body,
+                                                      'include_attachment_data': include_attachment_data,
+                                                      'pconf': self.pconf,
+                                                      'policy': policy,
+                                                      'ignore_bad_start': ignore_bad_start,
+                                                      'email_force_tld': email_force_tld,
+                                                      'parse_attachments': parse_attachments,
+                                                      'body_window_size': body_window_size,
+                                                      'hash_algorithms': hash_algorithms,
+                                                      'fields': self.fields,
+                                                      'routing_cache_size': routing_cache_size,
+                                                      'include_part_id': include_part_id,
+                                                      'mime_signatures': mime_signatures,
+                                                      # the callback is called in the calling process, based on the statistics in the result
+                                                      'include_stats': include_stats or stats_callback is not None,
+                                                      'limits': self.limits,
+                                                      'attachment_cache': attachment_cache,
+                                                      'result_cache': result_cache
+                                                      }
+
+        self.result_cache = result_cache
+        self._result_cache_prefix = self._config_fingerprint()
+
+    def _wants_any(self, *paths: str) -> bool:
+        """Check whether any of the given fields, or any field below them, is part of the configured fields."""
+        if self.fields is None:
+            return True
+
+        for path in paths:
+            for field in self.fields:
+                if field == path or field.startswith(path + '.') or path.startswith(field + '.'):
+                    return True
+
+        return False
+
+    def _config_fingerprint(self) -> str:
+        """Return a hash of the configuration options influencing the results, used as part of the key of cached results."""
+        config = {k: v for k, v in self._config.items() if k not in ('attachment_cache', 'result_cache', 'include_stats')}
+        config['_version'] = RESULT_CACHE_VERSION
+        config['_magic'] = eml_parser.mime.magic is not None
+
+        def default(obj: typing.Any) -> typing.Any:
+            if isinstance(obj, (set, frozenset)):
+                return sorted(obj)
+
+            # e.g. the policy
+            return repr(obj)
+
+        return hashlib.sha256(json.dumps(config, sort_keys=True, default=default).encode('utf-8')).hexdigest()[:16]
+
+    def _decode_cached(self,
+                       raw_digest: str,
+                       ignore_bad_start: bool,
+                       decode: typing.Callable[[eml_parser.stats.ParseStats], dict]
+                       ) -> dict:
+        """Return the cached result of a raw e-mail, or decode it using *decode* and cache the result.
+
+        Args:
+            raw_digest (str): SHA-256 hash of the raw e-mail.
+            ignore_bad_start (bool): Whether the invalid start of the e-mail is ignored.
+            decode (callable): Function decoding the e-mail, called with the statistics object to use.
+
+        Returns:
+            dict: The result, which does not share any objects with the cache.
+        """
+        if self.result_cache is None:
+            raise RuntimeError('No result cache configured.')
+
+        key = '{}:{:d}:{}'.format(self._result_cache_prefix, self.ignore_bad_start or ignore_bad_start, raw_digest)
+        stats = self._new_stats()
+
+        with stats.stage('result_cache'):
+            cached = self.result_cache.get(key)
+
+        if cached is None:
+            stats.count('result_cache_misses')
+            result = decode(stats)
+
+            # results truncated by the time budget depend on the load of the system
+            if 'time_budget' not in result.get('limits_hit', ()):
+                self.result_cache.put(key, copy.deepcopy({k: v for k, v in result.items() if k != '_stats'}))
+
+            return result
+
+        result = copy.deepcopy(cached)
+
+        if stats:
+            stats.count('result_cache_hits')
+            stats.finish()
+
+            if self.stats_callback is not None:
+                self.stats_callback(stats.to_dict())
+
+            if self.include_stats:
+                result['_stats'] = stats.to_dict()
+
+        return result
+
+    def _new_stats(self) -> eml_parser.stats.ParseStats:
+        """Return the object collecting the statistics of parsing an e-mail, which does nothing if statistics are disabled."""
+        if self.include_stats or self.stats_callback is not None:
+            return eml_parser.stats.ParseStats()
+
+        return eml_parser.stats.NULL_STATS
+
+    def _new_limits(self) -> eml_parser.limits.MessageLimits:
+        """Return the object keeping track of the resource limits while parsing an e-mail."""
+        if self.limits:
+            return eml_parser.limits.MessageLimits(self.limits)
+
+        return eml_parser.limits.NO_LIMITS
+
     def decode_email(self, eml_file: 'os.PathLike[str]', ignore_bad_start: bool = False) -> dict:
         """Function for decoding an EML file into an easily parsable structure.
 
@@ -139,6 +392,9 @@ class EmlParser:
         Besides just parsing, this function also computes hashes and extracts meta
         information from the source file.
 
+        The file is memory-mapped and fed to the e-mail parser in chunks, thus no
+        copy of the whole raw e-mail is kept in memory.
+
         Args:
             eml_file: Path to the file to be parsed. os.PathLike objects are supported.
             ignore_bad_start: Ignore invalid file start for this run. This has a considerable performance impact.
@@ -148,9 +404,98 @@ class EmlParser:
                   key-value pairs.
         """
         with open(eml_file, 'rb') as fp:
-            raw_email = fp.read()
+            try:
+                mm = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+            except (ValueError, OSError):
+                # empty files cannot be mapped, neither can some special files
+                return self.decode_email_fileobj(fp, ignore_bad_start=ignore_bad_start)
+
+            with mm:
+                if self.result_cache is not None:
+                    return self._decode_cached(hashlib.sha256(mm).hexdigest(), ignore_bad_start,
+                                               lambda stats: self._decode_mmap(mm, ignore_bad_start, stats))
+
+                return self._decode_mmap(mm, ignore_bad_start)
+
+    def _decode_mmap(self, mm: mmap.mmap, ignore_bad_start: bool, stats: typing.Optional[eml_parser.stats.ParseStats] = None) -> dict:
+        """Decode a memory-mapped EML file, see :meth:`decode_email`."""
+        if stats is None:
+            stats = self._new_stats()
+        limits = self._new_limits()
+
+        with stats.stage('mime_parse'):
+            parser = email.parser.BytesFeedParser(policy=self.policy)
+
+            offset = _find_header_start(mm) if self.ignore_bad_start or ignore_bad_start else 0
+            end = offset + limits.raw_size(len(mm) - offset)
+
+            for pos in range(offset, end, READ_CHUNK_SIZE):
+                parser.feed(mm[pos:min(pos + READ_CHUNK_SIZE, end)])
+
+            stats.count('raw_bytes', end - offset)
+            msg = parser.close()
+
+        return ParsedEmail(self, msg, stats, limits).to_dict()
+
+    def decode_email_fileobj(self, fp: typing.BinaryIO, ignore_bad_start: bool = False) -> dict:
+        """Function for decoding an EML read from a binary file-like object into an easily parsable structure.
+
+        The e-mail is read and fed to the e-mail parser in chunks, thus no copy of the
+        whole raw e-mail is kept in memory. This allows parsing e-mails from e.g. pipes or sockets.
+
+        Args:
+            fp: A file-like object opened in binary mode.
+            ignore_bad_start: Ignore invalid file start for this run. This has a considerable performance impact.
+
+        Returns:
+            dict: A dictionary with the content of the EML parsed and broken down into
+                  key-value pairs.
+        """
+        stats = self._new_stats()
+        limits = self._new_limits()
+
+        with stats.stage('mime_parse'):
+            parser = email.parser.BytesFeedParser(policy=self.policy)
+            size = 0
+
+            def feed(data: bytes) -> bool:
+                """Feed data to the parser, returning False if the size limit has been reached."""
+                nonlocal size
+
+                allowed = limits.raw_size(size + len(data)) - size
+                parser.feed(data[:allowed] if allowed < len(data) else data)
+                size += allowed
+
+                return allowed == len(data)
+
+            complete = True
+
+            if self.ignore_bad_start or ignore_bad_start:
+                buffer = b''
+
+                while True:
+                    chunk = fp.read(READ_CHUNK_SIZE)
+                    buffer += chunk
+
+                    offset = _find_header_start(buffer)
+                    if offset < len(buffer):
+                        complete = feed(buffer[offset:])
+                        break
+
+                    if not chunk:
+                        break
+
+            while complete:
+                chunk = fp.read(READ_CHUNK_SIZE)
+                if not chunk:
+                    break
+
+                complete = feed(chunk)
 
-        return self.decode_email_bytes(raw_email, ignore_bad_start=ignore_bad_start)
+            stats.count('raw_bytes', size)
+            msg = parser.close()
+
+        return ParsedEmail(self, msg, stats, limits).to_dict()
 
     def decode_email_bytes(self, eml_file: bytes, ignore_bad_start: bool = False) -> dict:
         """Function for decoding an EML file into an easily parsable structure.
@@ -168,73 +513,208 @@ class EmlParser:
             dict: A dictionary with the content of the EML parsed and broken down into
                   key-value pairs.
         """
-        if self.ignore_bad_start or ignore_bad_start:
-            # Skip invalid start of file
-            # Note that this has a considerable performance impact, which is why it is disabled by default.
-            _eml_file = b''
+        if self.result_cache is not None:
+            return self._decode_cached(hashlib.sha256(eml_file).hexdigest(), ignore_bad_start,
+                                       lambda stats: self._decode_bytes(eml_file, ignore_bad_start, stats))
+
+        return self._decode_bytes(eml_file, ignore_bad_start)
+
+    def _decode_bytes(self, eml_file: bytes, ignore_bad_start: bool, stats: typing.Optional[eml_parser.stats.ParseStats] = None) -> dict:
+        """Decode a raw e-mail, see :meth:`decode_email_bytes`."""
+        if stats is None:
+            stats = self._new_stats()
+        limits = self._new_limits()
+
+        with stats.stage('mime_parse'):
+            if self.ignore_bad_start or ignore_bad_start:
+                # Skip invalid start of file
+                # Note that this has a considerable performance impact, which is why it is disabled by default.
+                offset = _find_header_start(eml_file)
+                if offset:
+                    eml_file = eml_file[offset:]
+
+            size = limits.raw_size(len(eml_file))
+            if size < len(eml_file):
+                eml_file = eml_file[:size]
+
+            stats.count('raw_bytes', size)
+            msg = email.message_from_bytes(eml_file, policy=self.policy)
+
+        return ParsedEmail(self, msg, stats, limits).to_dict()
+
+    def decode_many(self,
+                    items: typing.Iterable[typing.Union[bytes, str, 'os.PathLike[str]']],
+                    workers: typing.Optional[int] = None,
+                    ordered: bool = True,
+                    chunksize: int = 1
+                    ) -> typing.Iterator[typing.Tuple[int, typing.Union[dict, Exception]]]:
+        """Decode a batch of e-mails, optionally spread over a pool of worker processes.
+
+        Every worker process creates its own parser from the configuration of this instance once,
+        at start-up, hence only the e-mails themselves are sent to the workers.
+        Errors are not raised but returned in place of the result, thus a broken e-mail does not
+        stop the batch.
 
-            if b':' not in eml_file.split(b'\n', 1):
-                start = True
-                for line in eml_file.split(b'\n'):
-                    if start and b':' not in line:
-                        continue
+        Args:
+            items: An iterable of raw e-mails (bytes) and/or paths to EML files. The iterable is consumed
+                   lazily, thus it may be a generator over a very large number of e-mails.
+            workers: Number of worker processes. Defaults to the number of CPUs. With a value of 1 or
+                     less the e-mails are decoded in the current process.
+            ordered: If True (default), results are yielded in input order, else as soon as they are available.
+            chunksize: Number of e-mails sent to a worker at once. Values larger than 1 lower the
+                       inter-process communication overhead when decoding many small e-mails.
 
-                    start = False
+        Yields:
+            tuple: Tuples of the form *(index, result)* with *index* being the position of the e-mail
+                   in *items* and *result* either the dict as returned by :meth:`decode_email_bytes`
+                   or the exception which occurred while decoding this e-mail.
+        """
+        if chunksize < 1:
+            raise ValueError('chunksize must be >= 1')
 
-                    _eml_file += line
-            else:
-                _eml_file = eml_file
-        else:
-            _eml_file = eml_file
+        if workers is None:
+            workers = os.cpu_count() or 1
+
+        chunks = _chunked(enumerate(items), chunksize)
+
+        if workers <= 1:
+            for chunk in chunks:
+                yield from _decode_chunk(self, chunk)
 
-        self.msg = email.message_from_bytes(_eml_file, policy=self.policy)
+            return
 
-        return self.parse_email()
+        # Limit the number of chunks in flight in order not to read the whole input into memory.
+        max_pending = workers * 4
 
-    def parse_email(self) -> dict:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers,
+                                                    initializer=_init_worker,
+                                                    initargs=(self._config,)) as executor:
+            pending: typing.Deque[typing.Tuple[typing.List[typing.Tuple[int, typing.Any]], concurrent.futures.Future]] = collections.deque()
+            chunks_exhausted = False
+
+            while True:
+                while not chunks_exhausted and len(pending) < max_pending:
+                    next_chunk = next(chunks, None)
+                    if next_chunk is None:
+                        chunks_exhausted = True
+                    else:
+                        pending.append((next_chunk, executor.submit(_decode_chunk_worker, next_chunk)))
+
+                if not pending:
+                    break
+
+                if ordered:
+                    chunk, future = pending.popleft()
+                else:
+                    concurrent.futures.wait([f for _, f in pending], return_when=concurrent.futures.FIRST_COMPLETED)
+                    # at least one chunk is done
+                    entry = [e for e in pending if e[1].done()][0]
+                    pending.remove(entry)
+                    chunk, future = entry
+
+                try:
+                    results = future.result()
+                except Exception as e:  # pylint: disable=broad-except
+                    # The whole chunk failed, e.g. because a result could not be pickled.
+                    for index, _ in chunk:
+                        yield index, e
+                else:
+                    for index, result in results:
+                        if self.stats_callback is not None and isinstance(result, dict):
+                            self.stats_callback(result['_stats'] if self.include_stats else result.pop('_stats'))
+
+                        yield index, result
+
+    def _new_context(self,
+                     msg: email.message.Message,
+                     stats: typing.Optional[eml_parser.stats.ParseStats] = None,
+                     limits: typing.Optional[eml_parser.limits.MessageLimits] = None
+                     ) -> _ParseContext:
+        """Create the context for parsing the given message."""
+        return _ParseContext(msg=msg,
+                             email_regex=self.email_regex,
+                             whiteip=frozenset(self.pconf.get('whiteip', [])),
+                             whitefor=frozenset(self.pconf.get('whitefor', [])),
+                             byhostentry=tuple(x.lower() for x in self.pconf.get('byhostentry', []) or []),
+                             stats=self._new_stats() if stats is None else stats,
+                             limits=self._new_limits() if limits is None else limits
+                             )
+
+    def parse_email(self, msg: typing.Optional[email.message.Message] = None) -> dict:
         """Parse an e-mail and return a dictionary containing the various parts of\
         the e-mail broken down into key-value pairs.
 
         Args:
-          msg (str): Raw EML e-mail string.
-          include_raw_body (bool, optional): If True, includes the raw body in the resulting
-                                   dictionary. Defaults to False.
-          include_attachment_data (bool, optional): If True, includes the full attachment
-                                                    data in the resulting dictionary.
-                                                    Defaults to False.
-          pconf (dict, optional): A dict with various optional configuration parameters,
-                                  e.g. whitelist IPs, whitelist e-mail addresses, etc.
-
-          parse_attachments (bool, optional): Set this to false if you want to disable the parsing of attachments.
-                                              Please note that HTML attachments as well as other text data marked to be
-                                              in-lined, will always be parsed.
+          msg (email.message.Message, optional): The e-mail message object to parse. For backwards
+                                                 compatibility, *self.msg* is used if not specified.
 
         Returns:
           dict: A dictionary with the content of the EML parsed and broken down into
                 key-value pairs.
         """
-        header: typing.Dict[str, typing.Any] = {}
-        report_struc: typing.Dict[str, typing.Any] = {}  # Final structure
-        headers_struc: typing.Dict[str, typing.Any] = {}  # header_structure
-        bodys_struc: typing.Dict[str, typing.Any] = {}  # body structure
+        if msg is None:
+            msg = self.msg
 
-        if self.msg is None:
+        if msg is None:
             raise ValueError('msg is not set.')
 
+        return ParsedEmail(self, msg).to_dict()
+
+    def parse_lazy(self, eml_file: typing.Union[bytes, email.message.Message], ignore_bad_start: bool = False) -> ParsedEmail:
+        """Parse an e-mail into a :class:`ParsedEmail` object whose sections are only computed when accessed.
+
+        This is considerably faster than :meth:`decode_email_bytes` if only a part of the
+        result is needed, e.g. only some header fields.
+
+        Args:
+            eml_file: Contents of the raw EML file or an already parsed e-mail message object.
+            ignore_bad_start: Ignore invalid file start for this run. This has a considerable performance impact.
+
+        Returns:
+            ParsedEmail: The lazily parsed e-mail.
+        """
+        if isinstance(eml_file, email.message.Message):
+            return ParsedEmail(self, eml_file)
+
+        stats = self._new_stats()
+        limits = self._new_limits()
+
+        with stats.stage('mime_parse'):
+            if self.ignore_bad_start or ignore_bad_start:
+                offset = _find_header_start(eml_file)
+                if offset:
+                    eml_file = eml_file[offset:]
+
+            size = limits.raw_size(len(eml_file))
+            if size < len(eml_file):
+                eml_file = eml_file[:size]
+
+            stats.count('raw_bytes', size)
+            msg = email.message_from_bytes(eml_file, policy=self.policy)
+
+        return ParsedEmail(self, msg, stats, limits)
+
+    def _parse_header(self, ctx: _ParseContext) -> typing.Dict[str, typing.Any]:
+        """Parse the main header fields (subject, from, to, cc, delivered-to and date) of an e-mail.
+
+        Note that this might modify broken header fields of the message in order to work around parsing errors.
+        """
+        headers_struc: typing.Dict[str, typing.Any] = {}
+
         # parse and decode subject
-        subject = self.msg.get('subject', '')
+        subject = ctx.msg.get('subject', '')
         headers_struc['subject'] = eml_parser.decode.decode_field(subject)
 
         # If parsing had problems, report it
-        if self.msg.defects:
+        if ctx.msg.defects:
             headers_struc['defect'] = []
-            for exception in self.msg.defects:
+            for exception in ctx.msg.defects:
                 headers_struc['defect'].append(str(exception))
 
         # parse and decode "from"
         # @TODO verify if this hack is necessary for other e-mail fields as well
         try:
-            msg_header_field = str(self.msg.get('from', '')).lower()
+            msg_header_field = str(ctx.msg.get('from', '')).lower()
         except (IndexError, AttributeError):
             # We have hit current open issue #27257
             # https://bugs.python.org/issue27257
@@ -242,64 +722,76 @@ class EmlParser:
             #
             logger.exception('We hit bug 27257!')
 
-            _from = eml_parser.decode.workaround_bug_27257(self.msg, 'from')
-            self.msg.__delitem__('from')
+            _from = eml_parser.decode.workaround_bug_27257(ctx.msg, 'from', ctx.email_regex)
+            ctx.msg.__delitem__('from')
 
             if _from:
-                self.msg.add_header('from', _from[0])
+                ctx.msg.add_header('from', _from[0])
                 __from = _from[0].lower()
             else:
-                self.msg.add_header('from', '')
+                ctx.msg.add_header('from', '')
                 __from = ''
 
             msg_header_field = __from
 
         if msg_header_field != '':
-            m = eml_parser.regex.email_regex.search(msg_header_field)
+            m = ctx.email_regex.search(msg_header_field)
             if m:
                 headers_struc['from'] = m.group(1)
             else:
-                from_ = email.utils.parseaddr(self.msg.get('from', '').lower())
+                from_ = email.utils.parseaddr(ctx.msg.get('from', '').lower())
                 headers_struc['from'] = from_[1]
 
         # parse and decode "to"
-        headers_struc['to'] = self.headeremail2list('to')
+        headers_struc['to'] = self.headeremail2list('to', ctx.msg)
         # parse and decode "cc"
-        headers_struc['cc'] = self.headeremail2list('cc')
+        headers_struc['cc'] = self.headeremail2list('cc', ctx.msg)
         if not headers_struc['cc']:
             headers_struc.pop('cc')
 
         # parse and decode delivered-to
-        headers_struc['delivered_to'] = self.headeremail2list('delivered-to')
+        headers_struc['delivered_to'] = self.headeremail2list('delivered-to', ctx.msg)
         if not headers_struc['delivered_to']:
             headers_struc.pop('delivered_to')
 
         # parse and decode Date
         # If date field is present
-        if 'date' in self.msg:
+        if 'date' in ctx.msg:
             try:
-                msg_date = self.msg.get('date')
+                msg_date = ctx.msg.get('date')
             except TypeError:
                 logger.warning('Error parsing date.', exc_info=True)
-                headers_struc['date'] = dateutil.parser.parse('1970-01-01T00:00:00+0000')
-                self.msg.replace_header('date', headers_struc['date'])
+                headers_struc['date'] = eml_parser.decode.DEFAULT_DATE
+                ctx.msg.replace_header('date', headers_struc['date'])
             else:
                 headers_struc['date'] = eml_parser.decode.robust_string2date(msg_date)
 
         else:
             # If date field is absent...
-            headers_struc['date'] = dateutil.parser.parse('1970-01-01T00:00:00+0000')
+            headers_struc['date'] = eml_parser.decode.DEFAULT_DATE
+
+        return headers_struc
+
+    def _parse_received(self, ctx: _ParseContext) -> typing.Dict[str, typing.Any]:
+        """Parse the received header fields of an e-mail."""
+        received_struc: typing.Dict[str, typing.Any] = {}
 
         # mail receiver path / parse any domain, e-mail
         # @TODO parse case where domain is specified but in parentheses only an IP
-        headers_struc['received'] = []
-        headers_struc['received_email'] = []
-        headers_struc['received_domain'] = []
-        headers_struc['received_ip'] = []
+        received_struc['received'] = []
+        received_struc['received_email'] = []
+        received_struc['received_domain'] = []
+        received_struc['received_ip'] = []
         try:
             found_smtpin: collections.Counter = collections.Counter()  # Array for storing potential duplicate "HOP"
 
-            for received_line in self.msg.get_all('received', []):
+            received_lines = ctx.msg.get_all('received', [])
+
+            for received_line in received_lines[:ctx.limits.headers(len(received_lines))]:
+                if ctx.limits.time_exceeded():
+                    break
+
+                ctx.stats.count('received_lines')
                 line = str(received_line).lower()
 
                 received_line_flat = re.sub(r'(\r|\n|\s|\t)+', ' ', line, flags=re.UNICODE)
@@ -312,7 +804,7 @@ class EmlParser:
                 #   by list
                 #   with string
                 #   warning list
-                parsed_routing = eml_parser.routing.parserouting(received_line_flat)
+                parsed_routing = self.parserouting(received_line_flat, ctx.email_regex)
 
                 # If required collect the IP of the gateway that have injected the mail.
                 # Iterate all parsed item and find IP
@@ -321,14 +813,12 @@ class EmlParser:
                 # Warning .. It may be spoofed !!
                 # It add a warning if multiple identical items are found.
 
-                if self.pconf.get('byhostentry'):
+                if ctx.byhostentry:
                     for by_item in parsed_routing.get('by', []):
-                        for byhostentry_ in self.pconf['byhostentry']:
-                            byhostentry = byhostentry_.lower()
-                            # print ("%s %s" % (byhostentry, by_item))
+                        for byhostentry in ctx.byhostentry:
                             if byhostentry in by_item:
                                 # Save the last Found.. ( most external )
-                                headers_struc['received_src'] = parsed_routing.get('from')
+                                received_struc['received_src'] = parsed_routing.get('from')
 
                                 # Increment watched by detection counter, and warn if needed
                                 found_smtpin[byhostentry] += 1
@@ -338,7 +828,7 @@ class EmlParser:
                                     else:
                                         parsed_routing['warning'] = ['Duplicate SMTP by entrypoint']
 
-                headers_struc['received'].append(parsed_routing)
+                received_struc['received'].append(parsed_routing)
 
                 # Parse IPs in "received headers"
                 ips_in_received_line = eml_parser.regex.ipv6_regex.findall(received_line_flat) + \
@@ -349,8 +839,8 @@ class EmlParser:
                     except ValueError:
                         logger.debug('Invalid IP in received line - "{}"'.format(ip))
                     else:
-                        if not (ip_obj.is_private or str(ip_obj) in self.pconf['whiteip']):
-                            headers_struc['received_ip'].append(str(ip_obj))
+                        if not (ip_obj.is_private or str(ip_obj) in ctx.whiteip):
+                            received_struc['received_ip'].append(str(ip_obj))
 
                 # search for domain
                 for m in eml_parser.regex.recv_dom_regex.findall(received_line_flat):
@@ -360,54 +850,82 @@ class EmlParser:
                         # we find IPs using the previous IP crawler, hence we ignore them
                         # here.
                         # iff the regex fails, we add the entry
-                        headers_struc['received_domain'].append(m)
+                        received_struc['received_domain'].append(m)
 
                 # search for e-mail addresses
-                for mail_candidate in eml_parser.regex.email_regex.findall(received_line_flat):
+                for mail_candidate in ctx.email_regex.findall(received_line_flat):
                     if mail_candidate not in parsed_routing.get('for', []):
-                        headers_struc['received_email'] += [mail_candidate]
+                        received_struc['received_email'] += [mail_candidate]
 
         except TypeError:  # Ready to parse email without received headers.
             logger.exception('Exception occurred while parsing received lines.')
 
         # Concatenate for emails into one array | uniq
         # for rapid "find"
-        headers_struc['received_foremail'] = []
-        if 'received' in headers_struc:
-            for _parsed_routing in headers_struc['received']:
+        received_struc['received_foremail'] = []
+        if 'received' in received_struc:
+            for _parsed_routing in received_struc['received']:
                 for itemfor in _parsed_routing.get('for', []):
-                    if itemfor not in self.pconf['whitefor']:
-                        headers_struc['received_foremail'].append(itemfor)
+                    if itemfor not in ctx.whitefor:
+                        received_struc['received_foremail'].append(itemfor)
 
         # Uniq data found
-        headers_struc['received_email'] = list(set(headers_struc['received_email']))
-        headers_struc['received_domain'] = list(set(headers_struc['received_domain']))
-        headers_struc['received_ip'] = list(set(headers_struc['received_ip']))
+        received_struc['received_email'] = list(set(received_struc['received_email']))
+        received_struc['received_domain'] = list(set(received_struc['received_domain']))
+        received_struc['received_ip'] = list(set(received_struc['received_ip']))
 
         # Clean up if empty
-        if not headers_struc['received_email']:
-            del headers_struc['received_email']
+        if not received_struc['received_email']:
+            del received_struc['received_email']
 
-        if 'received_foremail' in headers_struc:
-            if not headers_struc['received_foremail']:
-                del headers_struc['received_foremail']
+        if 'received_foremail' in received_struc:
+            if not received_struc['received_foremail']:
+                del received_struc['received_foremail']
             else:
-                headers_struc['received_foremail'] = list(set(headers_struc['received_foremail']))
+                received_struc['received_foremail'] = list(set(received_struc['received_foremail']))
 
-        if not headers_struc['received_domain']:
-            del headers_struc['received_domain']
+        if not received_struc['received_domain']:
+            del received_struc['received_domain']
 
-        if not headers_struc['received_ip']:
-            del headers_struc['received_ip']
+        if not received_struc['received_ip']:
+            del received_struc['received_ip']
         ####################
 
-        # Parse text body
-        raw_body = self.get_raw_body_text(self.msg)
+        return received_struc
+
+    def parserouting(self, line: str, email_regex: typing.Optional[typing.Pattern[str]] = None) -> typing.Dict[str, typing.Any]:
+        """Parse a flattened received line, memoizing the results of the routing module.
+
+        Statistics of the cache are available through *self.routing_cache.info()*.
+
+        Args:
+            line (str): Received line to be parsed.
+            email_regex (re.Pattern, optional): The regular expression used for matching e-mail addresses.
+                                                Default: the regular expression configured for this parser.
+
+        Returns:
+            dict: Returns a dict with the extracted information, which may be modified by the caller.
+        """
+        if email_regex is None:
+            email_regex = self.email_regex
 
-        if self.include_raw_body:
-            bodys_struc['raw_body'] = raw_body
+        key = (line, email_regex.pattern)
+        parsed_routing = self.routing_cache.get(key)
 
-        bodys = {}
+        if parsed_routing is None:
+            parsed_routing = eml_parser.routing.parserouting(line, email_regex)
+            self.routing_cache.put(key, parsed_routing)
+
+        # Copy the cached lists, as they are modified while collecting the received information.
+        return {k: list(v) if isinstance(v, list) else v for k, v in parsed_routing.items()}
+
+    def _parse_bodies(self, ctx: _ParseContext) -> typing.List[typing.Dict[str, typing.Any]]:
+        """Parse the body parts of an e-mail."""
+        # Parse text body
+        with ctx.stats.stage('body.decode'):
+            raw_body = self._get_raw_body_parts(ctx.msg, limits=ctx.limits)
+
+        bodys: typing.List[typing.Dict[str, typing.Any]] = []
 
         # Is it a multipart email ?
         if len(raw_body) == 1:
@@ -416,39 +934,41 @@ class EmlParser:
             multipart = True
 
         for body_tup in raw_body:
+            if ctx.limits.time_exceeded():
+                break
+
             bodie: typing.Dict[str, typing.Any] = {}
-            _, body, body_multhead = body_tup
+            _, body, body_multhead, part_path = body_tup
+            ctx.stats.count('bodies')
+            ctx.stats.count('body_chars', len(body))
             # Parse any URLs and mail found in the body
-            list_observed_urls: typing.List[str] = []
+            list_observed_urls: typing.Counter[str] = Counter()
             list_observed_email: typing.Counter[str] = Counter()
             list_observed_dom: typing.Counter[str] = Counter()
             list_observed_ip: typing.Counter[str] = Counter()
 
             # If we start directly a findall on 500K+ body we got time and memory issues...
-            # if more than 4K.. lets cheat, we will cut around the thing we search "://, @, ."
-            # in order to reduce regex complexity.
-            for body_slice in self.string_sliding_window_loop(body):
-                list_observed_urls = self.get_uri_ondata(body_slice)
-                for match in eml_parser.regex.email_regex.findall(body_slice):
-                    list_observed_email[match.lower()] = 1
-                for match in eml_parser.regex.dom_regex.findall(body_slice):
-                    list_observed_dom[match.lower()] = 1
-                for match in eml_parser.regex.ipv4_regex.findall(body_slice):
-                    try:
-                        ipaddress_match = ipaddress.ip_address(match)
-                    except ValueError:
-                        continue
-                    else:
-                        if not (ipaddress_match.is_private or match in self.pconf['whiteip']):
-                            list_observed_ip[match] = 1
-                for match in eml_parser.regex.ipv6_regex.findall(body_slice):
-                    try:
-                        ipaddress_match = ipaddress.ip_address(match)
-                    except ValueError:
-                        continue
-                    else:
-                        if not (ipaddress_match.is_private or match in self.pconf['whiteip']):
-                            list_observed_ip[match] = 1
+            # Thus scan large bodies in chunks, which are cut at whitespace, < or > in order
+            # not to split any URL, e-mail address, etc.
+            with ctx.stats.stage('body.iocs'):
+                for body_slice in self.string_sliding_window_loop(body, self.body_window_size) if self._want_body_iocs else ():
+                    if ctx.limits.time_exceeded():
+                        break
+
+                    scan_size = ctx.limits.body_scan_size(len(body_slice))
+                    if scan_size < len(body_slice):
+                        # scan the part of the slice within the limit, cut at whitespace, < or > as well
+                        m = eml_parser.regex.window_last_boundary_regex.match(body_slice, 0, scan_size)
+                        if m is None:
+                            break
+
+                        body_slice = m.group()
+
+                    iocs = self.get_iocs_ondata(body_slice, ctx.email_regex, ctx.whiteip)
+                    list_observed_urls.update(dict.fromkeys(iocs['uri'], 1))
+                    list_observed_email.update(dict.fromkeys(iocs['email'], 1))
+                    list_observed_dom.update(dict.fromkeys(iocs['domain'], 1))
+                    list_observed_ip.update(dict.fromkeys(iocs['ip'], 1))
 
             # Report uri,email and observed domain or hash if no raw body
             if self.include_raw_body:
@@ -523,25 +1043,42 @@ class EmlParser:
                 bodie['content_type'] = header_val.split(';', 1)[0].strip()
 
             # Hash the body
-            bodie['hash'] = hashlib.sha256(body.encode('utf-8')).hexdigest()
+            if self._want_body_hash:
+                with ctx.stats.stage('body.hash'):
+                    bodie['hash'] = eml_parser.hashing.hash_text(body)
 
-            uid = str(uuid.uuid1())
-            bodys[uid] = bodie
+            if self.include_part_id:
+                bodie['part_id'] = _part_id(part_path, bodie.get('hash') or eml_parser.hashing.hash_text(body))
 
-        bodys_struc = bodys
+            bodys.append(bodie)
+
+        return bodys
+
+    def _parse_header_fields(self, ctx: _ParseContext) -> typing.Dict[str, typing.List[typing.Any]]:
+        """Collect all header fields of an e-mail."""
+        header: typing.Dict[str, typing.Any] = {}
 
         # Get all other bulk raw headers
         # "a","toto"           a: [toto,titi]
         # "a","titi"   --->    c: [truc]
         # "c","truc"
         #
-        for k in set(self.msg.keys()):
+        keys = ctx.msg.keys()
+        count = ctx.limits.headers(len(keys))
+
+        # If the number of header fields is limited, only the first ones are collected.
+        quota: typing.Optional[typing.Counter[str]] = None
+        if count < len(keys):
+            keys = keys[:count]
+            quota = Counter(k.lower() for k in keys)
+
+        for k in set(keys):
             # We are using replace . to : for avoiding issue in mongo
             k = k.lower()  # Lot of lower, pre-compute...
             decoded_values = []
 
             try:
-                for value in self.msg.get_all(k, []):
+                for value in ctx.msg.get_all(k, []):
                     if value:
                         decoded_values.append(value)
             except (IndexError, AttributeError, TypeError):
@@ -549,7 +1086,10 @@ class EmlParser:
                 # Try to work around this by using a relaxed policy, if possible.
                 # Parsing might not give meaningful results in this case!
                 logger.error('ERROR: Field value parsing error, trying to work around this!')
-                decoded_values = eml_parser.decode.workaround_field_value_parsing_errors(self.msg, k)
+                decoded_values = eml_parser.decode.workaround_field_value_parsing_errors(ctx.msg, k)
+
+            if quota is not None:
+                decoded_values = decoded_values[:quota[k]]
 
             if decoded_values:
                 if k in header:
@@ -557,74 +1097,79 @@ class EmlParser:
                 else:
                     header[k] = decoded_values
 
-        headers_struc['header'] = header
+        return header
 
+    def _parse_attachments(self, ctx: _ParseContext) -> typing.Optional[typing.List[typing.Dict[str, typing.Any]]]:
+        """Parse the attachments of an e-mail."""
         # parse attachments
-        if self.parse_attachments:
-            try:
-                report_struc['attachment'] = self.traverse_multipart(self.msg, 0)
-            except (binascii.Error, AssertionError):
-                # we hit this exception if the payload contains invalid data
-                logger.exception('Exception occurred while parsing attachment data. Collected data will not be complete!')
-                report_struc['attachment'] = None
-
-            # Dirty hack... transform hash into list.. need to be done in the function.
-            # Mandatory to search efficiently in mongodb
-            # See Bug 11 of eml_parser
-            if not report_struc['attachment']:
-                del report_struc['attachment']
-            else:
-                newattach = []
-                for attachment in report_struc['attachment']:
-                    newattach.append(report_struc['attachment'][attachment])
-                report_struc['attachment'] = newattach
-
-        newbody = []
-        for body in bodys_struc:
-            newbody.append(bodys_struc[body])
-        report_struc['body'] = newbody
-        # End of dirty hack
+        try:
+            attachments = self.traverse_multipart(ctx.msg, 0, stats=ctx.stats, limits=ctx.limits)
+        except (binascii.Error, AssertionError):
+            # we hit this exception if the payload contains invalid data
+            logger.exception('Exception occurred while parsing attachment data. Collected data will not be complete!')
+            return None
 
-        # Get all other bulk headers
-        report_struc['header'] = headers_struc
+        if not attachments:
+            return None
 
-        return report_struc
+        return attachments
 
     @staticmethod
-    def string_sliding_window_loop(body: str, slice_step: int = 500) -> typing.Iterator[str]:
+    def string_sliding_window_loop(body: str, slice_step: int = 500, max_token_length: int = 8192) -> typing.Iterator[str]:
         """Yield a more or less constant slice of a large string.
 
         If we start directly a *re* findall on 500K+ body we got time and memory issues.
-        If more than the configured slice step, lets cheat, we will cut around the thing we search "://, @, ."
-        in order to reduce regex complexity.
+        If more than the configured slice step, lets cheat, we will cut the body into slices.
+        Slices end at the first whitespace, *<* or *>* character following *slice_step* characters and the
+        next slice starts with that character, hence no URL, e-mail address, domain or IP address is ever
+        split and every character is scanned once (plus one character per slice).
+
+        If there is no such character within *max_token_length* characters after the end of a slice, the slice
+        would have to be cut within a run of more than *max_token_length* characters, which would yield parts of
+        the indicators in it. The slice ends before that run instead and the whole run is yielded as a slice of
+        its own, hence the indicators found do not depend on *slice_step*.
 
         Args:
             body: Body to slice into smaller pieces.
             slice_step: Slice this number or characters.
+            max_token_length: Length of the longest run of characters without whitespace, *<* or *>* which is
+                scanned as part of a slice, longer runs are scanned on their own.
 
         Returns:
             typing.Iterator[str]: Sliced body string.
         """
+        if slice_step < 1 or max_token_length < 1:
+            raise ValueError('slice_step and max_token_length must be >= 1')
+
         body_length = len(body)
+        ptr_start = 0
 
-        if body_length <= slice_step:
-            yield body
+        while body_length - ptr_start > slice_step:
+            ptr_end = ptr_start + slice_step
 
-        else:
-            ptr_start = 0
+            m = eml_parser.regex.window_boundary_regex.search(body, ptr_end, ptr_end + max_token_length)
+            if m:
+                yield body[ptr_start:m.end()]
 
-            for ptr_end in range(slice_step, body_length, slice_step):
-                if ' ' in body[ptr_end - 1:ptr_end]:
-                    while not (eml_parser.regex.window_slice_regex.match(body[ptr_end - 1:ptr_end]) or ptr_end > body_length):
-                        if ptr_end > body_length:
-                            ptr_end = body_length
-                            break
+                ptr_start = m.start()
+                continue
+
+            # ptr_end is within an overlong run, end the slice at its start and scan the run on its own
+            m = eml_parser.regex.window_last_boundary_regex.match(body, ptr_start + 1, ptr_end)
+            if m:
+                yield body[ptr_start:m.end()]
+
+                ptr_start = m.end() - 1
+
+            m = eml_parser.regex.window_boundary_regex.search(body, ptr_end + max_token_length)
+            if m is None:
+                break
 
-                        ptr_end += 1
+            yield body[ptr_start:m.end()]
 
-                yield body[ptr_start:ptr_end]
+            ptr_start = m.start()
 
-                ptr_start = ptr_end
+        yield body[ptr_start:]
 
     @staticmethod
     def get_uri_ondata(body: str) -> typing.List[str]:
@@ -651,22 +1196,85 @@ class EmlParser:
 
         return list(list_observed_urls)
 
-    def headeremail2list(self, header: str) -> typing.List[str]:
+    @staticmethod
+    def get_iocs_ondata(body: str,
+                        email_regex: typing.Pattern[str] = eml_parser.regex.email_regex,
+                        whiteip: typing.Container[str] = ()
+                        ) -> typing.Dict[str, typing.List[str]]:
+        """Extract URLs, e-mail addresses, domains and public IP addresses from the input string.
+
+        Instead of running every indicator regex over the whole text, the text is scanned once
+        for whitespace delimited tokens containing one of the characters the indicators are made of
+        (*@*, *:* or *.*). As none of the URL, e-mail and IP regular expressions can match across
+        whitespace, they are then only run over the relevant candidate tokens, which yields the very
+        same matches. IPv6 candidates are further narrowed down to runs of hexadecimal digits, dots and
+        colons. Only the domain regex, which relies on the surrounding characters, is run over the full text.
+
+        Args:
+            body (str): Text input which should be searched.
+            email_regex (re.Pattern, optional): The regular expression used for matching e-mail addresses.
+            whiteip (container, optional): IP addresses to ignore.
+
+        Returns:
+            dict: A dict with the keys *uri*, *email*, *domain* and *ip*, each holding a list of the unique
+                  indicators found, in order of appearance. E-mail addresses and domains are lower-cased.
+        """
+        iocs: typing.Dict[str, typing.List[str]] = {'uri': [], 'email': [], 'domain': [], 'ip': []}
+
+        if '.' not in body and '@' not in body and ':' not in body:
+            return iocs
+
+        candidates = eml_parser.regex.ioc_candidate_regex.findall(body)
+
+        dotted = ' '.join([x for x in candidates if '.' in x])
+        at = ' '.join([x for x in candidates if '@' in x])
+        colon = ' '.join(eml_parser.regex.ipv6_candidate_regex.findall(' '.join([x for x in candidates if ':' in x])))
+
+        if dotted:
+            iocs['uri'] = EmlParser.get_uri_ondata(dotted)
+            iocs['domain'] = list(dict.fromkeys([x.lower() for x in eml_parser.regex.dom_regex.findall(body)]))
+
+        if at:
+            iocs['email'] = list(dict.fromkeys([x.lower() for x in email_regex.findall(at)]))
+
+        ips: typing.Dict[str, int] = {}
+        for match in (eml_parser.regex.ipv4_regex.findall(dotted) if dotted else []) + (eml_parser.regex.ipv6_regex.findall(colon) if colon else []):
+            if match in ips:
+                continue
+
+            try:
+                ipaddress_match = ipaddress.ip_address(match)
+            except ValueError:
+                continue
+
+            if not (ipaddress_match.is_private or match in whiteip):
+                ips[match] = 1
+
+        iocs['ip'] = list(ips)
+
+        return iocs
+
+    def headeremail2list(self, header: str, msg: typing.Optional[email.message.Message] = None) -> typing.List[str]:
         """Parses a given header field with e-mail addresses to a list of e-mail addresses.
 
         Args:
             header (str): The header field to decode.
+            msg (email.message.Message, optional): The e-mail message object to use. For backwards
+                                                   compatibility, *self.msg* is used if not specified.
 
         Returns:
             list: Returns a list of strings which represent e-mail addresses.
         """
-        if self.msg is None:
+        if msg is None:
+            msg = self.msg
+
+        if msg is None:
             raise ValueError('msg is not set.')
 
         try:
-            field = email.utils.getaddresses(self.msg.get_all(header, []))
+            field = email.utils.getaddresses(msg.get_all(header, []))
         except (IndexError, AttributeError):
-            field = email.utils.getaddresses(eml_parser.decode.workaround_bug_27257(self.msg, header))
+            field = email.utils.getaddresses(eml_parser.decode.workaround_bug_27257(msg, header, self.email_regex))
 
         return_field = []
 
@@ -712,11 +1320,25 @@ class EmlParser:
         Returns:
             list: Returns a list of sets which are in the form of "set(encoding, raw_body_string, message field headers)"
         """
-        raw_body: typing.List[typing.Tuple[typing.Any, typing.Any, typing.Any]] = []
+        return [(encoding, raw_body_str, headers) for encoding, raw_body_str, headers, _ in self._get_raw_body_parts(msg)]
+
+    def _get_raw_body_parts(self,
+                            msg: email.message.Message,
+                            part_path: str = '',
+                            limits: eml_parser.limits.MessageLimits = eml_parser.limits.NO_LIMITS
+                            ) -> typing.List[typing.Tuple[typing.Any, typing.Any, typing.Any, str]]:
+        """Same as get_raw_body_text(), additionally returning the position of each part in the MIME tree.
+
+        Parts which are not within the given limits are skipped.
+        """
+        raw_body: typing.List[typing.Tuple[typing.Any, typing.Any, typing.Any, str]] = []
+
+        if not limits.part_allowed(msg):
+            return raw_body
 
         if msg.is_multipart():
-            for part in msg.get_payload():
-                raw_body.extend(self.get_raw_body_text(part))
+            for index, part in enumerate(msg.get_payload(), 1):
+                raw_body.extend(self._get_raw_body_parts(part, _child_part_path(part_path, index), limits))
         else:
             # Treat text document attachments as belonging to the body of the mail.
             # Attachments with a file-extension of .htm/.html are implicitly treated
@@ -749,11 +1371,11 @@ class EmlParser:
 
                 # In case we hit bug 27257 or any other parsing error, try to downgrade the used policy
                 try:
-                    raw_body.append((encoding, raw_body_str, msg.items()))
+                    raw_body.append((encoding, raw_body_str, msg.items(), part_path))
                 except (AttributeError, TypeError):
                     former_policy: email.policy.Policy = msg.policy  # type: ignore
                     msg.policy = email.policy.compat32  # type: ignore
-                    raw_body.append((encoding, raw_body_str, msg.items()))
+                    raw_body.append((encoding, raw_body_str, msg.items(), part_path))
                     msg.policy = former_policy  # type: ignore
 
         return raw_body
@@ -769,16 +1391,7 @@ class EmlParser:
         Returns:
           dict: Returns a dict with as key the hash-type and value the calculated hash.
         """
-        hashalgo = ['md5', 'sha1', 'sha256', 'sha512']
-        hash_ = {}
-
-        for k in hashalgo:
-            ha = getattr(hashlib, k)
-            h = ha()
-            h.update(data)
-            hash_[k] = h.hexdigest()
-
-        return hash_
+        return eml_parser.hashing.hash_bytes(data)
 
     @staticmethod
     def wrap_hash_sha256(string: str) -> str:
@@ -794,45 +1407,64 @@ class EmlParser:
 
         return hashlib.sha256(_string).hexdigest()
 
-    def traverse_multipart(self, msg: email.message.Message, counter: int = 0) -> typing.Dict[str, typing.Any]:
-        """Recursively traverses all e-mail message multi-part elements and returns in a parsed form as a dict.
+    def traverse_multipart(self, msg: email.message.Message, counter: int = 0, part_path: str = '',
+                           stats: eml_parser.stats.ParseStats = eml_parser.stats.NULL_STATS,
+                           limits: eml_parser.limits.MessageLimits = eml_parser.limits.NO_LIMITS) -> typing.List[typing.Dict[str, typing.Any]]:
+        """Recursively traverses all e-mail message multi-part elements and returns them in a parsed form as a list.
 
         Args:
             msg (email.message.Message): An e-mail message object.
             counter (int, optional): A counter which is used for generating attachments
                 file-names in case there are none found in the header. Default = 0.
+            part_path (str, optional): Position of *msg* in the MIME tree of the e-mail, e.g. "1.2",
+                used for the part ID. Default is the root of the e-mail.
+            stats (eml_parser.stats.ParseStats, optional): Collects the time spent hashing and determining
+                mime-types. By default no statistics are collected.
+            limits (eml_parser.limits.MessageLimits, optional): Resource limits of the e-mail, parts which are not
+                within the limits are skipped. By default no limits are applied.
 
         Returns:
-            dict: Returns a dict with all original multi-part headers as well as generated hash check-sums,
-                date size, file extension, real mime-type.
+            list: Returns a list of dicts with all original multi-part headers as well as generated hash check-sums,
+                date size, file extension, real mime-type, in the order the attachments appear in the e-mail.
         """
-        attachments = {}
+        attachments: typing.List[typing.Dict[str, typing.Any]] = []
+
+        if not limits.part_allowed(msg):
+            return attachments
 
         if msg.is_multipart():
             if 'content-type' in msg:
                 if msg.get_content_type() == 'message/rfc822':
                     # This is an e-mail message attachment, add it to the attachment list apart from parsing it
-                    attachments.update(
-                        self.prepare_multipart_part_attachment(msg, counter))
+                    attachments.extend(
+                        self.prepare_multipart_part_attachment(msg, counter, part_path, stats, limits))
 
-            for part in msg.get_payload():
-                attachments.update(self.traverse_multipart(part, counter))
+            for index, part in enumerate(msg.get_payload(), 1):
+                attachments.extend(self.traverse_multipart(part, counter, _child_part_path(part_path, index), stats, limits))
         else:
-            return self.prepare_multipart_part_attachment(msg, counter)
+            return self.prepare_multipart_part_attachment(msg, counter, part_path, stats, limits)
 
         return attachments
 
-    def prepare_multipart_part_attachment(self, msg: email.message.Message, counter: int = 0) -> typing.Dict[str, typing.Any]:
+    def prepare_multipart_part_attachment(self, msg: email.message.Message, counter: int = 0, part_path: str = '',
+                                          stats: eml_parser.stats.ParseStats = eml_parser.stats.NULL_STATS,
+                                          limits: eml_parser.limits.MessageLimits = eml_parser.limits.NO_LIMITS) -> typing.List[typing.Dict[str, typing.Any]]:
         """Extract meta-information from a multipart-part.
 
         Args:
             msg (email.message.Message): An e-mail message object.
             counter (int, optional): A counter which is used for generating attachments
                 file-names in case there are none found in the header. Default = 0.
+            part_path (str, optional): Position of *msg* in the MIME tree of the e-mail, e.g. "1.2",
+                used for the part ID. Default is the root of the e-mail.
+            stats (eml_parser.stats.ParseStats, optional): Collects the time spent hashing and determining
+                mime-types. By default no statistics are collected.
+            limits (eml_parser.limits.MessageLimits, optional): Resource limits of the e-mail, parts which are not
+                within the limits are skipped. By default no limits are applied.
 
         Returns:
-            dict: Returns a dict with original multi-part headers as well as generated hash check-sums,
-                date size, file extension, real mime-type.
+            list: Returns a list containing a dict with original multi-part headers as well as generated hash check-sums,
+                date size, file extension, real mime-type, or an empty list if the part is not an attachment.
         """
         attachment: typing.Dict[str, typing.Any] = {}
 
@@ -871,32 +1503,72 @@ class EmlParser:
             else:
                 filename = eml_parser.decode.decode_field(filename)
 
-            file_id = str(uuid.uuid1())
-            attachment[file_id] = {}
-            attachment[file_id]['filename'] = filename
-            attachment[file_id]['size'] = file_size
+            attachment['filename'] = filename
+            attachment['size'] = file_size
+            stats.count('attachments')
+            stats.count('attachment_bytes', file_size)
 
             # os.path always returns the extension as second element
             # in case there is no extension it returns an empty string
             extension = os.path.splitext(filename)[1].lower()
             if extension:
                 # strip leading dot
-                attachment[file_id]['extension'] = extension[1:]
+                attachment['extension'] = extension[1:]
+
+            # Hashes and mime-type of an attachment seen before are taken from the cache.
+            cache_key = cached = None
+            if self.attachment_cache is not None:
+                with stats.stage('attachment.cache'):
+                    cache_key = '{}{}:{}'.format(self._attachment_cache_prefix, file_size, hashlib.blake2b(data, digest_size=20).hexdigest())
+                    cached = self.attachment_cache.get(cache_key)
+
+                if cached is not None:
+                    stats.count('attachment_cache_hits')
+
+            # Hashing large payloads happens in a worker thread while the mime-type is determined.
+            hash_future: typing.Optional[concurrent.futures.Future] = None
+            if limits.attachment_hash_allowed():
+                if cached is not None:
+                    hash_future = concurrent.futures.Future()
+                    hash_future.set_result(dict(cached['hash']))
+                else:
+                    with stats.stage('attachment.hash'):
+                        hash_future = self.hasher.submit(data)
+            attachment['hash'] = None
+
+            if cached is not None:
+                mime_type, mime_type_short = cached['mime_type'], cached['mime_type_short']
+            elif self._want_attachment_mime:
+                with stats.stage('attachment.mime'):
+                    mime_type, mime_type_short = self.mime_detector.detect(data)
+            else:
+                mime_type = mime_type_short = None
 
-            attachment[file_id]['hash'] = self.get_file_hash(data)
+            if not (mime_type is None or mime_type_short is None):
+                attachment['mime_type'] = mime_type
+                # attachment['mime_type_short'] = attachment['mime_type'].split(",")[0]
+                attachment['mime_type_short'] = mime_type_short
+            elif eml_parser.mime.magic is not None and self._want_attachment_mime:
+                logger.warning('Error determining attachment mime-type - "{}"'.format(filename))
 
-            mime_type, mime_type_short = self.get_mime_type(data)
+            if self.include_attachment_data:
+                attachment['raw'] = base64.b64encode(data)
 
-            if not (mime_type is None or mime_type_short is None):
-                attachment[file_id]['mime_type'] = mime_type
-                # attachments[file_id]['mime_type_short'] = attachments[file_id]['mime_type'].split(",")[0]
-                attachment[file_id]['mime_type_short'] = mime_type_short
+            if hash_future is not None:
+                # waiting for the result is part of the call above
+                with stats.stage('attachment.hash', calls=0):
+                    attachment['hash'] = hash_future.result()
+
+                if cached is None and cache_key is not None and self.attachment_cache is not None:
+                    self.attachment_cache.put(cache_key, {'hash': dict(attachment['hash']), 'mime_type': mime_type, 'mime_type_short': mime_type_short})
             else:
-                if magic is not None:
-                    logger.warning('Error determining attachment mime-type - "{}"'.format(file_id))
+                # the limit of hashed attachments has been reached
+                del attachment['hash']
 
-            if self.include_attachment_data:
-                attachment[file_id]['raw'] = base64.b64encode(data)
+            if self.include_part_id:
+                # the part ID is always based on the SHA-256 hash, even if not hashed otherwise
+                sha256 = (attachment.get('hash') or {}).get('sha256') or eml_parser.hashing.hash_bytes(data, ('sha256',))['sha256']
+                attachment['part_id'] = _part_id(part_path, sha256)
 
             ch: typing.Dict[str, typing.List[str]] = {}
             for k, v in msg.items():
@@ -908,11 +1580,11 @@ class EmlParser:
                 else:
                     ch[k] = [v]
 
-            attachment[file_id]['content_header'] = ch
+            attachment['content_header'] = ch
 
-            counter += 1
+            return [attachment]
 
-        return attachment
+        return []
 
     @staticmethod
     def get_mime_type(data: bytes) -> typing.Union[typing.Tuple[str, str], typing.Tuple[None, None]]:
@@ -925,11 +1597,306 @@ class EmlParser:
             typing.Tuple[str, str]: Identified mime information and mime-type. If **magic** is not available, returns *None, None*.
                                     E.g. *"ELF 64-bit LSB shared object, x86-64, version 1 (SYSV)", "application/x-sharedlib"*
         """
-        if magic is None:
-            return None, None
+        return eml_parser.mime.get_mime_type(data)
+
+
+class ParsedEmail:
+    """A lazily parsed e-mail, as returned by :meth:`EmlParser.parse_lazy`.
+
+    The sections of the result (*header*, *received*, *body* and *attachment*) are only
+    computed when accessed for the first time and are cached afterwards.
+    :meth:`to_dict` returns the same structure as :meth:`EmlParser.decode_email_bytes`.
+    """
+
+    # pylint: disable=protected-access
+
+    def __init__(self,
+                 ep: EmlParser,
+                 msg: email.message.Message,
+                 stats: typing.Optional[eml_parser.stats.ParseStats] = None,
+                 limits: typing.Optional[eml_parser.limits.MessageLimits] = None
+                 ) -> None:
+        """Initialisation.
+
+        Args:
+            ep (EmlParser): The parser whose configuration is used.
+            msg (email.message.Message): The e-mail message object to parse.
+            stats (eml_parser.stats.ParseStats, optional): Statistics already collected for this e-mail, e.g. the time
+                                                           spent parsing the raw e-mail. By default, new statistics are
+                                                           collected if enabled for the parser.
+            limits (eml_parser.limits.MessageLimits, optional): Resource limits of this e-mail, whose time budget may have
+                                                                started already. By default, the limits of the parser apply,
+                                                                starting now.
+        """
+        self._ep = ep
+        self._ctx = ep._new_context(msg, stats, limits)
+        self._sections: typing.Dict[str, typing.Any] = {}
+        self._lock = threading.RLock()
+
+    @property
+    def msg(self) -> email.message.Message:
+        """The underlying e-mail message object."""
+        return self._ctx.msg
+
+    @property
+    def limits_hit(self) -> typing.List[str]:
+        """Names of the resource limits hit while parsing the sections accessed so far."""
+        return sorted(self._ctx.limits.hit)
+
+    @property
+    def stats(self) -> typing.Optional[typing.Dict[str, typing.Any]]:
+        """Statistics of the sections parsed so far, None if statistics are disabled for the parser."""
+        if not self._ctx.stats:
+            return None
+
+        return self._ctx.stats.to_dict()
+
+    def _section(self, name: str, func: typing.Callable[[_ParseContext], typing.Any]) -> typing.Any:
+        """Return the cached section *name*, computing it using *func* if required."""
+        try:
+            return self._sections[name]
+        except KeyError:
+            pass
+
+        with self._lock:
+            if name not in self._sections:
+                with self._ctx.stats.stage(name):
+                    self._sections[name] = func(self._ctx)
+
+            return self._sections[name]
+
+    def _parse_header(self, ctx: _ParseContext) -> typing.Dict[str, typing.Any]:
+        header = self._ep._parse_header(ctx)
+
+        if self._ep._want_header_fields:
+            with ctx.stats.stage('header_fields'):
+                header['header'] = self._ep._parse_header_fields(ctx)
+
+        return header
+
+    @property
+    def header(self) -> typing.Dict[str, typing.Any]:
+        """The parsed main header fields and all raw header fields under the *header* key.
+
+        Information parsed from the received header fields is available through :attr:`received`.
+        """
+        return self._section('header', self._parse_header)
+
+    @property
+    def received(self) -> typing.Dict[str, typing.Any]:
+        """Information parsed from the received header fields (*received*, *received_ip*, etc.)."""
+        # Parsing the header section might work around broken header fields, hence do that first.
+        self._section('header', self._parse_header)
+
+        return self._section('received', self._ep._parse_received)
+
+    @property
+    def body(self) -> typing.List[typing.Dict[str, typing.Any]]:
+        """The parsed body parts."""
+        self._section('header', self._parse_header)
+
+        return self._section('body', self._ep._parse_bodies)
+
+    @property
+    def attachment(self) -> typing.Optional[typing.List[typing.Dict[str, typing.Any]]]:
+        """The parsed attachments, None if there are none or attachment parsing is disabled."""
+        if not self._ep.parse_attachments:
+            return None
+
+        self._section('header', self._parse_header)
+
+        return self._section('attachment', self._ep._parse_attachments)
+
+    def to_dict(self) -> dict:
+        """Compute all sections and return them in the structure returned by :meth:`EmlParser.decode_email_bytes`.
+
+        Returns:
+            dict: A dictionary with the content of the EML parsed and broken down into
+                  key-value pairs.
+        """
+        ep = self._ep
+
+        header = dict(self.header)
+        header_fields = header.pop('header', None)
+        if ep._want_received:
+            header.update(self.received)
+        if header_fields is not None:
+            header['header'] = header_fields
+
+        report_struc: typing.Dict[str, typing.Any] = {}
+
+        body = self.body if ep._want_body else None
+
+        attachment = self.attachment if ep._want_attachment else None
+        if attachment:
+            report_struc['attachment'] = attachment
+
+        if body is not None:
+            report_struc['body'] = body
+        report_struc['header'] = header
+
+        if ep._fields_tree is not None:
+            report_struc = _project(report_struc, ep._fields_tree)
+
+        if self._ctx.limits.hit:
+            report_struc['truncated'] = True
+            report_struc['limits_hit'] = self.limits_hit
+
+        stats = self._ctx.stats
+        if stats:
+            if not stats.finished:
+                stats.count('parts', sum(1 for _ in self._ctx.msg.walk()))
+                stats.finish()
+
+                if ep.stats_callback is not None:
+                    ep.stats_callback(stats.to_dict())
+
+            if ep.include_stats:
+                report_struc['_stats'] = stats.to_dict()
+
+        return report_struc
+
+
+def _child_part_path(part_path: str, index: int) -> str:
+    """Return the MIME tree position of the *index*-th (starting at 1) sub-part of the part at *part_path*."""
+    if part_path:
+        return '{}.{}'.format(part_path, index)
+
+    return str(index)
+
+
+def _part_id(part_path: str, sha256: str) -> str:
+    """Return the stable ID of a part, given its MIME tree position and the SHA-256 hash of its content.
+
+    A single part e-mail, which has no sub-parts, is at position 1.
+    """
+    return '{}:{}'.format(part_path or '1', sha256[:16])
+
+
+def _build_fields_tree(fields: typing.Optional[typing.Iterable[str]]) -> typing.Optional[typing.Dict[str, typing.Any]]:
+    """Convert a list of dotted field paths into a nested dict, leaves are set to True.
+
+    Args:
+        fields (iterable): Dotted field paths, e.g. *header.from*, or None for all fields.
+
+    Returns:
+        dict: The nested dict, or None if *fields* is None.
+
+    Raises:
+        ValueError: A field is empty or is not part of the *header*, *body* or *attachment* sections.
+    """
+    if fields is None:
+        return None
+
+    tree: typing.Dict[str, typing.Any] = {}
+
+    for field in fields:
+        parts = field.split('.')
+
+        if parts[0] not in ('header', 'body', 'attachment') or '' in parts:
+            raise ValueError('Invalid field "{}"'.format(field))
+
+        node = tree
+        for part in parts[:-1]:
+            child = node.setdefault(part, {})
+            if child is True:
+                break
+            node = child
+        else:
+            node[parts[-1]] = True
+
+    return tree
+
+
+def _project(obj: typing.Any, tree: typing.Dict[str, typing.Any]) -> typing.Any:
+    """Only keep the parts of *obj* selected by *tree*, lists are projected per element."""
+    if isinstance(obj, list):
+        return [_project(x, tree) for x in obj]
+
+    if not isinstance(obj, dict):
+        return obj
+
+    result = {}
+    for key, subtree in tree.items():
+        if key in obj:
+            result[key] = obj[key] if subtree is True else _project(obj[key], subtree)
+
+    return result
+
+
+def _find_header_start(data: typing.Union[bytes, mmap.mmap]) -> int:
+    """Return the offset of the first line containing a colon, i.e. skip an invalid file start.
+
+    Args:
+        data: Raw e-mail.
+
+    Returns:
+        int: Offset of the first line containing a colon, the length of the data if there is none.
+    """
+    size = len(data)
+    pos = 0
+
+    while pos < size:
+        end = data.find(b'\n', pos)
+        if end == -1:
+            end = size
+
+        if data.find(b':', pos, end) != -1:
+            return pos
+
+        pos = end + 1
+
+    return size
+
+
+def _chunked(iterable: typing.Iterable[typing.Any], size: int) -> typing.Iterator[typing.List[typing.Any]]:
+    """Split an iterable lazily into lists of at most *size* elements."""
+    chunk = []
+
+    for element in iterable:
+        chunk.append(element)
+
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+
+    if chunk:
+        yield chunk
+
+
+def _decode_chunk(ep: EmlParser, chunk: typing.List[typing.Tuple[int, typing.Any]]) -> typing.List[typing.Tuple[int, typing.Union[dict, Exception]]]:
+    """Decode a list of *(index, e-mail)* tuples, returning exceptions as values."""
+    results: typing.List[typing.Tuple[int, typing.Union[dict, Exception]]] = []
+
+    for index, item in chunk:
+        try:
+            if isinstance(item, (bytes, bytearray, memoryview)):
+                results.append((index, ep.decode_email_bytes(bytes(item))))
+            else:
+                results.append((index, ep.decode_email(item)))
+        except Exception as e:  # pylint: disable=broad-except
+            logger.debug('Exception occurred while decoding e-mail #{}'.format(index), exc_info=True)
+            results.append((index, e))
+
+    return results
+
+
+# Parser instance of a worker process, created once per process by _init_worker.
+_worker_parser: typing.Optional[EmlParser] = None
+
+
+def _init_worker(config: typing.Dict[str, typing.Any]) -> None:
+    """Initialise the parser of a worker process."""
+    global _worker_parser  # pylint: disable=global-statement
+    _worker_parser = EmlParser(**config)
+
+
+def _decode_chunk_worker(chunk: typing.List[typing.Tuple[int, typing.Any]]) -> typing.List[typing.Tuple[int, typing.Union[dict, Exception]]]:
+    """Decode a chunk of e-mails using the parser of the current worker process."""
+    if _worker_parser is None:
+        raise RuntimeError('Worker process has not been initialised.')
 
-        detected = magic.detect_from_content(data)
-        return detected.name, detected.mime_type
+    return _decode_chunk(_worker_parser, chunk)
 
 
 def decode_email(eml_file: str, include_raw_body: bool = False, include_attachment_data: bool = False,
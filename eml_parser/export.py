@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+
+"""This module contains the functions used for exporting parsed e-mails as newline-delimited JSON (NDJSON).
+
+Every parsed e-mail is written as a single compact line of JSON, as soon as it is available, thus
+a stream of results can be exported to a file or socket without building the whole output in memory.
+
+If `orjson <https://github.com/ijl/orjson>`_ is installed, it is used for serializing, which is
+considerably faster than the json module of the standard library. Both produce semantically equivalent
+JSON, but the text may differ in details like the formatting of floats (e.g. *1e-05* vs. *1e-5*).
+
+Datetimes are written in the RFC 3339 format with the UTC offset they were parsed with, which orjson
+serializes natively. Converting them to UTC instead (*utc=True*), as done by eml_parser.decode.export_to_json(),
+requires passing every datetime to a Python function, which is slower.
+"""
+
+from __future__ import annotations
+
+import datetime
+import functools
+import json
+import typing
+
+try:
+    import orjson
+except ImportError:
+    HAS_ORJSON = False
+else:
+    HAS_ORJSON = True
+
+BACKENDS = ('orjson', 'json')
+
+
+def json_default(obj: typing.Any, utc: bool = True) -> typing.Any:
+    """Serialize the objects found in parsed e-mails which are not supported by JSON.
+
+    Datetimes are converted to ISO 8601 strings, in UTC as done by eml_parser.decode.json_serial() unless
+    *utc* is False, and bytes (i.e. base64 encoded attachment data) to ASCII strings.
+
+    Args:
+        obj: The object to serialize.
+        utc (bool, optional): Convert datetimes to UTC. Default: True.
+
+    Returns:
+        str: The serialized object.
+
+    Raises:
+        TypeError: If the type of the object is not supported.
+    """
+    if isinstance(obj, datetime.datetime):
+        if utc and obj.tzinfo is not None:
+            return obj.astimezone(datetime.timezone.utc).isoformat()
+
+        return obj.isoformat()
+
+    if isinstance(obj, (bytes, bytearray, memoryview)):
+        return bytes(obj).decode('ascii')
+
+    raise TypeError('Type not serializable - {}'.format(str(type(obj))))
+
+
+def _default_backend() -> str:
+    return 'orjson' if HAS_ORJSON else 'json'
+
+
+class NDJSONWriter:
+    """Write parsed e-mails as newline-delimited JSON to a binary file-like object.
+
+    Example::
+
+        with open('out.ndjson', 'wb') as fp:
+            writer = eml_parser.export.NDJSONWriter(fp)
+
+            for _, parsed in ep.decode_many(paths):
+                writer.write(parsed)
+    """
+
+    def __init__(self, fp: typing.BinaryIO, sort_keys: bool = False, backend: typing.Optional[str] = None, utc: bool = False) -> None:
+        """Initialisation.
+
+        Args:
+            fp: A file-like object opened in binary mode, e.g. a file, *sys.stdout.buffer* or *socket.makefile('wb')*.
+            sort_keys (bool, optional): Sort the keys of the JSON objects. Default: False.
+            backend (str, optional): JSON library to use, *orjson* or *json*. Default: orjson if it is installed, else json.
+            utc (bool, optional): Convert datetimes to UTC instead of keeping their UTC offset. Default: False.
+        """
+        if backend is None:
+            backend = _default_backend()
+
+        if backend not in BACKENDS:
+            raise ValueError('Unknown backend "{}", supported are: {}'.format(backend, ', '.join(BACKENDS)))
+
+        if backend == 'orjson' and not HAS_ORJSON:
+            raise ValueError('The orjson backend requires orjson to be installed.')
+
+        self.fp = fp
+        self.sort_keys = sort_keys
+        self.backend = backend
+        self.utc = utc
+        self.count = 0
+
+        default = functools.partial(json_default, utc=utc)
+
+        if backend == 'orjson':
+            # orjson serializes datetimes natively, keeping their UTC offset (the same as datetime.isoformat()),
+            # it cannot convert them to UTC though, thus they are passed to json_default in that case.
+            option = orjson.OPT_APPEND_NEWLINE | orjson.OPT_NON_STR_KEYS
+            if utc:
+                option |= orjson.OPT_PASSTHROUGH_DATETIME
+            if sort_keys:
+                option |= orjson.OPT_SORT_KEYS
+
+            self._dumps: typing.Callable[[typing.Any], bytes] = lambda obj: orjson.dumps(obj, default=default, option=option)
+        else:
+            encoder = json.JSONEncoder(default=default, sort_keys=sort_keys, ensure_ascii=False, separators=(',', ':'))
+            self._dumps = lambda obj: (encoder.encode(obj) + '\n').encode('utf-8')
+
+    def dumps(self, parsed_msg: dict) -> bytes:
+        """Serialize a parsed e-mail to a line of JSON, including the trailing newline.
+
+        Args:
+            parsed_msg (dict): The parsed e-mail.
+
+        Returns:
+            bytes: The UTF-8 encoded line.
+        """
+        return self._dumps(parsed_msg)
+
+    def write(self, parsed_msg: dict) -> None:
+        """Write a parsed e-mail as a line of JSON.
+
+        Args:
+            parsed_msg (dict): The parsed e-mail.
+        """
+        self.fp.write(self._dumps(parsed_msg))
+        self.count += 1
+
+    def write_many(self, parsed_msgs: typing.Iterable[dict]) -> int:
+        """Write parsed e-mails, one line of JSON each.
+
+        Args:
+            parsed_msgs (iterable): The parsed e-mails, e.g. a generator.
+
+        Returns:
+            int: The number of e-mails written.
+        """
+        count = 0
+
+        for parsed_msg in parsed_msgs:
+            self.write(parsed_msg)
+            count += 1
+
+        return count
+
+    def flush(self) -> None:
+        """Flush the underlying file-like object."""
+        self.fp.flush()
+
+
+def export_ndjson(parsed_msgs: typing.Iterable[dict],
+                  fp: typing.BinaryIO,
+                  sort_keys: bool = False,
+                  backend: typing.Optional[str] = None,
+                  utc: bool = False
+                  ) -> int:
+    """Write parsed e-mails as newline-delimited JSON, see NDJSONWriter.
+
+    Args:
+        parsed_msgs (iterable): The parsed e-mails, e.g. a generator.
+        fp: A file-like object opened in binary mode.
+        sort_keys (bool, optional): Sort the keys of the JSON objects. Default: False.
+        backend (str, optional): JSON library to use, *orjson* or *json*. Default: orjson if it is installed, else json.
+        utc (bool, optional): Convert datetimes to UTC instead of keeping their UTC offset. Default: False.
+
+    Returns:
+        int: The number of e-mails written.
+    """
+    writer = NDJSONWriter(fp, sort_keys=sort_keys, backend=backend, utc=utc)
+    count = writer.write_many(parsed_msgs)
+    writer.flush()
+
+    return count
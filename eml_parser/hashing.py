@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+
+"""This module contains the functions used for calculating the hashes of bodies and attachments."""
+
+from __future__ import annotations
+
+import concurrent.futures
+import hashlib
+import os
+import threading
+import typing
+
+# Hash algorithms calculated for attachments by default.
+DEFAULT_ALGORITHMS = ('md5', 'sha1', 'sha256', 'sha512')
+
+# Data is fed to the hash objects in chunks of this size, which keeps every chunk
+# in the CPU cache while it is processed by all hash algorithms.
+CHUNK_SIZE = 256 * 1024
+
+_executor: typing.Optional[concurrent.futures.ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> concurrent.futures.ThreadPoolExecutor:
+    """Return the thread pool shared by all Hasher instances, creating it if required."""
+    global _executor  # pylint: disable=global-statement
+
+    with _executor_lock:
+        if _executor is None:
+            _executor = concurrent.futures.ThreadPoolExecutor(max_workers=os.cpu_count() or 1, thread_name_prefix='eml_parser_hash')
+
+        return _executor
+
+
+def _reset_executor() -> None:
+    """Forget the thread pool of the parent process in a forked child process.
+
+    The threads of the pool are not copied to the child, thus work submitted to the inherited
+    pool would never be run.
+    """
+    global _executor, _executor_lock  # pylint: disable=global-statement
+
+    _executor = None
+    _executor_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_executor)
+
+
+def hash_bytes(data: bytes, algorithms: typing.Iterable[str] = DEFAULT_ALGORITHMS) -> typing.Dict[str, str]:
+    """Calculate the hashes of the given data using a single pass over the data.
+
+    Args:
+        data (bytes): The data to calculate the hashes on.
+        algorithms (iterable, optional): Names of the hash algorithms to use, as supported by *hashlib.new*.
+                                         Default: md5, sha1, sha256 and sha512.
+
+    Returns:
+        dict: Returns a dict with as key the hash-type and value the calculated hash.
+    """
+    hashers = [(k, hashlib.new(k)) for k in algorithms]
+
+    with memoryview(data) as view:
+        for offset in range(0, len(view), CHUNK_SIZE):
+            chunk = view[offset:offset + CHUNK_SIZE]
+
+            for _, h in hashers:
+                h.update(chunk)
+
+    return {k: h.hexdigest() for k, h in hashers}
+
+
+def hash_text(text: str, algorithm: str = 'sha256') -> str:
+    """Calculate the hash of the UTF-8 representation of a string.
+
+    The string is encoded in chunks, hence no full UTF-8 encoded copy of the
+    string is created.
+
+    Args:
+        text (str): The string to calculate the hash on.
+        algorithm (str, optional): Name of the hash algorithm to use. Default: sha256.
+
+    Returns:
+        str: Returns the calculated hash as a string.
+    """
+    h = hashlib.new(algorithm)
+
+    for offset in range(0, len(text), CHUNK_SIZE):
+        h.update(text[offset:offset + CHUNK_SIZE].encode('utf-8'))
+
+    return h.hexdigest()
+
+
+class Hasher:
+    """Calculate the hashes of attachment payloads.
+
+    Hashing releases the GIL, thus payloads larger than *thread_threshold* are hashed in a worker
+    thread, allowing the caller to continue processing the payload (e.g. mime-type detection) meanwhile.
+    """
+
+    def __init__(self, algorithms: typing.Iterable[str] = DEFAULT_ALGORITHMS, thread_threshold: int = 1024 * 1024) -> None:
+        """Initialisation.
+
+        Args:
+            algorithms (iterable, optional): Names of the hash algorithms to use, as supported by *hashlib.new*.
+                                             Default: md5, sha1, sha256 and sha512.
+            thread_threshold (int, optional): Payloads of at least this number of bytes are hashed in a worker thread.
+                                              Default: 1 MiB.
+        """
+        self.algorithms = tuple(algorithms)
+        self.thread_threshold = thread_threshold
+
+        for k in self.algorithms:
+            # raises ValueError for unsupported algorithms
+            hashlib.new(k)
+
+    def hash(self, data: bytes) -> typing.Dict[str, str]:
+        """Calculate the hashes of the given data.
+
+        Args:
+            data (bytes): The data to calculate the hashes on.
+
+        Returns:
+            dict: Returns a dict with as key the hash-type and value the calculated hash.
+        """
+        return hash_bytes(data, self.algorithms)
+
+    def submit(self, data: bytes) -> concurrent.futures.Future:
+        """Start calculating the hashes of the given data.
+
+        Args:
+            data (bytes): The data to calculate the hashes on.
+
+        Returns:
+            concurrent.futures.Future: A future whose result is the dict returned by :meth:`hash`.
+        """
+        if len(data) >= self.thread_threshold:
+            return _get_executor().submit(hash_bytes, data, self.algorithms)
+
+        future: concurrent.futures.Future = concurrent.futures.Future()
+        try:
+            future.set_result(self.hash(data))
+        except Exception as e:  # pylint: disable=broad-except
+            future.set_exception(e)
+
+        return future
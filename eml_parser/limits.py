@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+
+"""This module contains the resource limits applied while parsing a single e-mail."""
+
+from __future__ import annotations
+
+import email.message
+import time
+import typing
+
+# Names of the supported limits, see EmlParser.
+LIMITS = ('max_raw_size', 'max_parts', 'max_depth', 'max_headers', 'max_body_scan_bytes', 'max_attachments_hashed', 'time_budget')
+
+
+def check_limits(limits: typing.Optional[typing.Dict[str, typing.Any]]) -> typing.Dict[str, typing.Any]:
+    """Validate a dict of limits.
+
+    Args:
+        limits (dict, optional): Limits by name, a value of None disables the limit.
+
+    Returns:
+        dict: The enabled limits.
+
+    Raises:
+        ValueError: If a limit is unknown or its value is invalid.
+    """
+    checked: typing.Dict[str, typing.Any] = {}
+
+    for name, value in (limits or {}).items():
+        if name not in LIMITS:
+            raise ValueError('Unknown limit "{}", supported are: {}'.format(name, ', '.join(LIMITS)))
+
+        if value is None:
+            continue
+
+        if name == 'time_budget':
+            if not isinstance(value, (int, float)) or value <= 0:
+                raise ValueError('time_budget must be a number of seconds > 0')
+        elif not isinstance(value, int) or value < 0:
+            raise ValueError('{} must be an integer >= 0'.format(name))
+
+        checked[name] = value
+
+    return checked
+
+
+class MessageLimits:
+    """Keeps track of the resources used while parsing a single e-mail and the limits hit.
+
+    The time budget starts running when the instance is created.
+    """
+
+    __slots__ = ('limits', 'hit', '_deadline', '_allowed_parts', '_attachments_hashed', '_body_scanned')
+
+    def __init__(self, limits: typing.Dict[str, typing.Any]) -> None:
+        """Initialisation.
+
+        Args:
+            limits (dict): The enabled limits, as returned by check_limits().
+        """
+        self.limits = limits
+        self.hit: typing.Set[str] = set()
+        self._deadline = None if 'time_budget' not in limits else time.monotonic() + limits['time_budget']
+        self._allowed_parts: typing.Optional[typing.Set[int]] = None
+        self._attachments_hashed = 0
+        self._body_scanned = 0
+
+    def raw_size(self, size: int) -> int:
+        """Return the number of bytes, out of *size* bytes of the raw e-mail, which are within the *max_raw_size* limit."""
+        max_raw_size = self.limits.get('max_raw_size')
+
+        if max_raw_size is not None and size > max_raw_size:
+            self.hit.add('max_raw_size')
+            return max_raw_size
+
+        return size
+
+    def time_exceeded(self) -> bool:
+        """Check whether the time budget is used up."""
+        if self._deadline is None or time.monotonic() <= self._deadline:
+            return False
+
+        self.hit.add('time_budget')
+
+        return True
+
+    def headers(self, count: int) -> int:
+        """Return the number of header fields, out of *count*, which are within the *max_headers* limit."""
+        max_headers = self.limits.get('max_headers')
+
+        if max_headers is not None and count > max_headers:
+            self.hit.add('max_headers')
+            return max_headers
+
+        return count
+
+    def part_allowed(self, part: email.message.Message) -> bool:
+        """Check whether a MIME part is within the *max_parts* and *max_depth* limits and the time budget is not used up.
+
+        The parts within the limits are determined when this is called for the first time,
+        which has to be with the root of the e-mail. The first *max_parts* parts, in the order
+        they appear in the e-mail, which are nested at most *max_depth* levels deep are allowed.
+        """
+        if self.time_exceeded():
+            return False
+
+        if 'max_parts' not in self.limits and 'max_depth' not in self.limits:
+            return True
+
+        if self._allowed_parts is None:
+            self._allowed_parts = self._find_allowed_parts(part)
+
+        return id(part) in self._allowed_parts
+
+    def _find_allowed_parts(self, root: email.message.Message) -> typing.Set[int]:
+        max_parts = self.limits.get('max_parts')
+        max_depth = self.limits.get('max_depth')
+        allowed: typing.Set[int] = set()
+        stack = [(root, 0)]
+
+        while stack:
+            part, depth = stack.pop()
+
+            if max_depth is not None and depth > max_depth:
+                self.hit.add('max_depth')
+                continue
+
+            if max_parts is not None and len(allowed) >= max_parts:
+                self.hit.add('max_parts')
+                break
+
+            allowed.add(id(part))
+
+            if part.is_multipart():
+                payload = part.get_payload()
+                if isinstance(payload, list):
+                    stack.extend((x, depth + 1) for x in reversed(payload) if isinstance(x, email.message.Message))
+
+        return allowed
+
+    def attachment_hash_allowed(self) -> bool:
+        """Check whether another attachment may be hashed within the *max_attachments_hashed* limit, counting it if so."""
+        max_attachments_hashed = self.limits.get('max_attachments_hashed')
+
+        if max_attachments_hashed is not None and self._attachments_hashed >= max_attachments_hashed:
+            self.hit.add('max_attachments_hashed')
+            return False
+
+        self._attachments_hashed += 1
+
+        return True
+
+    def body_scan_size(self, size: int) -> int:
+        """Return the number of characters, out of *size* more characters of the bodies, which may be scanned within the *max_body_scan_bytes* limit, counting them."""
+        max_body_scan_bytes = self.limits.get('max_body_scan_bytes')
+
+        if max_body_scan_bytes is not None and self._body_scanned + size > max_body_scan_bytes:
+            self.hit.add('max_body_scan_bytes')
+            size = max_body_scan_bytes - self._body_scanned
+
+        self._body_scanned += size
+
+        return size
+
+
+class NoLimits(MessageLimits):
+    """Drop-in replacement for :class:`MessageLimits` allowing everything, used if no limits are configured.
+
+    It does not keep track of anything, thus a single instance is shared by all e-mails being parsed.
+    """
+
+    __slots__ = ()
+
+    def __init__(self) -> None:
+        """Initialisation."""
+        super().__init__({})
+
+    def raw_size(self, size: int) -> int:
+        """Return *size*."""
+        return size
+
+    def time_exceeded(self) -> bool:
+        """Return False."""
+        return False
+
+    def headers(self, count: int) -> int:
+        """Return *count*."""
+        return count
+
+    def part_allowed(self, part: email.message.Message) -> bool:
+        """Return True."""
+        return True
+
+    def attachment_hash_allowed(self) -> bool:
+        """Return True."""
+        return True
+
+    def body_scan_size(self, size: int) -> int:
+        """Return *size*."""
+        return size
+
+
+NO_LIMITS = NoLimits()
@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+
+"""This module contains the functions used for determining the mime-type of attachments."""
+
+from __future__ import annotations
+
+import logging
+import struct
+import threading
+import typing
+
+logger = logging.getLogger(__name__)
+
+try:
+    import magic
+except ImportError:
+    magic = None
+else:
+    if not hasattr(magic, 'open'):
+        logger.warning('You are using python-magic, though this module requires file-magic. Disabling magic usage due to incompatibilities.')
+
+        magic = None
+
+# Only this number of bytes at the start of the data is passed to libmagic, which
+# does not look further for the supported types anyway (e.g. when classifying text).
+MIME_PREFIX_SIZE = 64 * 1024
+
+_OOXML_TYPES = ((b'word/', 'Microsoft Word 2007+', 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'),
+                (b'xl/', 'Microsoft Excel 2007+', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+                (b'ppt/', 'Microsoft PowerPoint 2007+', 'application/vnd.openxmlformats-officedocument.presentationml.presentation'),
+                )
+
+_ELF_TYPES = {1: 'application/x-object', 2: 'application/x-executable', 3: 'application/x-sharedlib', 4: 'application/x-coredump'}
+
+
+def _detect_zip(data: bytes) -> typing.Tuple[str, str]:
+    # OOXML documents are zip archives starting with [Content_Types].xml, followed by the parts of the document
+    if data[30:49] == b'[Content_Types].xml':
+        for marker, name, mime_type in _OOXML_TYPES:
+            if data.find(marker, 49) != -1:
+                return name, mime_type
+
+    return 'Zip archive data', 'application/zip'
+
+
+def _detect_elf(data: bytes) -> typing.Optional[typing.Tuple[str, str]]:
+    if len(data) < 18 or data[4] not in (1, 2) or data[5] not in (1, 2):
+        return None
+
+    bits = 32 if data[4] == 1 else 64
+    byte_order = 'LSB' if data[5] == 1 else 'MSB'
+    elf_type = struct.unpack('<H' if byte_order == 'LSB' else '>H', data[16:18])[0]
+
+    return 'ELF {}-bit {}'.format(bits, byte_order), _ELF_TYPES.get(elf_type, 'application/octet-stream')
+
+
+def _detect_pe(data: bytes) -> typing.Optional[typing.Tuple[str, str]]:
+    if len(data) < 0x40:
+        return None
+
+    # "MZ" alone is not conclusive (e.g. text starting with it), the PE header has to follow the
+    # MS-DOS header at the offset given by e_lfanew, else the data is left to libmagic
+    pe_offset = struct.unpack('<I', data[0x3c:0x40])[0]
+    if pe_offset < 0x40 or len(data) < pe_offset + 26 or data[pe_offset:pe_offset + 4] != b'PE\x00\x00':
+        return None
+
+    characteristics = struct.unpack('<H', data[pe_offset + 22:pe_offset + 24])[0]
+    optional_magic = struct.unpack('<H', data[pe_offset + 24:pe_offset + 26])[0]
+
+    name = 'PE32+ executable' if optional_magic == 0x20b else 'PE32 executable'
+    if characteristics & 0x2000:
+        name += ' (DLL)'
+
+    return name, 'application/vnd.microsoft.portable-executable'
+
+
+def detect_signature(data: bytes) -> typing.Optional[typing.Tuple[str, str]]:
+    """Determine the mime-type of the most common attachment types by their signature.
+
+    Supported are PDF, ZIP (including OOXML documents), PNG, JPEG, GIF, MS-CFB (e.g. legacy
+    MS Office documents), ELF and PE files. The returned descriptions are less detailed than
+    those of libmagic.
+
+    Args:
+        data (bytes): Binary data, at least its first few KiB.
+
+    Returns:
+        tuple: Description and mime-type, e.g. *"PDF document, version 1.5", "application/pdf"*,
+               or None if the data does not start with a supported signature.
+    """
+    if data.startswith(b'%PDF-'):
+        version = data[5:8]
+        if len(version) == 3 and version[:1].isdigit() and version[1:2] == b'.' and version[2:].isdigit():
+            return 'PDF document, version {}'.format(version.decode('ascii')), 'application/pdf'
+
+        return 'PDF document', 'application/pdf'
+
+    if data.startswith(b'PK\x03\x04'):
+        return _detect_zip(data)
+
+    if data.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'PNG image data', 'image/png'
+
+    if data.startswith(b'\xff\xd8\xff'):
+        return 'JPEG image data', 'image/jpeg'
+
+    if data.startswith((b'GIF87a', b'GIF89a')):
+        return 'GIF image data, version {}'.format(data[3:6].decode('ascii')), 'image/gif'
+
+    if data.startswith(b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'):
+        return 'Composite Document File V2 Document', 'application/CDFV2'
+
+    if data.startswith(b'\x7fELF'):
+        return _detect_elf(data)
+
+    if data.startswith(b'MZ'):
+        return _detect_pe(data)
+
+    return None
+
+
+class MimeDetector:
+    """Determine the mime-type of attachments using libmagic.
+
+    Every thread using an instance gets its own libmagic handles, which are loaded once
+    and reused for all subsequent calls.
+    """
+
+    def __init__(self, prefix_size: int = MIME_PREFIX_SIZE, signatures: bool = False) -> None:
+        """Initialisation.
+
+        Args:
+            prefix_size (int, optional): Only this number of bytes at the start of the data are passed to libmagic.
+                                         Default: 64 KiB.
+            signatures (bool, optional): Identify the most common types by their signature first, see detect_signature(),
+                                         without using libmagic. This also works if libmagic is not available. Default: False.
+        """
+        if prefix_size < 1:
+            raise ValueError('prefix_size must be >= 1')
+
+        self.prefix_size = prefix_size
+        self.signatures = signatures
+        self._local = threading.local()
+
+    def __getstate__(self) -> typing.Dict[str, typing.Any]:
+        """Only pickle the configuration, the libmagic handles are created on first use."""
+        return {'prefix_size': self.prefix_size, 'signatures': self.signatures}
+
+    def __setstate__(self, state: typing.Dict[str, typing.Any]) -> None:
+        """Restore the configuration."""
+        self.__init__(**state)  # type: ignore  # pylint: disable=unnecessary-dunder-call
+
+    def _get_handles(self) -> typing.Tuple[typing.Any, typing.Any]:
+        """Return the libmagic handles of the current thread, creating them if required."""
+        handles = getattr(self._local, 'handles', None)
+
+        if handles is None:
+            mime_magic = magic.open(magic.MAGIC_MIME)
+            mime_magic.load()
+            none_magic = magic.open(magic.MAGIC_NONE)
+            none_magic.load()
+
+            handles = self._local.handles = (mime_magic, none_magic)
+
+        return handles
+
+    def detect(self, data: bytes) -> typing.Union[typing.Tuple[str, str], typing.Tuple[None, None]]:
+        """Get mime-type information based on the provided bytes object.
+
+        Args:
+            data: Binary data.
+
+        Returns:
+            typing.Tuple[str, str]: Identified mime information and mime-type. If **magic** is not available, or in case
+                                    of an error, returns *None, None*.
+                                    E.g. *"ELF 64-bit LSB shared object, x86-64, version 1 (SYSV)", "application/x-sharedlib"*
+        """
+        prefix = data[:self.prefix_size]
+
+        if self.signatures:
+            detected = detect_signature(prefix)
+            if detected is not None:
+                return detected
+
+        if magic is None:
+            return None, None
+
+        mime_magic, none_magic = self._get_handles()
+
+        mime_detected = mime_magic.buffer(prefix)
+        name = none_magic.buffer(prefix)
+        if mime_detected is None or name is None:
+            return None, None
+
+        # e.g. "text/plain; charset=us-ascii"
+        return name, mime_detected.split('; ', 1)[0]
+
+
+_default_detector = MimeDetector()
+
+
+def get_mime_type(data: bytes) -> typing.Union[typing.Tuple[str, str], typing.Tuple[None, None]]:
+    """Get mime-type information using a shared MimeDetector with the default configuration, see MimeDetector.detect()."""
+    return _default_detector.detect(data)
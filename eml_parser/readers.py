@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+
+"""This module contains readers for mailbox formats, streaming the raw e-mails they contain.
+
+The readers only yield raw e-mails, which can be parsed using :meth:`eml_parser.EmlParser.decode_many`,
+or directly using :func:`decode_mbox` and :func:`decode_maildir`.
+"""
+
+from __future__ import annotations
+
+import mmap
+import os
+import pathlib
+import re
+import typing
+
+import eml_parser.eml_parser
+
+# Lines quoted in the mboxrd format, i.e. ">From ", ">>From ", etc.
+_quoted_from_regex = re.compile(br'^>(>*From )', re.MULTILINE)
+
+
+def _message_end(data: typing.Union[bytes, mmap.mmap], start: int, end: int) -> int:
+    """Return the end of a message ending at *end*, without the empty line separating it from the next one."""
+    if data[end - 2:end] == b'\n\n':
+        return end - 1
+
+    if data[end - 4:end] == b'\r\n\r\n':
+        return end - 2
+
+    return max(start, end)
+
+
+def iter_mbox(path: 'os.PathLike[str]', offset: int = 0, mboxrd: bool = False) -> typing.Iterator[typing.Tuple[int, bytes]]:
+    """Stream the e-mails of an mbox file.
+
+    The file is memory-mapped and scanned for lines starting with *From *, which separate
+    the e-mails, thus only one e-mail at a time is held in memory, regardless of the size
+    of the file.
+
+    Args:
+        path (os.PathLike): Path to the mbox file.
+        offset (int, optional): Byte offset to start reading at. If it does not point to the start of an e-mail,
+                                reading starts with the next e-mail, thus passing the offset of the last processed
+                                e-mail plus one resumes reading after it. Default: 0.
+        mboxrd (bool, optional): Remove one level of quoting from lines starting with *>From *, as done by the
+                                 mboxrd format. Default: False.
+
+    Yields:
+        tuple: Tuples of the form *(offset, raw_email)*, with *offset* being the byte offset of the separator line
+               of the e-mail in the file.
+    """
+    with open(path, 'rb') as fp:
+        try:
+            mm = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # empty files cannot be mapped
+            return
+
+        with mm:
+            size = len(mm)
+
+            if offset > 0 or mm[:5] != b'From ':
+                # look for the next separator line
+                pos = mm.find(b'\nFrom ', max(offset - 1, 0))
+                start = size if pos == -1 else pos + 1
+            else:
+                start = 0
+
+            while start < size:
+                header_start = mm.find(b'\n', start)
+                if header_start == -1:
+                    break
+
+                pos = mm.find(b'\nFrom ', header_start)
+                next_start = size if pos == -1 else pos + 1
+
+                raw_email = mm[header_start + 1:_message_end(mm, header_start + 1, next_start)]
+                if mboxrd:
+                    raw_email = _quoted_from_regex.sub(br'\1', raw_email)
+
+                yield start, raw_email
+
+                start = next_start
+
+
+def _maildir_key(relative_path: str) -> typing.Tuple[str, str]:
+    """Return the sort key of an e-mail of a Maildir directory: its folder (empty for the root) and its relative path."""
+    folder = relative_path.split('/', 1)[0]
+
+    return (folder if folder.startswith('.') else '', relative_path)
+
+
+def iter_maildir(path: 'os.PathLike[str]', folders: bool = False, start_after: typing.Optional[str] = None) -> typing.Iterator[pathlib.Path]:
+    """List the e-mails of a Maildir directory.
+
+    E-mails in the *new* and *cur* sub-directories are listed, those of the Maildir directory itself
+    first, followed by those of the sub-folders sorted by name. The e-mails of a folder are sorted by
+    their path relative to the Maildir directory, which makes the order stable between runs. E-mails
+    in *tmp* are still being delivered and are skipped.
+
+    Args:
+        path (os.PathLike): Path to the Maildir directory.
+        folders (bool, optional): Include the e-mails of Maildir++ sub-folders (directories starting with a dot).
+                                  Default: False.
+        start_after (str, optional): Only list e-mails which are listed after the one with this relative path
+                                     (e.g. *cur/1234.host:2,S* or *.Sent/cur/1234.host:2,S*), i.e. resume after the
+                                     last processed e-mail, even if it has been removed meanwhile. Default: list all e-mails.
+
+    Yields:
+        pathlib.Path: Paths of the e-mail files.
+    """
+    root = pathlib.Path(path)
+    directories = [root]
+
+    if folders:
+        directories += sorted((x for x in root.iterdir() if x.name.startswith('.') and x.is_dir()), key=lambda x: x.name)
+
+    # e-mails are listed by folder, thus resume by (folder, path), the root folder sorting first
+    start_key = _maildir_key(start_after) if start_after is not None else None
+
+    for directory in directories:
+        relative_paths = []
+
+        for sub_directory in ('cur', 'new'):
+            try:
+                with os.scandir(directory / sub_directory) as entries:
+                    relative_paths += [(directory / sub_directory / x.name).relative_to(root).as_posix()
+                                       for x in entries if not x.name.startswith('.') and x.is_file()]
+            except FileNotFoundError:
+                continue
+
+        for relative_path in sorted(relative_paths):
+            if start_key is not None and _maildir_key(relative_path) <= start_key:
+                continue
+
+            yield root / relative_path
+
+
+def decode_keyed(ep: eml_parser.eml_parser.EmlParser,
+                 items: typing.Iterable[typing.Tuple[typing.Any, typing.Any]],
+                 **kwargs: typing.Any
+                 ) -> typing.Iterator[typing.Tuple[typing.Any, typing.Union[dict, Exception]]]:
+    """Decode e-mails identified by arbitrary keys using EmlParser.decode_many().
+
+    Instead of the position of an e-mail, its key (e.g. a path or an offset) is returned with the result.
+    The keys stay in the current process, only the e-mails are sent to the worker processes.
+
+    Args:
+        ep (EmlParser): The parser to use.
+        items (iterable): Tuples of the form *(key, e-mail)*, with *e-mail* being the raw e-mail (bytes) or
+                          the path to an EML file. The iterable is consumed lazily.
+        **kwargs: Passed to EmlParser.decode_many(), e.g. *workers*, *ordered* or *chunksize*.
+
+    Yields:
+        tuple: Tuples of the form *(key, result)*, with *result* being either the parsed e-mail or
+               the exception which occurred while decoding it.
+    """
+    keys: typing.Dict[int, typing.Any] = {}
+
+    def emails() -> typing.Iterator[typing.Any]:
+        for index, (key, item) in enumerate(items):
+            keys[index] = key
+            yield item
+
+    for index, result in ep.decode_many(emails(), **kwargs):
+        yield keys.pop(index), result
+
+
+def decode_mbox(ep: eml_parser.eml_parser.EmlParser,
+                path: 'os.PathLike[str]',
+                offset: int = 0,
+                mboxrd: bool = False,
+                **kwargs: typing.Any
+                ) -> typing.Iterator[typing.Tuple[int, typing.Union[dict, Exception]]]:
+    """Decode all e-mails of an mbox file, see iter_mbox() and EmlParser.decode_many().
+
+    Args:
+        ep (EmlParser): The parser to use.
+        path (os.PathLike): Path to the mbox file.
+        offset (int, optional): Byte offset to start reading at, see iter_mbox(). Default: 0.
+        mboxrd (bool, optional): Remove one level of quoting from lines starting with *>From *. Default: False.
+        **kwargs: Passed to EmlParser.decode_many(), e.g. *workers*, *ordered* or *chunksize*.
+
+    Yields:
+        tuple: Tuples of the form *(offset, result)*, with *result* being either the parsed e-mail or
+               the exception which occurred while decoding it.
+    """
+    yield from decode_keyed(ep, iter_mbox(path, offset, mboxrd), **kwargs)
+
+
+def decode_maildir(ep: eml_parser.eml_parser.EmlParser,
+                   path: 'os.PathLike[str]',
+                   folders: bool = False,
+                   start_after: typing.Optional[str] = None,
+                   **kwargs: typing.Any
+                   ) -> typing.Iterator[typing.Tuple[str, typing.Union[dict, Exception]]]:
+    """Decode all e-mails of a Maildir directory, see iter_maildir() and EmlParser.decode_many().
+
+    Only the paths of the e-mails are passed to worker processes, which read the files themselves.
+
+    Args:
+        ep (EmlParser): The parser to use.
+        path (os.PathLike): Path to the Maildir directory.
+        folders (bool, optional): Include the e-mails of Maildir++ sub-folders. Default: False.
+        start_after (str, optional): Resume after the e-mail with this relative path, see iter_maildir().
+        **kwargs: Passed to EmlParser.decode_many(), e.g. *workers*, *ordered* or *chunksize*.
+
+    Yields:
+        tuple: Tuples of the form *(relative_path, result)*, with *result* being either the parsed e-mail or
+               the exception which occurred while decoding it.
+    """
+    root = pathlib.Path(path)
+    items = ((x.relative_to(root).as_posix(), x) for x in iter_maildir(root, folders, start_after))
+
+    yield from decode_keyed(ep, items, **kwargs)
@@ -34,9 +34,25 @@ ipv6_regex = re.compile(r'''((?:[0-9A-Fa-f]{1,4}:){6}(?:[0-9A-Fa-f]{1,4}:[0-9A-F
 url_regex_simple = re.compile(r'''(?i)\b(?:(?:https?|ftps?):(?:/{1,3}|[a-z0-9%])(?:[^\s()<>{}\[\]]+|\([^\s()]*?\([^\s()]+\)[^\s()]*?\)|\([^\s]+?\))+(?:[\w\-._~%!$&'()*+,;=:/?#\[\]@]+)|(?:(?<!@)[a-z0-9]+(?:[.\-][a-z0-9]+)*[.](?:\w)\b/?(?!@)))''')
 
 date_regex = re.compile(r''';[ \w\s:,+\-()]+$''')
+# [day-of-week,] day month year hour:minute[:second] zone [(comment)], see RFC 5322 section 3.3
+rfc5322_date_regex = re.compile(r'''(?i)\s*(?:(?:mon|tue|wed|thu|fri|sat|sun),?\s+)?(\d{1,2})\s+(jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)\s+(\d{4})\s+(\d{2}):(\d{2})(?::(\d{2}))?\s+(?:([+-])(\d{2})(\d{2})|(gmt|ut|utc|z))(?:\s+\([^()]*\))?\s*$''')
 noparenthesis_regex = re.compile(r'''\([^()]*\)''')
+parenthesis_regex = re.compile(r'''[()]''')
+# from/by/with/for words delimiting the fields of a received line
+received_border_regex = re.compile(r'''(?<![^\s;)])(?:from|by|with|for)(?=\s)''')
 cleanline_regex = re.compile(r'''(^[;\s]{0,}|[;\s]{0,}$)''')
 
 escape_special_regex_chars = re.compile(r'''([\^$\[\]()+?.])''')
 
-window_slice_regex = re.compile(r'''\s''')
+# Characters large bodies are cut at: no URL, e-mail address, domain or IP address contains whitespace, < or >
+# (apart from URLs with such characters in parenthesis).
+window_boundary_regex = re.compile(r'''[\s<>]''')
+# Matches up to and including the last boundary character of a string.
+window_last_boundary_regex = re.compile(r'''.*[\s<>]''', re.DOTALL)
+
+# Whitespace delimited tokens containing at least one of the characters any URL, e-mail address or IP address
+# contains. Used for pre-selecting the parts of a text the (expensive) IOC regular expressions are run on.
+ioc_candidate_regex = re.compile(r'''(?<!\S)\S*[@:.]\S*''')
+
+# Runs of characters an IPv6 address is made of, containing at least two colons, which every match of ipv6_regex does.
+ipv6_candidate_regex = re.compile(r'''(?<![0-9A-Fa-f:.])[0-9A-Fa-f.]*:[0-9A-Fa-f.]*:[0-9A-Fa-f:.]*''')
@@ -5,6 +5,7 @@
 
 from __future__ import annotations
 
+import bisect
 import re
 import typing
 
@@ -12,11 +13,50 @@ import eml_parser.decode
 import eml_parser.regex
 
 
+def _comment_spans(line: str) -> typing.List[typing.Tuple[int, int]]:
+    """Return the start and end offsets of all outermost balanced parenthesis in a single pass.
+
+    Args:
+        line (str): Input text to search in for parenthesis.
+
+    Returns:
+        list: Sorted list of (start, end) tuples; unbalanced parenthesis are ignored.
+    """
+    spans: typing.List[typing.Tuple[int, int]] = []
+    opened: typing.List[int] = []
+
+    for m in eml_parser.regex.parenthesis_regex.finditer(line):
+        if m.group() == '(':
+            opened.append(m.start())
+        elif opened:
+            start = opened.pop()
+
+            # drop the spans nested in this one
+            while spans and spans[-1][0] > start:
+                spans.pop()
+
+            spans.append((start, m.end()))
+
+    return spans
+
+
+def _remove_spans(line: str, spans: typing.List[typing.Tuple[int, int]], replacement: str = '') -> str:
+    """Replace the given (start, end) spans of a string."""
+    pieces = []
+    pos = 0
+
+    for start, end in spans:
+        pieces.append(line[pos:start])
+        pos = end
+
+    pieces.append(line[pos:])
+
+    return replacement.join(pieces)
+
+
 def noparenthesis(line: str) -> str:
     """Remove nested parenthesis, until none are present.
 
-    @FIXME rewrite this function.
-
     Args:
         line (str): Input text to search in for parenthesis.
 
@@ -27,15 +67,7 @@ def noparenthesis(line: str) -> str:
     if not line:
         return line
 
-    line_ = line
-
-    while True:
-        lline = line_
-        line_ = eml_parser.regex.noparenthesis_regex.sub('', line_)
-        if lline == line_:
-            break
-
-    return line_
+    return _remove_spans(line, _comment_spans(line))
 
 
 def cleanline(line: str) -> str:
@@ -67,7 +99,7 @@ def get_domain_ip(line: str) -> typing.List[str]:
     return list(set(m))
 
 
-def parserouting(line: str) -> typing.Dict[str, typing.Any]:
+def parserouting(line: str, email_regex: typing.Optional[typing.Pattern[str]] = None) -> typing.Dict[str, typing.Any]:
     """This method tries to parsed a e-mail header received line\
     and extract machine readable information.
 
@@ -77,22 +109,24 @@ def parserouting(line: str) -> typing.Dict[str, typing.Any]:
 
     Args:
         line (str): Received line to be parsed.
+        email_regex (re.Pattern, optional): The regular expression used for matching e-mail addresses.
+                                            Default: eml_parser.regex.email_regex.
 
     Returns:
         dict: Returns a dict with the extracted information.
     """
-    #    if re.findall(reg_date, line):
-    #        return 'date\n'
-    # Preprocess the line to simplify from/by/with/for border detection.
     out = {}  # type: typing.Dict[str, typing.Any]  # Result
     out['src'] = line
     line = line.lower()  # Convert everything to lowercase
-    npline = line.replace(')', ' ) ')  # normalise space # Re-space () ")by " exists often
-    npline = npline.replace('(', ' ( ')  # normalise space # Re-space ()
+
+    # Comments, i.e. text in parenthesis, are not searched for from/by/with/for words.
+    spans = _comment_spans(line)
+
+    npline = _remove_spans(line, spans, ' ')  # Remove any "()"
+    npline = npline.replace(')', ' ) ')  # normalise space # Re-space unbalanced ()
+    npline = npline.replace('(', ' ( ')  # normalise space # Re-space unbalanced ()
     npline = npline.replace(';', ' ; ')  # normalise space # Re-space ;
-    npline = noparenthesis(npline)  # Remove any "()"
     npline = ' '.join(npline.split())  # normalise space
-    npline = npline.strip('\n')  # Remove any new-line
     raw_find_data = eml_parser.regex.date_regex.findall(npline)  # extract date on end line.
 
     # Detect "sticked lines"
@@ -104,66 +138,52 @@ def parserouting(line: str) -> typing.Dict[str, typing.Any]:
         npdate = raw_find_data[0]  # Remove spaces and starting ;
         npdate = npdate.lstrip(';')  # Remove Spaces and stating ; from date
         npdate = npdate.strip()
+        date_pos = line.rfind(npdate)
     else:
         npdate = ''
+        date_pos = len(line)
+
+    # Tokenize the line, collecting the positions of each "from/by/with/for" word outside of comments.
+    positions: typing.Dict[str, typing.List[int]] = {}
+    span_iter = iter(spans)
+    span = next(span_iter, None)
+    # a word needs to be followed by some text
+    scan_end = len(line[:len(line) if date_pos == -1 else date_pos].rstrip())
+
+    for match in eml_parser.regex.received_border_regex.finditer(line, 0, scan_end):
+        while span is not None and span[1] <= match.start():
+            span = next(span_iter, None)
 
-    npline = npline.replace(npdate, '')  # Remove date from input line
-    npline = npline.strip(' ')  # Remove any border WhiteSpace
-
-    borders = ['from ', 'by ', 'with ', 'for ']
-    result: typing.List[typing.Dict[str, typing.Any]] = []
-
-    # Scan the line to determine the order, and presence of each "from/by/with/for" words
-    for word in borders:
-        candidate = list(borders)
-        candidate.remove(word)
-        for endword in candidate:
-            if word in npline:
-                loc = npline.find(word)
-                end = npline.find(endword)
-                if end < loc or end == -1:
-                    end = 0xfffffff  # Kindof MAX 31 bits
-                result.append({'name_in': word, 'pos': loc, 'name_out': endword, 'weight': end + loc})
-                # print({'name_in': word, 'pos': loc, 'name_out': endword, 'weight': end+loc})
-
-    # Create the word list... "from/by/with/for" by sorting the list.
-    if not result:
+        if span is None or match.start() < span[0]:
+            positions.setdefault(match.group(), []).append(match.start())
+
+    if not positions:
         out['warning'] = ['Nothing Parsable']
         return out
 
-    tout = []
-    for word in borders:
-        result_max = 0xffffffff
-        line_max: typing.Dict[str, typing.Any] = {}
-        for eline in result:
-            if eline['name_in'] == word and eline['weight'] <= result_max:
-                result_max = eline['weight']
-                line_max = eline
-
-        if line_max:
-            tout.append([line_max.get('pos'), line_max.get('name_in')])
-
-    # structure is list[list[int, str]]
-    # we sort based on the first element of the sub list, i.e. int
-    tout = sorted(tout, key=lambda x: x[0])
-
-    # build regex.
-    reg = ''
-    for item in tout:
-        reg += item[1] + '(?P<' + item[1].strip() + '>.*)'  # type: ignore
-    if npdate:
-        # escape special regex chars
-        reg += eml_parser.regex.escape_special_regex_chars.sub(r'''\\\1''', npdate)
-
-    reparse = re.compile(reg)
-    reparseg = reparse.search(line)
+    # The order of the words is given by their first occurrence. Each field ends at the last
+    # occurrence of the following word, before the date (the same as a greedy regex would do).
+    borders = sorted(positions, key=lambda x: positions[x][0])
+
+    fields: typing.Dict[str, str] = {}
+
+    if date_pos != -1:
+        end = date_pos
+
+        for word in reversed(borders[1:]):
+            word_positions = positions[word]
+            start = word_positions[bisect.bisect_left(word_positions, end) - 1]
+            fields[word] = line[start + len(word) + 1:end]
+            end = start
+
+        start = positions[borders[0]][0]
+        fields[borders[0]] = line[start + len(borders[0]) + 1:end]
 
     # Fill the data
-    for item in borders:  # type: ignore
-        try:
-            out[item.strip()] = cleanline(reparseg.group(item.strip()))  # type: ignore
-        except (LookupError, ValueError):
-            pass
+    for item in ('from', 'by', 'with', 'for'):
+        if item in fields:
+            out[item] = cleanline(fields[item])
+
     out['date'] = eml_parser.decode.robust_string2date(npdate)
 
     # Fixup for "From" in "for" field
@@ -175,7 +195,10 @@ def parserouting(line: str) -> typing.Dict[str, typing.Any]:
             out['for'] = temp[0]
             out['from'] = '{} {}'.format(out['from'], ' '.join(temp[1:]))
 
-        m = eml_parser.regex.email_regex.findall(out['for'])
+        if email_regex is None:
+            email_regex = eml_parser.regex.email_regex
+
+        m = email_regex.findall(out['for'])
         if m:
             out['for'] = list(set(m))
         else:
@@ -0,0 +1,396 @@
+# -*- coding: utf-8 -*-
+
+"""This module contains a long-running HTTP server parsing e-mails in a pool of warm worker processes.
+
+Starting Python and importing eml_parser and its dependencies takes considerably longer than
+parsing a typical e-mail. The server keeps a pool of worker processes, each with a configured
+parser whose libmagic handles and regular expressions are loaded at start-up, and serves
+parsing requests on localhost or on a Unix socket::
+
+    python -m eml_parser.server --unix-socket /tmp/eml_parser.sock &
+    curl --unix-socket /tmp/eml_parser.sock --data-binary @sample.eml http://localhost/parse
+
+Endpoints:
+    POST /parse: Parse the raw e-mail in the request body and return the result as JSON.
+    GET /stats: Return statistics of the server as JSON, e.g. the number of e-mails parsed and the latency.
+
+Connections are kept alive (HTTP/1.1), thus a client may send multiple requests, including
+pipelined ones, over a single connection. Each connection is handled in its own thread.
+"""
+
+from __future__ import annotations
+
+import argparse
+import concurrent.futures
+import concurrent.futures.process
+import email.message
+import http
+import http.server
+import io
+import json
+import logging
+import os
+import signal
+import socketserver
+import sys
+import threading
+import time
+import typing
+
+import eml_parser.eml_parser
+import eml_parser.export
+
+logger = logging.getLogger(__name__)
+
+# Default maximum size of a request body, i.e. a raw e-mail.
+MAX_REQUEST_SIZE = 64 * 1024 * 1024
+
+# Serializer of a worker process, created once per process by _init_worker.
+_worker_writer: typing.Optional[eml_parser.export.NDJSONWriter] = None
+
+
+def _init_worker(config: typing.Dict[str, typing.Any]) -> None:
+    """Initialise the parser and serializer of a worker process."""
+    global _worker_writer  # pylint: disable=global-statement
+    # Ctrl-C is sent to the whole process group, the server shuts down the workers itself
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    eml_parser.eml_parser._init_worker(config)  # pylint: disable=protected-access
+    _worker_writer = eml_parser.export.NDJSONWriter(io.BytesIO())
+
+
+def _parse_worker(raw_email: bytes) -> bytes:
+    """Parse a raw e-mail using the parser of the current worker process, returning the result as JSON."""
+    parser = eml_parser.eml_parser._worker_parser  # pylint: disable=protected-access
+    if parser is None or _worker_writer is None:
+        raise RuntimeError('Worker process has not been initialised.')
+
+    return _worker_writer.dumps(parser.decode_email_bytes(raw_email))
+
+
+def _warm_up_worker(delay: float) -> int:
+    """Parse a small e-mail with an attachment, loading libmagic, etc., and return the PID of the worker process."""
+    msg = email.message.EmailMessage()
+    msg['From'] = 'john.doe@example.com'
+    msg['To'] = 'jane.doe@example.com'
+    msg['Subject'] = 'warm-up'
+    msg['Date'] = 'Fri, 26 Apr 2013 11:15:47 +0000'
+    msg['Received'] = 'from mta.example.com (mta.example.com [192.0.2.1]) by mx.example.com with ESMTP id 1234; Fri, 26 Apr 2013 11:15:50 +0000'
+    msg.set_content('See https://www.example.com/')
+    msg.add_attachment(b'%PDF-1.4\n', maintype='application', subtype='pdf', filename='warm-up.pdf')
+
+    _parse_worker(msg.as_bytes())
+
+    # keep the worker busy for a moment, in order for the other warm-up tasks to be run by the other workers
+    time.sleep(delay)
+
+    return os.getpid()
+
+
+class ServerStats:
+    """Thread-safe statistics of the server."""
+
+    def __init__(self) -> None:
+        """Initialisation."""
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.requests = 0
+        self.parsed = 0
+        self.errors = 0
+        self.bytes = 0
+        self.in_flight = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+        self.pool_restarts = 0
+
+    def begin(self, size: int) -> None:
+        """Record the start of parsing an e-mail of *size* bytes."""
+        with self._lock:
+            self.requests += 1
+            self.bytes += size
+            self.in_flight += 1
+
+    def end(self, latency: float, error: bool) -> None:
+        """Record the end of parsing an e-mail, which took *latency* seconds."""
+        with self._lock:
+            self.in_flight -= 1
+            if error:
+                self.errors += 1
+            else:
+                self.parsed += 1
+                self.latency_total += latency
+                self.latency_max = max(self.latency_max, latency)
+
+    def pool_restarted(self) -> None:
+        """Record the replacement of a broken worker pool."""
+        with self._lock:
+            self.pool_restarts += 1
+
+    def to_dict(self) -> typing.Dict[str, typing.Any]:
+        """Return the statistics as a dict."""
+        with self._lock:
+            return {'uptime': time.time() - self.started,
+                    'requests': self.requests,
+                    'parsed': self.parsed,
+                    'errors': self.errors,
+                    'bytes': self.bytes,
+                    'in_flight': self.in_flight,
+                    'latency_avg': self.latency_total / self.parsed if self.parsed else 0.0,
+                    'latency_max': self.latency_max,
+                    'pool_restarts': self.pool_restarts,
+                    }
+
+
+class ParseRequestHandler(http.server.BaseHTTPRequestHandler):
+    """Handle the requests of a connection, see the module documentation for the endpoints."""
+
+    protocol_version = 'HTTP/1.1'
+    server: typing.Any
+
+    def address_string(self) -> str:
+        """Return the client address, which is empty for Unix sockets."""
+        if isinstance(self.client_address, tuple):
+            return str(self.client_address[0])
+
+        return 'unix'
+
+    def log_message(self, format: str, *args: typing.Any) -> None:  # pylint: disable=redefined-builtin
+        """Log requests using the logging module instead of writing them to stderr."""
+        logger.debug('%s - %s', self.address_string(), format % args)
+
+    def _send(self, status: int, body: bytes, content_type: str = 'application/json') -> None:
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, status: int, message: str) -> None:
+        self._send(status, json.dumps({'error': message}).encode('utf-8') + b'\n')
+
+    def do_GET(self) -> None:  # noqa: N802
+        """Handle GET requests."""
+        if self.path == '/stats':
+            stats = self.server.stats.to_dict()
+            stats['workers'] = self.server.workers
+            self._send(http.HTTPStatus.OK, json.dumps(stats).encode('utf-8') + b'\n')
+        else:
+            self._send_error(http.HTTPStatus.NOT_FOUND, 'Not found')
+
+    def do_POST(self) -> None:  # noqa: N802
+        """Handle POST requests."""
+        if self.path != '/parse':
+            self._send_error(http.HTTPStatus.NOT_FOUND, 'Not found')
+            return
+
+        try:
+            size = int(self.headers.get('Content-Length', ''))
+        except ValueError:
+            self.close_connection = True
+            self._send_error(http.HTTPStatus.LENGTH_REQUIRED, 'Content-Length required')
+            return
+
+        if size < 0 or size > self.server.max_request_size:
+            # the body is not read, thus the connection cannot be re-used
+            self.close_connection = True
+            self._send_error(http.HTTPStatus.REQUEST_ENTITY_TOO_LARGE, 'Request body larger than {} bytes'.format(self.server.max_request_size))
+            return
+
+        raw_email = self.rfile.read(size)
+        if len(raw_email) != size:
+            self.close_connection = True
+            return
+
+        self.server.stats.begin(size)
+        start = time.perf_counter()
+
+        try:
+            body = self.server.parse(raw_email)
+        except concurrent.futures.process.BrokenProcessPool:
+            # e.g. a worker process was killed, the pool has been replaced for the next requests
+            self.server.stats.end(time.perf_counter() - start, True)
+            self._send_error(http.HTTPStatus.SERVICE_UNAVAILABLE, 'Worker process terminated unexpectedly')
+            return
+        except Exception as e:  # pylint: disable=broad-except
+            logger.debug('Exception occurred while parsing e-mail', exc_info=True)
+            self.server.stats.end(time.perf_counter() - start, True)
+            self._send_error(http.HTTPStatus.UNPROCESSABLE_ENTITY, '{}: {}'.format(type(e).__name__, e))
+            return
+
+        self.server.stats.end(time.perf_counter() - start, False)
+        self._send(http.HTTPStatus.OK, body)
+
+
+class _ParseServerMixin:
+    """Worker pool and statistics shared by the TCP and Unix socket servers."""
+
+    daemon_threads = True
+    block_on_close = False
+
+    def _init_pool(self, parser: eml_parser.eml_parser.EmlParser, workers: typing.Optional[int], max_request_size: int) -> None:
+        self.workers = workers if workers is not None else os.cpu_count() or 1
+        if self.workers < 1:
+            raise ValueError('workers must be >= 1')
+
+        self.max_request_size = max_request_size
+        self.stats = ServerStats()
+        self._parser_config = parser._config  # pylint: disable=protected-access
+        self._pool_lock = threading.Lock()
+        self.executor = self._new_pool()
+
+    def _new_pool(self) -> concurrent.futures.ProcessPoolExecutor:
+        return concurrent.futures.ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker, initargs=(self._parser_config,))
+
+    def parse(self, raw_email: bytes) -> bytes:
+        """Parse a raw e-mail in a worker process, returning the result as JSON.
+
+        If the pool is broken, e.g. because a worker process was killed, it is replaced by a new one
+        before the exception is raised, thus only the requests in flight fail.
+
+        Raises:
+            concurrent.futures.process.BrokenProcessPool: If a worker process terminated unexpectedly.
+        """
+        executor = self.executor
+
+        try:
+            return executor.submit(_parse_worker, raw_email).result()
+        except concurrent.futures.process.BrokenProcessPool:
+            with self._pool_lock:
+                # another request may have replaced the pool already
+                if self.executor is executor:
+                    logger.error('Worker process terminated unexpectedly, restarting the worker pool')
+                    self.executor = self._new_pool()
+                    self.stats.pool_restarted()
+                    executor.shutdown(wait=False)
+            raise
+
+    def warm_up(self) -> None:
+        """Run a small e-mail through the workers, in order to have all of them started and loaded."""
+        pids = set(self.executor.map(_warm_up_worker, [0.05] * self.workers))
+        logger.debug('Warmed up %d worker process(es)', len(pids))
+
+    def shutdown_pool(self) -> None:
+        """Shut down the worker processes."""
+        with self._pool_lock:
+            self.executor.shutdown()
+
+
+class ParseServer(_ParseServerMixin, http.server.ThreadingHTTPServer):
+    """HTTP server listening on a TCP address, which should be localhost."""
+
+    def __init__(self,
+                 address: typing.Tuple[str, int],
+                 parser: typing.Optional[eml_parser.eml_parser.EmlParser] = None,
+                 workers: typing.Optional[int] = None,
+                 max_request_size: int = MAX_REQUEST_SIZE
+                 ) -> None:
+        """Initialisation.
+
+        Args:
+            address (tuple): Tuple of the form *(host, port)* to listen on, port 0 picks a free port.
+            parser (EmlParser, optional): Parser whose configuration is used by the workers. Default: EmlParser().
+            workers (int, optional): Number of worker processes. Default: the number of CPUs.
+            max_request_size (int, optional): Maximum size of a raw e-mail in bytes. Default: 64 MiB.
+        """
+        self._init_pool(parser or eml_parser.eml_parser.EmlParser(), workers, max_request_size)
+        try:
+            super().__init__(address, ParseRequestHandler)
+        except Exception:
+            self.shutdown_pool()
+            raise
+
+    def server_close(self) -> None:
+        """Close the socket and shut down the worker processes."""
+        super().server_close()
+        self.shutdown_pool()
+
+
+class UnixParseServer(_ParseServerMixin, socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """HTTP server listening on a Unix socket."""
+
+    def __init__(self,
+                 path: str,
+                 parser: typing.Optional[eml_parser.eml_parser.EmlParser] = None,
+                 workers: typing.Optional[int] = None,
+                 max_request_size: int = MAX_REQUEST_SIZE
+                 ) -> None:
+        """Initialisation.
+
+        Args:
+            path (str): Path of the Unix socket, which must not exist.
+            parser (EmlParser, optional): Parser whose configuration is used by the workers. Default: EmlParser().
+            workers (int, optional): Number of worker processes. Default: the number of CPUs.
+            max_request_size (int, optional): Maximum size of a raw e-mail in bytes. Default: 64 MiB.
+        """
+        self.socket_path = path
+        self._init_pool(parser or eml_parser.eml_parser.EmlParser(), workers, max_request_size)
+        try:
+            super().__init__(path, ParseRequestHandler)
+        except Exception:
+            self.shutdown_pool()
+            raise
+
+    def server_close(self) -> None:
+        """Close and remove the socket and shut down the worker processes."""
+        super().server_close()
+        try:
+            os.unlink(self.socket_path)
+        except OSError:
+            pass
+        self.shutdown_pool()
+
+
+def main(argv: typing.Optional[typing.List[str]] = None) -> int:
+    """Run the server until interrupted.
+
+    Args:
+        argv (list, optional): Command line arguments. Default: sys.argv[1:].
+
+    Returns:
+        int: The exit code.
+    """
+    parser = argparse.ArgumentParser(prog='python -m eml_parser.server', description='Serve e-mail parsing requests using a pool of warm worker processes.')
+    parser.add_argument('--host', default='127.0.0.1', help='Address to listen on (default: %(default)s).')
+    parser.add_argument('--port', type=int, default=8025, help='Port to listen on (default: %(default)s).')
+    parser.add_argument('--unix-socket', help='Listen on this Unix socket instead of TCP.')
+    parser.add_argument('--workers', type=int, help='Number of worker processes (default: number of CPUs).')
+    parser.add_argument('--max-request-size', type=int, default=MAX_REQUEST_SIZE, help='Maximum size of an e-mail in bytes (default: %(default)s).')
+    parser.add_argument('--include-raw-body', action='store_true', help='Include the raw bodies in the results.')
+    parser.add_argument('--include-attachment-data', action='store_true', help='Include the base64 encoded attachments in the results.')
+    parser.add_argument('--include-part-id', action='store_true', help='Add a part_id to every body and attachment.')
+    parser.add_argument('--email-force-tld', action='store_true', help='Only match e-mail addresses with a TLD.')
+    parser.add_argument('--no-attachments', action='store_true', help='Do not parse attachments.')
+    parser.add_argument('--verbose', '-v', action='store_true', help='Log every request.')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+
+    ep = eml_parser.eml_parser.EmlParser(include_raw_body=args.include_raw_body,
+                                         include_attachment_data=args.include_attachment_data,
+                                         include_part_id=args.include_part_id,
+                                         email_force_tld=args.email_force_tld,
+                                         parse_attachments=not args.no_attachments)
+
+    server: typing.Union[ParseServer, UnixParseServer]
+    if args.unix_socket:
+        server = UnixParseServer(args.unix_socket, ep, workers=args.workers, max_request_size=args.max_request_size)
+        address = args.unix_socket
+    else:
+        server = ParseServer((args.host, args.port), ep, workers=args.workers, max_request_size=args.max_request_size)
+        address = 'http://{}:{}'.format(*server.server_address[:2])
+
+    try:
+        server.warm_up()
+        signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+        logger.info('Listening on %s with %d worker process(es)', address, server.workers)
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        logger.info('Stopped after parsing %d e-mail(s)', server.stats.parsed)
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+
+"""This module contains the classes used for collecting per-stage statistics while parsing an e-mail."""
+
+from __future__ import annotations
+
+import time
+import typing
+
+
+class _Stage:
+    """Context manager adding the wall and CPU time spent in its block to a stage."""
+
+    __slots__ = ('_stats', '_name', '_calls', '_wall', '_cpu')
+
+    def __init__(self, stats: ParseStats, name: str, calls: int) -> None:
+        self._stats = stats
+        self._name = name
+        self._calls = calls
+        self._wall = 0.0
+        self._cpu = 0.0
+
+    def __enter__(self) -> None:
+        self._wall = time.perf_counter()
+        self._cpu = time.thread_time()
+
+    def __exit__(self, *exc_info: typing.Any) -> None:
+        self._stats.add_time(self._name, time.perf_counter() - self._wall, time.thread_time() - self._cpu, self._calls)
+
+
+class _NullStage:
+    """Context manager doing nothing."""
+
+    __slots__ = ()
+
+    def __enter__(self) -> None:
+        pass
+
+    def __exit__(self, *exc_info: typing.Any) -> None:
+        pass
+
+
+_NULL_STAGE = _NullStage()
+
+
+class ParseStats:
+    """Statistics of parsing a single e-mail.
+
+    The time spent in every stage is recorded as wall-clock time and as CPU time of the parsing
+    thread, e.g. time spent hashing large attachments in worker threads only shows up as wall-clock
+    time. Stages may be nested, e.g. *body.iocs* is part of *body*, thus the durations of all stages
+    do not add up to the total. Besides timings, counters (e.g. number of bytes or parts) are kept.
+
+    Stages:
+        mime_parse: Parsing the raw e-mail into a message object (only when parsing raw e-mails or files).
+        header: Parsing and normalising the main header fields (subject, from, to, date, ...).
+        header_fields: Collecting all header fields.
+        received: Parsing the received header fields, including routing.
+        body: Parsing the bodies, including body.decode, body.iocs and body.hash.
+        body.decode: Extracting and decoding the bodies, including charset detection.
+        body.iocs: Extracting URLs, e-mail addresses, domains and IPs from the bodies.
+        body.hash: Hashing the bodies.
+        attachment: Parsing the attachments, including attachment.cache, attachment.hash and attachment.mime.
+        attachment.cache: Looking up the attachments in the attachment cache, including hashing them using BLAKE2b.
+        attachment.hash: Hashing the attachments.
+        attachment.mime: Determining the mime-type of the attachments.
+    """
+
+    __slots__ = ('stages', 'counters', '_wall', '_cpu', '_total')
+
+    def __init__(self) -> None:
+        """Initialisation, starting the measurement of the total time."""
+        self.stages: typing.Dict[str, typing.Dict[str, float]] = {}
+        self.counters: typing.Dict[str, int] = {}
+        self._wall = time.perf_counter()
+        self._cpu = time.thread_time()
+        self._total: typing.Optional[typing.Dict[str, float]] = None
+
+    def __bool__(self) -> bool:
+        """Statistics are collected."""
+        return True
+
+    @property
+    def finished(self) -> bool:
+        """Whether the measurement of the total time has been stopped, see :meth:`finish`."""
+        return self._total is not None
+
+    def stage(self, name: str, calls: int = 1) -> typing.ContextManager[None]:
+        """Return a context manager measuring the time spent in its block as part of stage *name*.
+
+        Args:
+            name (str): Name of the stage.
+            calls (int, optional): Number of calls to add to the stage, e.g. 0 if the block continues a
+                                   previous call of the stage. Default: 1.
+
+        Returns:
+            A context manager.
+        """
+        return _Stage(self, name, calls)
+
+    def add_time(self, name: str, wall: float, cpu: float, calls: int = 1) -> None:
+        """Add a duration to a stage.
+
+        Args:
+            name (str): Name of the stage.
+            wall (float): Wall-clock time in seconds.
+            cpu (float): CPU time in seconds.
+            calls (int, optional): Number of calls to add to the stage. Default: 1.
+        """
+        stage = self.stages.get(name)
+
+        if stage is None:
+            self.stages[name] = {'wall': wall, 'cpu': cpu, 'calls': calls}
+        else:
+            stage['wall'] += wall
+            stage['cpu'] += cpu
+            stage['calls'] += calls
+
+    def count(self, name: str, value: int = 1) -> None:
+        """Increment the counter *name* by *value*.
+
+        Args:
+            name (str): Name of the counter, e.g. *attachment_bytes*.
+            value (int, optional): Value to add. Default: 1.
+        """
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def finish(self) -> None:
+        """Stop the measurement of the total time, further calls have no effect."""
+        if self._total is None:
+            self._total = {'wall': time.perf_counter() - self._wall, 'cpu': time.thread_time() - self._cpu}
+
+    def to_dict(self) -> typing.Dict[str, typing.Any]:
+        """Return the statistics.
+
+        Returns:
+            dict: A dict containing the *total* time, the times of all *stages* (*wall* and *cpu* in seconds and
+                  the number of *calls*) and the *counters*, e.g.
+                  *{'total': {'wall': 0.01, 'cpu': 0.01}, 'stages': {'header': {'wall': 0.001, ...}, ...}, 'counters': {'parts': 3, ...}}*
+        """
+        if self._total is None:
+            total = {'wall': time.perf_counter() - self._wall, 'cpu': time.thread_time() - self._cpu}
+        else:
+            total = self._total
+
+        return {'total': dict(total),
+                'stages': {k: dict(v) for k, v in self.stages.items()},
+                'counters': dict(self.counters),
+                }
+
+
+class NullStats(ParseStats):
+    """Drop-in replacement for :class:`ParseStats` collecting nothing, used if statistics are disabled."""
+
+    __slots__ = ()
+
+    def __init__(self) -> None:  # pylint: disable=super-init-not-called
+        """Initialisation."""
+
+    def __bool__(self) -> bool:
+        """No statistics are collected."""
+        return False
+
+    @property
+    def finished(self) -> bool:
+        """Always True, as there is nothing to measure."""
+        return True
+
+    def stage(self, name: str, calls: int = 1) -> typing.ContextManager[None]:
+        """Return a context manager doing nothing."""
+        return _NULL_STAGE
+
+    def add_time(self, name: str, wall: float, cpu: float, calls: int = 1) -> None:
+        """Do nothing."""
+
+    def count(self, name: str, value: int = 1) -> None:
+        """Do nothing."""
+
+    def finish(self) -> None:
+        """Do nothing."""
+
+    def to_dict(self) -> typing.Dict[str, typing.Any]:
+        """Return an empty dict."""
+        return {}
+
+
+NULL_STATS = NullStats()
@@ -0,0 +1,122 @@
+import asyncio
+import json
+import pathlib
+import threading
+
+import pytest
+
+import eml_parser
+import eml_parser.aio
+from eml_parser.decode import json_serial
+
+my_execution_dir = pathlib.Path(__file__).resolve().parent
+parent_dir = my_execution_dir.parent
+samples_dir = pathlib.Path(parent_dir, 'samples')
+
+
+def dumps(parsed: dict) -> str:
+    return json.dumps(parsed, default=json_serial, sort_keys=True)
+
+
+class TestAio:
+    def test_decode_email(self):
+        samples = sorted(samples_dir.iterdir())
+        expected = [dumps(eml_parser.EmlParser().decode_email(k)) for k in samples]
+
+        async def run(executor: str) -> None:
+            async with eml_parser.aio.AsyncEmlParser(executor=executor, workers=2) as aep:
+                results = await asyncio.gather(*(aep.decode_email_bytes(k.read_bytes()) for k in samples))
+                assert [dumps(x) for x in results] == expected
+
+                assert dumps(await aep.decode_email(samples[0])) == expected[0]
+
+                with pytest.raises(FileNotFoundError):
+                    await aep.decode_email(pathlib.Path(samples_dir, 'does_not_exist.eml'))
+
+            with pytest.raises(RuntimeError):
+                await aep.decode_email(samples[0])
+
+        for executor in eml_parser.aio.EXECUTORS:
+            asyncio.run(run(executor))
+
+    def test_decode_many(self):
+        samples = sorted(samples_dir.iterdir())
+        expected = [dumps(eml_parser.EmlParser().decode_email(k)) for k in samples]
+        items = [k.read_bytes() for k in samples] + [pathlib.Path(samples_dir, 'does_not_exist.eml')]
+
+        async def aitems():
+            for item in items:
+                await asyncio.sleep(0)
+                yield item
+
+        async def run() -> None:
+            async with eml_parser.aio.AsyncEmlParser(workers=2) as aep:
+                for source in (items, aitems()):
+                    results = [x async for x in aep.decode_many(source)]
+
+                    assert [index for index, _ in results] == list(range(len(items)))
+                    assert [dumps(x) for _, x in results[:-1]] == expected
+                    assert isinstance(results[-1][1], FileNotFoundError)
+
+                results = sorted([x async for x in aep.decode_many(items, ordered=False)], key=lambda x: x[0])
+                assert [dumps(x) for _, x in results[:-1]] == expected
+
+        asyncio.run(run())
+
+    def test_backpressure_and_cancellation(self):
+        raw_email = pathlib.Path(samples_dir, 'sample.eml').read_bytes()
+        started = threading.Event()
+        blocker = threading.Event()
+        running = []
+
+        class BlockingParser(eml_parser.EmlParser):
+            def decode_email_bytes(self, eml_file: bytes, ignore_bad_start: bool = False) -> dict:
+                running.append(1)
+                started.set()
+                blocker.wait(10)
+                return super().decode_email_bytes(eml_file, ignore_bad_start)
+
+        async def run() -> None:
+            async with eml_parser.aio.AsyncEmlParser(BlockingParser(), workers=4, max_concurrency=1) as aep:
+                first = asyncio.ensure_future(aep.decode_email_bytes(raw_email))
+                second = asyncio.ensure_future(aep.decode_email_bytes(raw_email))
+
+                await asyncio.get_running_loop().run_in_executor(None, started.wait)
+                await asyncio.sleep(0.05)
+                # the second e-mail waits for a free slot
+                assert len(running) == 1
+
+                second.cancel()
+                first.cancel()
+                with pytest.raises(asyncio.CancelledError):
+                    await first
+
+                # the slot is only released once the running worker is done
+                third = asyncio.ensure_future(aep.decode_email_bytes(raw_email))
+                await asyncio.sleep(0.05)
+                assert len(running) == 1
+
+                blocker.set()
+                assert (await third)['header']['subject']
+                assert len(running) == 2
+
+        asyncio.run(run())
+
+    def test_stats_callback(self):
+        raw_email = pathlib.Path(samples_dir, 'sample.eml').read_bytes()
+        collected = []
+
+        async def run() -> None:
+            async with eml_parser.aio.AsyncEmlParser(executor='process', workers=1, stats_callback=collected.append) as aep:
+                assert '_stats' not in await aep.decode_email_bytes(raw_email)
+
+        asyncio.run(run())
+
+        assert len(collected) == 1
+        assert collected[0]['counters']['raw_bytes'] == len(raw_email)
+
+        with pytest.raises(ValueError):
+            eml_parser.aio.AsyncEmlParser(eml_parser.EmlParser(), include_raw_body=True)
+
+        with pytest.raises(ValueError):
+            eml_parser.aio.AsyncEmlParser(executor='fiber')
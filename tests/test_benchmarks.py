@@ -0,0 +1,57 @@
+import eml_parser
+from benchmarks import corpus
+from benchmarks import run
+
+
+class TestBenchmarks:
+    def test_corpus(self):
+        messages = corpus.generate(seed=1)
+
+        assert set(messages) == set(corpus.GENERATORS)
+        # the corpus only depends on the seed
+        assert messages == corpus.generate(seed=1)
+        assert messages != corpus.generate(seed=2)
+
+        ep = eml_parser.EmlParser()
+        parsed = ep.decode_email_bytes(messages['many_hops'])
+        assert len(parsed['header']['received']) == 60
+
+        parsed = ep.decode_email_bytes(messages['many_attachments'])
+        assert len(parsed['attachment']) == 200
+
+        parsed = ep.decode_email_bytes(messages['large_attachment'])
+        assert parsed['attachment'][0]['size'] == 8 * 1024 * 1024 + 4
+
+    def test_compare(self):
+        baseline = {'results': {'a': {'median_s': 1.0, 'peak_memory_bytes': 1000},
+                                'b': {'median_s': 1.0},
+                                }}
+        current = {'results': {'a': {'median_s': 1.05, 'peak_memory_bytes': 2000},
+                               'b': {'median_s': 1.5},
+                               'c': {'median_s': 1.0},
+                               }}
+
+        assert run.compare(current, baseline, threshold=0.1) == ['a: peak memory increased by 100.0%', 'b: time increased by 50.0%']
+        assert run.compare(current, baseline, threshold=1.0) == []
+
+    def test_scale_sample(self):
+        raw = corpus.scale_sample(size=4 * 1024 * 1024)
+        assert 3.5 * 1024 * 1024 < len(raw) < 4.5 * 1024 * 1024
+
+        parsed = eml_parser.EmlParser().decode_email_bytes(raw)
+        assert len(parsed['attachment']) == 1
+        assert parsed['attachment'][0]['size'] > 2.5 * 1024 * 1024
+
+    def test_file_scenarios(self, tmp_path):
+        scenarios = {x.name: x for x in run.build_scenarios(workdir=str(tmp_path), large_size=2 * 1024 * 1024)}
+
+        for name in ('decode_email.sample_large_scaled', 'decode_email_file_bytes.sample_large_scaled', 'decode_email.large_attachment'):
+            result = run.run_scenario(scenarios[name], repeat=1)
+            assert result['items'] == 1
+            assert result['peak_memory_bytes'] > 0
+
+        # decoding the whole corpus takes a while, thus only run those once
+        for name in ('decode_many.serial', 'decode_many.pool'):
+            assert scenarios[name].run() > 0
+
+        assert 'decode_email.sample_large_scaled' not in {x.name for x in run.build_scenarios()}
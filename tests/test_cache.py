@@ -0,0 +1,147 @@
+import datetime
+import pickle
+
+import pytest
+
+import eml_parser.cache
+
+
+class TestLRUCache:
+    def test_lru(self):
+        cache = eml_parser.cache.LRUCache(2)
+
+        cache.put('a', 1)
+        cache.put('b', 2)
+        assert cache.get('a') == 1
+        # 'b' is the least recently used entry now
+        cache.put('c', 3)
+
+        assert 'b' not in cache
+        assert cache.get('b', 'default') == 'default'
+        assert cache.get('a') == 1
+        assert cache.get('c') == 3
+        assert cache.info() == {'hits': 3, 'misses': 1, 'maxsize': 2, 'currsize': 2}
+
+        cache.clear()
+        assert cache.info() == {'hits': 0, 'misses': 0, 'maxsize': 2, 'currsize': 0}
+
+    def test_disabled(self):
+        cache = eml_parser.cache.LRUCache(0)
+        cache.put('a', 1)
+
+        assert len(cache) == 0
+        assert cache.get('a') is None
+
+        with pytest.raises(ValueError):
+            eml_parser.cache.LRUCache(-1)
+
+    def test_pickle(self):
+        cache = eml_parser.cache.LRUCache(10)
+        cache.put('a', 1)
+
+        restored = pickle.loads(pickle.dumps(cache))
+        assert restored.maxsize == 10
+        assert len(restored) == 0
+
+
+class TestCache:
+    def test_abstract(self):
+        class Incomplete(eml_parser.cache.Cache):
+            def get(self, key, default=None):
+                return default
+
+        with pytest.raises(TypeError):
+            Incomplete()
+
+
+class TestSQLiteCache:
+    def test_sqlite(self, tmp_path):
+        cache = eml_parser.cache.SQLiteCache(tmp_path / 'cache.db', maxsize=2)
+
+        cache.put('a', {'x': [1, 2]})
+        cache.put('b', 'b')
+        assert cache.get('a') == {'x': [1, 2]}
+        # the oldest entry is evicted, regardless of reads
+        cache.put('c', 3)
+
+        assert cache.get('a', 'default') == 'default'
+        assert cache.get('b') == 'b'
+        assert cache.get('c') == 3
+        assert cache.info() == {'hits': 3, 'misses': 1, 'errors': 0, 'maxsize': 2, 'currsize': 2, 'maxbytes': None, 'currbytes': 4}
+        assert cache.hit_rate() == 0.75
+
+        # another instance, e.g. in another process, uses the same database
+        other = pickle.loads(pickle.dumps(cache))
+        assert other.get('c') == 3
+        other.put('d', 4)
+        assert cache.get('d') == 4
+
+        cache.clear()
+        assert cache.info() == {'hits': 0, 'misses': 0, 'errors': 0, 'maxsize': 2, 'currsize': 0, 'maxbytes': None, 'currbytes': 0}
+        assert cache.hit_rate() == 0.0
+
+        with pytest.raises(ValueError):
+            eml_parser.cache.SQLiteCache(tmp_path / 'cache.db', maxsize=0)
+
+    def test_sqlite_overwrite(self, tmp_path):
+        cache = eml_parser.cache.SQLiteCache(tmp_path / 'cache.db', maxsize=10)
+
+        # replacing entries leaves gaps in the rowids, which must not lead to evicting too many entries
+        for i in range(100):
+            cache.put('key{}'.format(i % 15), i)
+            assert len(cache) == min(i + 1, 10)
+
+        assert [cache.get('key{}'.format(i % 15)) for i in range(90, 100)] == list(range(90, 100))
+
+    def test_memory(self, tmp_path):
+        cache = eml_parser.cache.SQLiteCache(tmp_path / 'cache.db', memory_size=10)
+        cache.put('a', 1)
+        cache.close()
+
+        # served from memory, without a connection to the database
+        cache.path = str(tmp_path / 'does_not_exist' / 'cache.db')
+        assert cache.get('a') == 1
+        assert cache.get('b') is None
+        assert cache.hits == 1
+        assert cache.errors == 1
+
+    def test_maxbytes(self, tmp_path):
+        cache = eml_parser.cache.SQLiteCache(tmp_path / 'cache.db', maxbytes=25)
+
+        cache.put('a', 'a' * 8)
+        cache.put('b', 'b' * 8)
+        assert cache.info()['currbytes'] == 20
+        # replacing an entry does not count twice
+        cache.put('b', 'b' * 8)
+        assert cache.info()['currbytes'] == 20
+
+        cache.put('c', 'c' * 8)
+        assert cache.get('a') is None
+        assert cache.get('b') == 'b' * 8
+        assert cache.info()['currbytes'] == 20
+
+        # too large to be cached at all
+        cache.put('d', 'd' * 30)
+        assert cache.get('d') is None
+        assert cache.info()['currsize'] == 2
+
+    def test_values(self, tmp_path):
+        value = {'date': datetime.datetime(2020, 1, 2, 3, 4, 5, tzinfo=datetime.timezone(datetime.timedelta(hours=2))),
+                 'raw': b'dGVzdA==',
+                 'nested': [{'__other__': 1}],
+                 # data looking like serialized datetimes and bytes, e.g. header names of an e-mail
+                 'header': [{'__datetime__': ['hello']}, {'__bytes__': 'dGVzdA=='}, {'$type': 'datetime', 'value': '2020-01-01'}, {'$$x': {'$type': 1}}],
+                 }
+
+        eml_parser.cache.SQLiteCache(tmp_path / 'cache.db').put('a', value)
+        assert eml_parser.cache.SQLiteCache(tmp_path / 'cache.db').get('a') == value
+
+    def test_invalid_value(self, tmp_path):
+        cache = eml_parser.cache.SQLiteCache(tmp_path / 'cache.db')
+        cache.put('a', {'date': datetime.datetime(2020, 1, 2)})
+        cache._connection().execute('UPDATE cache SET value = ?', ('{"date":{"$type":"datetime","value":1}}',))
+
+        # handled as a miss
+        assert cache.get('a', 'default') == 'default'
+        assert cache.info()['misses'] == 1
+        assert cache.info()['errors'] == 1
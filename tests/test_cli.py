@@ -0,0 +1,88 @@
+import base64
+import hashlib
+import json
+import pathlib
+import shutil
+
+import eml_parser
+import eml_parser.cli
+
+my_execution_dir = pathlib.Path(__file__).resolve().parent
+parent_dir = my_execution_dir.parent
+samples_dir = pathlib.Path(parent_dir, 'samples')
+
+
+class TestCli:
+    def test_walk(self, tmp_path):
+        (tmp_path / 'b' / 'c').mkdir(parents=True)
+        for name in ('a.eml', 'b/b.eml', 'b/c/c.eml', 'b/c/c.txt', 'z.eml'):
+            (tmp_path / name).write_bytes(b'')
+
+        assert [x.relative_to(tmp_path).as_posix() for x in eml_parser.cli.walk(tmp_path, '*.eml')] == ['a.eml', 'z.eml', 'b/b.eml', 'b/c/c.eml']
+        assert len(list(eml_parser.cli.walk(tmp_path))) == 5
+
+    def test_ndjson(self, tmp_path, capsys):
+        shutil.copytree(str(samples_dir), str(tmp_path / 'dump' / 'sub'))
+        output = tmp_path / 'out.ndjson'
+        attachments = tmp_path / 'attachments'
+
+        assert eml_parser.cli.main(['--workers', '2', '--output', str(output), '--extract-attachments', str(attachments),
+                                    str(tmp_path / 'dump'), str(samples_dir / 'sample*.eml')]) == 0
+
+        results = [json.loads(x) for x in output.read_bytes().splitlines()]
+        samples = sorted(samples_dir.iterdir())
+        assert len(results) == len(samples) + len([x for x in samples if x.name.startswith('sample')])
+        assert {x['_source'] for x in results} >= {str(tmp_path / 'dump' / 'sub' / x.name) for x in samples}
+
+        ep = eml_parser.EmlParser(include_attachment_data=True)
+        for sample in samples:
+            for attachment in ep.decode_email(sample).get('attachment', []):
+                path = attachments / attachment['hash']['sha256'][:2] / attachment['hash']['sha256'][2:4] / attachment['hash']['sha256']
+                assert path.read_bytes() == base64.b64decode(attachment['raw'])
+                assert hashlib.sha256(path.read_bytes()).hexdigest() == attachment['hash']['sha256']
+
+        # the attachment data is only written to disk
+        assert all('raw' not in a for x in results for a in x.get('attachment', []))
+        assert 'e-mails parsed, 0 errors' in capsys.readouterr().err
+
+    def test_output_dir(self, tmp_path, caplog):
+        mbox = tmp_path / 'archive.mbox'
+        raw_email = pathlib.Path(samples_dir, 'sample.eml').read_bytes()
+        mbox.write_bytes(b'From a@example.com Sat Jan  1 00:00:00 2022\n' + raw_email + b'\n')
+
+        assert eml_parser.cli.main(['--workers', '1', '--output-dir', str(tmp_path / 'out'), '--mbox', str(mbox), str(tmp_path / 'missing.mbox')]) == 1
+
+        result = json.loads((tmp_path / 'out' / 'archive.mbox' / '0.json').read_bytes())
+        assert result['_source'] == '{}:0'.format(mbox)
+        assert result['header']['subject'] == 'Sample EML'
+
+        assert eml_parser.cli.main(['--workers', '1', '-q', str(tmp_path / 'missing.eml')]) == 1
+        assert 'FileNotFoundError' in caplog.text
+
+    def test_utc(self, tmp_path):
+        for args, expected in (([], '2013-04-14T21:08:35-05:00'), (['--utc'], '2013-04-15T02:08:35+00:00')):
+            output = tmp_path / 'out.ndjson'
+            assert eml_parser.cli.main(['--workers', '1', '-q', '--output', str(output), str(samples_dir / 'sample_mime.eml')] + args) == 0
+            assert json.loads(output.read_bytes())['header']['date'] == expected
+
+    def test_output_dir_collision(self, tmp_path, caplog):
+        for name in ('a', 'b'):
+            (tmp_path / name).mkdir()
+            shutil.copy(str(samples_dir / 'sample.eml'), str(tmp_path / name / 'x.eml'))
+
+        file_list = tmp_path / 'files.txt'
+        file_list.write_text('{}\n{}\n'.format(tmp_path / 'a' / 'x.eml', tmp_path / 'b' / 'x.eml'))
+
+        for args in ([str(tmp_path / 'a'), str(tmp_path / 'b')], ['--files-from', str(file_list)]):
+            caplog.clear()
+            output_dir = tmp_path / 'out'
+            assert eml_parser.cli.main(['--workers', '1', '-q', '--output-dir', str(output_dir)] + args) == 0
+
+            # both e-mails are parsed, the second one is written to a file with a unique name
+            assert json.loads((output_dir / 'x.eml.json').read_bytes())['_source'] == str(tmp_path / 'a' / 'x.eml')
+            renamed = [x for x in output_dir.iterdir() if x.name != 'x.eml.json']
+            assert len(renamed) == 1
+            assert renamed[0].name.startswith('x.eml.') and renamed[0].name.endswith('.json')
+            assert json.loads(renamed[0].read_bytes())['_source'] == str(tmp_path / 'b' / 'x.eml')
+            assert 'x.eml.json is already used' in caplog.text
+            shutil.rmtree(str(output_dir))
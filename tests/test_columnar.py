@@ -0,0 +1,74 @@
+import pathlib
+
+import pytest
+
+import eml_parser
+
+pa = pytest.importorskip('pyarrow')
+pq = pytest.importorskip('pyarrow.parquet')
+
+import eml_parser.columnar  # noqa: E402
+
+my_execution_dir = pathlib.Path(__file__).resolve().parent
+parent_dir = my_execution_dir.parent
+samples_dir = pathlib.Path(parent_dir, 'samples')
+
+
+def parse_samples() -> list:
+    ep = eml_parser.EmlParser(include_part_id=True)
+
+    return [(k.name, ep.decode_email(k)) for k in sorted(samples_dir.iterdir())]
+
+
+class TestColumnar:
+    def test_to_record_batches(self):
+        results = parse_samples()
+        batches = eml_parser.columnar.to_record_batches(results + [('broken', ValueError('test'))])
+
+        assert set(batches) == set(eml_parser.columnar.TABLES)
+        for table, batch in batches.items():
+            assert batch.schema.equals(eml_parser.columnar.SCHEMAS[table])
+
+        messages = batches['messages'].to_pylist()
+        assert [x['key'] for x in messages] == [k for k, _ in results]
+
+        for message, (_, parsed) in zip(messages, results):
+            assert message['subject'] == parsed['header']['subject']
+            assert message['date'] == parsed['header']['date']
+            assert message['body_count'] == len(parsed['body'])
+            assert message['attachment_count'] == len(parsed.get('attachment', []))
+
+        assert batches['received'].num_rows == sum(len(x['header'].get('received', [])) for _, x in results)
+        assert batches['bodies'].num_rows == sum(len(x['body']) for _, x in results)
+
+        key, parsed = [(k, x) for k, x in results if x.get('attachment')][0]
+        attachments = [x for x in batches['attachments'].to_pylist() if x['key'] == key]
+        assert len(attachments) == len(parsed['attachment'])
+        assert attachments[0]['sha256'] == parsed['attachment'][0]['hash']['sha256']
+        assert attachments[0]['size'] == parsed['attachment'][0]['size']
+        assert attachments[0]['part_id'] == parsed['attachment'][0]['part_id']
+
+        received = [x for x in batches['received'].to_pylist() if x['key'] == key]
+        assert [x['src'] for x in received] == [x['src'] for x in parsed['header'].get('received', [])]
+        assert [x['hop'] for x in received] == list(range(len(received)))
+
+    def test_to_record_batches_empty(self):
+        batches = eml_parser.columnar.to_record_batches([])
+
+        assert all(x.num_rows == 0 for x in batches.values())
+
+    def test_write_parquet(self, tmp_path):
+        results = parse_samples()
+
+        eml_parser.columnar.write_parquet(results, tmp_path, batch_size=3)
+
+        messages = pq.read_table(tmp_path / 'messages.parquet')
+        assert messages.column('key').to_pylist() == [k for k, _ in results]
+        assert pq.ParquetFile(tmp_path / 'messages.parquet').num_row_groups == -(-len(results) // 3)
+
+        batches = eml_parser.columnar.to_record_batches(results)
+        for table in eml_parser.columnar.TABLES:
+            assert pq.read_table(tmp_path / '{}.parquet'.format(table)).equals(pa.Table.from_batches([batches[table]]))
+
+        with pytest.raises(ValueError):
+            eml_parser.columnar.ParquetWriter(tmp_path, batch_size=0)
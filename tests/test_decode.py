@@ -1,6 +1,7 @@
 import os.path
 
 import dateutil.parser
+import pytest
 
 import eml_parser.decode
 import eml_parser.eml_parser
@@ -47,3 +48,55 @@ class TestDecode:
 
         for test in test_input:
             assert eml_parser.decode.robust_string2date(test) != default_date_date
+
+    def test_decode_string(self):
+        assert eml_parser.decode.decode_string(b'', None) == ''
+        assert eml_parser.decode.decode_string(b'plain ascii', None) == 'plain ascii'
+        assert eml_parser.decode.decode_string('Grüße aus Köln'.encode('utf-8'), None) == 'Grüße aus Köln'
+        assert eml_parser.decode.decode_string(b'\xef\xbb\xbfbom', None) == 'bom'
+        # a wrong hint is ignored
+        assert eml_parser.decode.decode_string('Grüße aus Köln'.encode('utf-8'), 'x-unknown') == 'Grüße aus Köln'
+
+        if eml_parser.decode.chardet is not None:
+            # 7-bit encodings must not be decoded as ascii
+            text = 'こんにちは世界、こんにちは世界'
+            assert eml_parser.decode.decode_string(text.encode('iso-2022-jp'), None) == text
+
+    def test_detect_charset(self):
+        if eml_parser.decode.chardet is None:
+            pytest.skip('chardet is not installed')
+
+        data = ('Привет, как дела? ' * 10000).encode('cp1251')
+        assert len(data) > eml_parser.decode.CHARSET_SAMPLE_SIZE
+
+        eml_parser.decode.charset_cache.clear()
+        info = eml_parser.decode.charset_detection_info()
+
+        assert eml_parser.decode.decode_string(data, None) == data.decode('cp1251')
+        assert eml_parser.decode.decode_string(data, None) == data.decode('cp1251')
+
+        new_info = eml_parser.decode.charset_detection_info()
+        assert new_info['detected'] == info['detected'] + 1
+        assert new_info['detect_time'] > info['detect_time']
+        assert new_info['cache']['hits'] == 1
+
+    def test_robust_string2date_formats(self):
+        test_input = {'Mon, 12 Jun 2017 22:25:19 +0200': '2017-06-12T22:25:19+02:00',
+                      'mon, 12 jun 2017 20:24:43 +0000 (utc)': '2017-06-12T20:24:43+00:00',
+                      '2 Jan 2018 08:00 -0430': '2018-01-02T08:00:00-04:30',
+                      'Tue, 2 Jan 2018 08:00:00 -0000': '2018-01-02T08:00:00+00:00',
+                      'Tue, 2 Jan 2018 08:00:00 GMT': '2018-01-02T08:00:00+00:00',
+                      # two digit year
+                      'Tue, 2 Jan 18 08:00:00 +0100': '2018-01-02T08:00:00+01:00',
+                      '12 Jun 2017 22:01:19.5933': '2017-06-12T22:01:19.593300+00:00',
+                      'Tue, 31 Feb 2018 08:00:00 +0000': '1970-01-01T00:00:00+00:00',
+                      'garbage': '1970-01-01T00:00:00+00:00',
+                      '': '1970-01-01T00:00:00+00:00',
+                      }
+
+        for test, expected in test_input.items():
+            assert eml_parser.decode.robust_string2date(test).isoformat() == expected
+            # cached
+            assert eml_parser.decode.robust_string2date(test).isoformat() == expected
+
+        assert eml_parser.decode.robust_string2date('') is eml_parser.decode.DEFAULT_DATE
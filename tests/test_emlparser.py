@@ -2,8 +2,10 @@
 # pylint: disable=line-too-long
 from __future__ import annotations
 
+import concurrent.futures
 import datetime
 import email.policy
+import io
 import email.utils
 import json
 import pathlib
@@ -13,7 +15,9 @@ from email.message import EmailMessage
 
 import pytest
 
+import eml_parser.cache
 import eml_parser.eml_parser
+import eml_parser.limits
 
 my_execution_dir = pathlib.Path(__file__).resolve().parent
 parent_dir = my_execution_dir.parent
@@ -113,6 +117,81 @@ class TestEMLParser:
 
         assert eml_parser.eml_parser.EmlParser.get_uri_ondata(test_urls) == expected_result
 
+    def test_get_iocs_ondata(self):
+        test_input = """Contact John.Doe@Example.com or visit http://www.example.com/a?b=c, https://8.8.8.8/x.
+        <a href="https://www.example2.com/index.html">click</a> (mail: test@example.org)
+        hosts: 8.8.4.4 192.168.1.1 2001:4860:4860::8888 fe80::1 1.2.3.999 ::1
+        """
+
+        iocs = eml_parser.eml_parser.EmlParser.get_iocs_ondata(test_input, whiteip=['8.8.4.4'])
+
+        assert iocs['uri'][:3] == ['http://www.example.com/a?b=c', 'https://8.8.8.8/x.', 'https://www.example2.com/index.html']
+        assert iocs['email'] == ['john.doe@example.com', 'test@example.org']
+        assert iocs['domain'] == ['example.com', 'www.example.com', 'www.example2.com', 'example.org']
+        assert iocs['ip'] == ['8.8.8.8', '2001:4860:4860::8888']
+
+        for iocs in (eml_parser.eml_parser.EmlParser.get_iocs_ondata(''),
+                     eml_parser.eml_parser.EmlParser.get_iocs_ondata('no indicators in here')):
+            assert iocs == {'uri': [], 'email': [], 'domain': [], 'ip': []}
+
+    def test_string_sliding_window_loop(self):
+        body = ' '.join('http://www.example{}.com/'.format(i) for i in range(1000)) + ' tail@example.com'
+
+        slices = list(eml_parser.eml_parser.EmlParser.string_sliding_window_loop(body, 500))
+        assert len(slices) > 1
+        # consecutive slices share exactly one whitespace character
+        assert slices[0] + ''.join(x[1:] for x in slices[1:]) == body
+
+        urls: typing.Dict[str, int] = {}
+        emails: typing.Dict[str, int] = {}
+        for body_slice in slices:
+            iocs = eml_parser.eml_parser.EmlParser.get_iocs_ondata(body_slice)
+            urls.update(dict.fromkeys(iocs['uri'], 1))
+            emails.update(dict.fromkeys(iocs['email'], 1))
+
+        whole = eml_parser.eml_parser.EmlParser.get_iocs_ondata(body)
+        assert len(urls) == 1000
+        assert list(urls) == whole['uri']
+        assert list(emails) == ['tail@example.com']
+
+        # minified HTML is cut at < and > instead of whitespace
+        body = '<p>' + '</p><p>'.join('<a href="http://www.example{0}.com/">mail@example{0}.com</a>'.format(i) for i in range(1000)) + '</p>'
+        slices = list(eml_parser.eml_parser.EmlParser.string_sliding_window_loop(body, 500, 100))
+        assert len(slices) > 1
+        assert slices[0] + ''.join(x[1:] for x in slices[1:]) == body
+
+        whole = eml_parser.eml_parser.EmlParser.get_iocs_ondata(body)
+        for key in ('uri', 'email', 'domain'):
+            found: typing.Dict[str, int] = {}
+            for body_slice in slices:
+                found.update(dict.fromkeys(eml_parser.eml_parser.EmlParser.get_iocs_ondata(body_slice)[key], 1))
+            assert list(found) == whole[key]
+            assert len(found) == 1000 if key != 'domain' else 2000
+
+        # runs longer than max_token_length which would have to be cut are scanned whole, not split into partial indicators
+        body = 'see ' + 'a' * 1500 + 'john.doe@example.com' + 'b' * 1500 + ' and jane.doe@example.org'
+        slices = list(eml_parser.eml_parser.EmlParser.string_sliding_window_loop(body, 1000, 100))
+        assert slices == ['see ', ' ' + 'a' * 1500 + 'john.doe@example.com' + 'b' * 1500 + ' ', ' and jane.doe@example.org']
+        assert list(eml_parser.eml_parser.EmlParser.string_sliding_window_loop('a' * 5000, 1000, 100)) == ['a' * 5000]
+
+    def test_string_sliding_window_loop_overlong_run(self):
+        urls = ['http://www.example{}.com/path'.format(i) for i in range(800)]
+        body = 'x ' * 30000 + ','.join(urls) + ' end'
+        whole = eml_parser.eml_parser.EmlParser.get_uri_ondata(body)
+        assert whole == urls[:1]
+
+        for window_size in (1000, 8192, 65536, 1000000):
+            found: typing.Dict[str, int] = {}
+            for body_slice in eml_parser.eml_parser.EmlParser.string_sliding_window_loop(body, window_size):
+                found.update(dict.fromkeys(eml_parser.eml_parser.EmlParser.get_uri_ondata(body_slice), 1))
+            assert list(found) == whole
+
+            ep = eml_parser.eml_parser.EmlParser(include_raw_body=True, body_window_size=window_size)
+            msg = EmailMessage()
+            msg.set_content(body)
+            parsed = ep.decode_email_bytes(msg.as_bytes())
+            assert parsed['body'][0]['uri'] == whole
+
     def test_headeremail2list_1(self):
         msg = EmailMessage()
         msg['Subject'] = 'Test subject éèàöüä${}'
@@ -277,3 +356,330 @@ Lorem ipsüm dolor sit amét, consectetur 10$ + 5€ adipiscing elit. Praesent f
         test = ep.decode_email_bytes(raw_email)
 
         assert test['body'][0]['hash'] == '4c8b6a63156885b0ca0855b1d36816c54984e1eb6f68277b46b55b4777cfac89'
+
+    def test_decode_many(self):
+        """Decode all samples in a process pool and make sure the results match a serial run."""
+        ep = eml_parser.eml_parser.EmlParser()
+        samples = sorted(samples_dir.iterdir())
+        expected = [json.dumps(ep.decode_email(k), default=json_serial, sort_keys=True) for k in samples]
+
+        items: typing.List[typing.Any] = [k.read_bytes() for k in samples]
+        items[1] = samples[1]  # paths are supported as well
+        items.append(pathlib.Path(samples_dir, 'does_not_exist.eml'))
+
+        for workers in (1, 2):
+            for ordered in (True, False):
+                results = list(ep.decode_many(items, workers=workers, ordered=ordered, chunksize=2))
+
+                if ordered:
+                    assert [index for index, _ in results] == list(range(len(items)))
+
+                results = sorted(results, key=lambda x: x[0])
+
+                # errors are returned as values
+                assert isinstance(results[-1][1], FileNotFoundError)
+
+                for (_, result), good in zip(results, expected):
+                    assert json.dumps(result, default=json_serial, sort_keys=True) == good
+
+    def test_parser_isolation(self):
+        """Make sure parsers with different settings do not influence each other and a single
+        parser instance can be shared between threads."""
+        msg = EmailMessage()
+        msg['Subject'] = 'Test'
+        msg['From'] = Address("John Doe", "john.doe", "example")
+        msg['To'] = Address("Jane Doe", "jane.doe", "example.com")
+        msg.set_content('Please reply to test-reply@example.')
+        raw_email = msg.as_bytes()
+
+        ep_tld = eml_parser.eml_parser.EmlParser(email_force_tld=True, include_raw_body=True)
+        ep = eml_parser.eml_parser.EmlParser(include_raw_body=True)
+
+        assert 'email' not in ep_tld.decode_email_bytes(raw_email)['body'][0]
+        assert ep.decode_email_bytes(raw_email)['body'][0]['email'] == ['test-reply@example']
+        assert ep.msg is None
+
+        samples = [k.read_bytes() for k in sorted(samples_dir.iterdir())]
+        expected = [json.dumps(ep.decode_email_bytes(k), default=json_serial, sort_keys=True) for k in samples]
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(executor.map(ep.decode_email_bytes, samples * 4))
+
+        assert [json.dumps(k, default=json_serial, sort_keys=True) for k in results] == expected * 4
+
+    def test_decode_email_streaming(self, tmp_path):
+        """Make sure reading e-mails from files and file-like objects gives the same result as decoding the bytes."""
+        ep = eml_parser.eml_parser.EmlParser(include_raw_body=True, include_attachment_data=True)
+
+        for k in sorted(samples_dir.iterdir()):
+            raw_email = k.read_bytes()
+            expected = json.dumps(ep.decode_email_bytes(raw_email), default=str, sort_keys=True)
+
+            assert json.dumps(ep.decode_email(k), default=str, sort_keys=True) == expected
+            assert json.dumps(ep.decode_email_fileobj(io.BytesIO(raw_email)), default=str, sort_keys=True) == expected
+
+            # an invalid start of the file is skipped
+            bad_start = b'garbage\n\nmore garbage\n' + raw_email
+            path = tmp_path / k.name
+            path.write_bytes(bad_start)
+            assert json.dumps(ep.decode_email(path, ignore_bad_start=True), default=str, sort_keys=True) == expected
+            assert json.dumps(ep.decode_email_bytes(bad_start, ignore_bad_start=True), default=str, sort_keys=True) == expected
+            assert json.dumps(ep.decode_email_fileobj(io.BytesIO(bad_start), ignore_bad_start=True), default=str, sort_keys=True) == expected
+
+        empty = tmp_path / 'empty.eml'
+        empty.write_bytes(b'')
+        assert ep.decode_email(empty) == ep.decode_email_bytes(b'')
+
+    def test_parse_lazy(self):
+        ep = eml_parser.eml_parser.EmlParser(include_raw_body=True)
+
+        for k in sorted(samples_dir.iterdir()):
+            raw_email = k.read_bytes()
+            expected = json.dumps(ep.decode_email_bytes(raw_email), default=str, sort_keys=True)
+
+            parsed = ep.parse_lazy(raw_email)
+            assert json.dumps(parsed.to_dict(), default=str, sort_keys=True) == expected
+
+        parsed = ep.parse_lazy(pathlib.Path(samples_dir, 'sample_attachments.eml').read_bytes())
+        assert parsed.header['subject'] != ''
+        assert 'from' in parsed.header
+        # nothing else has been parsed yet
+        assert list(parsed._sections) == ['header']
+
+        assert sorted(x['filename'] for x in parsed.attachment) == ['document.pdf', 'test.csv', 'text.txt']
+        assert sorted(parsed._sections) == ['attachment', 'header']
+
+        ep = eml_parser.eml_parser.EmlParser(parse_attachments=False)
+        assert ep.parse_lazy(parsed.msg).attachment is None
+
+    def test_fields(self):
+        fields = {'header.from', 'header.subject', 'header.received_ip', 'body.uri', 'attachment.filename', 'attachment.hash.sha256'}
+        ep_full = eml_parser.eml_parser.EmlParser()
+        ep = eml_parser.eml_parser.EmlParser(fields=fields)
+
+        assert ep.hasher.algorithms == ('sha256',)
+
+        for k in sorted(samples_dir.iterdir()):
+            raw_email = k.read_bytes()
+            full = ep_full.decode_email_bytes(raw_email)
+            projected = ep.decode_email_bytes(raw_email)
+
+            assert set(projected['header']) <= {'from', 'subject', 'received_ip'}
+            assert projected['header']['subject'] == full['header']['subject']
+            assert projected['header'].get('received_ip') == full['header'].get('received_ip')
+            assert [x.get('uri') for x in projected['body']] == [x.get('uri') for x in full['body']]
+            assert all(set(x) <= {'uri'} for x in projected['body'])
+
+            if 'attachment' in full:
+                assert sorted((x['filename'], x['hash']) for x in projected['attachment']) == sorted((x['filename'], {'sha256': x['hash']['sha256']}) for x in full['attachment'])
+
+        ep = eml_parser.eml_parser.EmlParser(fields=['header.subject'])
+        parsed = ep.parse_lazy(pathlib.Path(samples_dir, 'sample_attachments.eml').read_bytes())
+        assert list(parsed.to_dict()) == ['header']
+        # body, attachments and received header fields have not been parsed
+        assert list(parsed._sections) == ['header']
+        assert 'header' not in parsed.header
+
+        with pytest.raises(ValueError):
+            eml_parser.eml_parser.EmlParser(fields=['subject'])
+
+    def test_include_part_id(self):
+        ep = eml_parser.eml_parser.EmlParser(include_part_id=True)
+        raw_email = pathlib.Path(samples_dir, 'sample_attachments.eml').read_bytes()
+
+        parsed = ep.decode_email_bytes(raw_email)
+        # the result is reproducible
+        assert json.dumps(parsed, default=str) == json.dumps(ep.decode_email_bytes(raw_email), default=str)
+
+        part_ids = [x['part_id'] for x in parsed['body'] + parsed['attachment']]
+        assert [x.split(':')[0] for x in part_ids] == ['1.1', '1.2', '2', '3', '4']
+        assert parsed['attachment'][0]['part_id'] == '2:' + parsed['attachment'][0]['hash']['sha256'][:16]
+        assert parsed['body'][0]['part_id'] == '1.1:' + parsed['body'][0]['hash'][:16]
+
+        assert 'part_id' not in eml_parser.eml_parser.EmlParser().decode_email_bytes(raw_email)['body'][0]
+
+        # the part ID does not depend on the hash algorithms used for attachments
+        ep = eml_parser.eml_parser.EmlParser(include_part_id=True, hash_algorithms=['md5'])
+        assert [x['part_id'] for x in ep.decode_email_bytes(raw_email)['attachment']] == part_ids[2:]
+
+        # attachments which are not hashed, due to the limits or the selected fields, still get their part ID
+        ep = eml_parser.eml_parser.EmlParser(include_part_id=True, limits={'max_attachments_hashed': 1})
+        attachments = ep.decode_email_bytes(raw_email)['attachment']
+        assert [x['part_id'] for x in attachments] == part_ids[2:]
+        assert 'hash' not in attachments[1]
+
+        ep = eml_parser.eml_parser.EmlParser(include_part_id=True, fields=['attachment.filename', 'attachment.part_id'])
+        assert [x['part_id'] for x in ep.decode_email_bytes(raw_email)['attachment']] == part_ids[2:]
+
+    def test_stats(self):
+        raw_email = pathlib.Path(samples_dir, 'sample_attachments.eml').read_bytes()
+        collected: typing.List[dict] = []
+
+        ep = eml_parser.eml_parser.EmlParser(include_stats=True, stats_callback=collected.append)
+        parsed = ep.decode_email_bytes(raw_email)
+        stats = parsed.pop('_stats')
+
+        assert collected == [stats]
+        # the statistics do not change the result
+        assert json.dumps(parsed, default=str) == json.dumps(eml_parser.eml_parser.EmlParser().decode_email_bytes(raw_email), default=str)
+
+        assert set(stats['stages']) == {'mime_parse', 'header', 'header_fields', 'received', 'body', 'body.decode', 'body.iocs', 'body.hash',
+                                        'attachment', 'attachment.hash', 'attachment.mime'}
+        assert stats['stages']['attachment.hash']['calls'] == 3
+        assert stats['stages']['body']['wall'] >= stats['stages']['body.iocs']['wall']
+        assert stats['total']['wall'] >= stats['stages']['mime_parse']['wall'] + stats['stages']['attachment']['wall']
+        assert stats['counters'] == {'raw_bytes': len(raw_email), 'parts': 7, 'bodies': 2, 'body_chars': 60, 'attachments': 3, 'attachment_bytes': 10228}
+
+        # only sections which have been parsed show up in the statistics of a lazily parsed e-mail
+        lazy = ep.parse_lazy(raw_email)
+        assert lazy.header
+        assert set(lazy.stats['stages']) == {'mime_parse', 'header', 'header_fields'}
+        assert len(collected) == 1
+
+        # the callback is called once the statistics are complete, also for e-mails decoded in worker processes
+        ep = eml_parser.eml_parser.EmlParser(stats_callback=collected.append)
+        results = list(ep.decode_many([raw_email, raw_email], workers=2))
+        assert all('_stats' not in x for _, x in results)
+        assert len(collected) == 3
+        assert collected[-1]['counters'] == stats['counters']
+
+        assert eml_parser.eml_parser.EmlParser().parse_lazy(raw_email).stats is None
+
+    def test_limits(self):
+        raw_email = pathlib.Path(samples_dir, 'sample_attachments.eml').read_bytes()
+        full = eml_parser.eml_parser.EmlParser().decode_email_bytes(raw_email)
+        assert 'truncated' not in full
+        # the instance shared by parsers without limits does not keep track of anything
+        assert eml_parser.limits.NO_LIMITS._attachments_hashed == 0
+        assert eml_parser.limits.NO_LIMITS._body_scanned == 0
+        assert not eml_parser.limits.NO_LIMITS.hit
+
+        ep = eml_parser.eml_parser.EmlParser(limits={'max_attachments_hashed': 1, 'max_raw_size': None})
+        parsed = ep.decode_email_bytes(raw_email)
+        assert parsed['truncated'] is True
+        assert parsed['limits_hit'] == ['max_attachments_hashed']
+        assert [x['hash'] for x in parsed['attachment'] if 'hash' in x] == [full['attachment'][0]['hash']]
+
+        ep = eml_parser.eml_parser.EmlParser(limits={'max_parts': 3})
+        parsed = ep.decode_email_bytes(raw_email)
+        assert parsed['limits_hit'] == ['max_parts']
+        # the multipart container, its first part, and the text body it contains
+        assert len(parsed['body']) == 1
+        assert 'attachment' not in parsed
+
+        ep = eml_parser.eml_parser.EmlParser(limits={'max_depth': 1, 'max_headers': 2})
+        parsed = ep.decode_email_bytes(raw_email)
+        assert parsed['limits_hit'] == ['max_depth', 'max_headers']
+        assert len(parsed['body']) == 0
+        assert len(parsed['attachment']) == 3
+        assert sum(len(x) for x in parsed['header']['header'].values()) == 2
+
+        ep = eml_parser.eml_parser.EmlParser(limits={'max_body_scan_bytes': 0})
+        parsed = ep.decode_email_bytes(raw_email)
+        assert parsed['limits_hit'] == ['max_body_scan_bytes']
+        assert [x['hash'] for x in parsed['body']] == [x['hash'] for x in full['body']]
+
+        ep = eml_parser.eml_parser.EmlParser(limits={'max_raw_size': 1000})
+        for parsed in (ep.decode_email_bytes(raw_email), ep.decode_email_fileobj(io.BytesIO(raw_email)),
+                       ep.decode_email(pathlib.Path(samples_dir, 'sample_attachments.eml'))):
+            assert parsed['limits_hit'] == ['max_raw_size']
+            assert parsed['header']['subject'] == full['header']['subject']
+
+        ep = eml_parser.eml_parser.EmlParser(limits={'time_budget': 1e-9})
+        parsed = ep.decode_email_bytes(raw_email)
+        assert parsed['limits_hit'] == ['time_budget']
+        assert 'attachment' not in parsed
+
+        with pytest.raises(ValueError):
+            eml_parser.eml_parser.EmlParser(limits={'max_size': 10})
+
+        with pytest.raises(ValueError):
+            eml_parser.eml_parser.EmlParser(limits={'max_parts': -1})
+
+    def test_body_scan_limit(self):
+        msg = EmailMessage()
+        msg['From'] = 'a@example.com'
+        msg['Subject'] = 'URLs'
+        msg.set_content(' '.join('https://host{}.example.com/page'.format(i) for i in range(2000)))
+        raw_email = msg.as_bytes()
+
+        parsed = eml_parser.eml_parser.EmlParser(include_raw_body=True, limits={'max_body_scan_bytes': 10000}).decode_email_bytes(raw_email)
+        assert parsed['limits_hit'] == ['max_body_scan_bytes']
+
+        # the URLs within the first 10000 characters are found, none of them cut off
+        body = parsed['body'][0]
+        expected = [x for x in body['content'][:10000].rsplit(None, 1)[0].split() if x.startswith('https://')]
+        assert body['uri'] == expected
+        assert len(expected) > 300
+
+    def test_attachment_cache(self, tmp_path):
+        raw_email = pathlib.Path(samples_dir, 'sample_attachments.eml').read_bytes()
+        expected = json.dumps(eml_parser.eml_parser.EmlParser(include_part_id=True).decode_email_bytes(raw_email), default=json_serial, sort_keys=True)
+
+        for cache in (eml_parser.cache.LRUCache(16), eml_parser.cache.SQLiteCache(tmp_path / 'cache.db', memory_size=4)):
+            ep = eml_parser.eml_parser.EmlParser(include_part_id=True, attachment_cache=cache)
+
+            for _ in range(2):
+                parsed = ep.decode_email_bytes(raw_email)
+                assert json.dumps(parsed, default=json_serial, sort_keys=True) == expected
+
+            attachments = len(parsed['attachment'])
+            assert cache.info()['hits'] == attachments
+            assert cache.info()['misses'] == attachments
+
+            # results do not share state with the cache
+            parsed['attachment'][0]['hash']['md5'] = 'changed'
+            assert ep.decode_email_bytes(raw_email)['attachment'][0]['hash']['md5'] != 'changed'
+
+        # the cache is shared between worker processes, entries of parsers computing other hashes are not used
+        cache = eml_parser.cache.SQLiteCache(tmp_path / 'cache.db')
+        ep = eml_parser.eml_parser.EmlParser(attachment_cache=cache, hash_algorithms=('sha256',))
+        results = [x for _, x in ep.decode_many([raw_email] * 4, workers=2)]
+        assert all(list(a['hash']) == ['sha256'] for x in results for a in x['attachment'])
+        assert cache.info()['currsize'] == 2 * attachments
+
+    def test_result_cache(self, tmp_path):
+        raw_email = pathlib.Path(samples_dir, 'sample_attachments.eml').read_bytes()
+        expected = json.dumps(eml_parser.eml_parser.EmlParser(include_attachment_data=True).decode_email_bytes(raw_email), default=json_serial, sort_keys=True)
+
+        for cache in (eml_parser.cache.LRUCache(16), eml_parser.cache.SQLiteCache(tmp_path / 'cache.db')):
+            ep = eml_parser.eml_parser.EmlParser(include_attachment_data=True, result_cache=cache)
+
+            results = [ep.decode_email_bytes(raw_email), ep.decode_email_bytes(raw_email),
+                       ep.decode_email(pathlib.Path(samples_dir, 'sample_attachments.eml'))]
+            assert all(json.dumps(x, default=json_serial, sort_keys=True) == expected for x in results)
+            assert cache.info()['hits'] == 2
+            assert cache.hit_rate() == 2 / 3
+
+            # results do not share state with the cache
+            results[1]['header']['subject'] = 'changed'
+            assert ep.decode_email_bytes(raw_email)['header']['subject'] != 'changed'
+
+        # differently configured parsers do not use each other's results
+        cache = eml_parser.cache.LRUCache(16)
+        assert 'raw' in eml_parser.eml_parser.EmlParser(include_attachment_data=True, result_cache=cache).decode_email_bytes(raw_email)['attachment'][0]
+        assert 'raw' not in eml_parser.eml_parser.EmlParser(result_cache=cache).decode_email_bytes(raw_email)['attachment'][0]
+        assert len(cache) == 2
+
+        collected: typing.List[dict] = []
+        ep = eml_parser.eml_parser.EmlParser(include_stats=True, stats_callback=collected.append, result_cache=eml_parser.cache.LRUCache(16))
+        first = ep.decode_email_bytes(raw_email)
+        second = ep.decode_email_bytes(raw_email)
+        assert first['_stats']['counters']['result_cache_misses'] == 1
+        assert second['_stats']['counters'] == {'result_cache_hits': 1}
+        assert [x['counters'] for x in collected] == [first['_stats']['counters'], second['_stats']['counters']]
+
+        # header fields looking like serialized datetimes are restored as they were
+        raw_email = (b'From: john.doe@example.com\nContent-Type: multipart/mixed; boundary="b"\n\n'
+                     b'--b\nContent-Type: text/plain\n\nHello\n--b\n__datetime__: hello\n\nWorld\n--b--\n')
+        ep = eml_parser.eml_parser.EmlParser(result_cache=eml_parser.cache.SQLiteCache(tmp_path / 'headers.db'))
+        first = ep.decode_email_bytes(raw_email)
+        assert first['body'][1]['content_header'] == {'__datetime__': ['hello']}
+        assert ep.decode_email_bytes(raw_email) == first
+        assert ep.result_cache.info()['hits'] == 1
+
+        # truncated results are cached, unless the time budget was hit
+        cache = eml_parser.cache.LRUCache(16)
+        eml_parser.eml_parser.EmlParser(limits={'max_parts': 3}, result_cache=cache).decode_email_bytes(raw_email)
+        eml_parser.eml_parser.EmlParser(limits={'time_budget': 1e-9}, result_cache=cache).decode_email_bytes(raw_email)
+        assert len(cache) == 1
@@ -0,0 +1,73 @@
+import datetime
+import io
+import json
+import pathlib
+
+import pytest
+
+import eml_parser
+import eml_parser.export
+
+my_execution_dir = pathlib.Path(__file__).resolve().parent
+parent_dir = my_execution_dir.parent
+samples_dir = pathlib.Path(parent_dir, 'samples')
+
+
+def parse_samples() -> list:
+    ep = eml_parser.EmlParser(include_raw_body=True, include_attachment_data=True)
+
+    return [ep.decode_email(k) for k in sorted(samples_dir.iterdir())]
+
+
+class TestExport:
+    def test_export_ndjson(self):
+        parsed = parse_samples()
+
+        fp = io.BytesIO()
+        assert eml_parser.export.export_ndjson(parsed, fp, backend='json') == len(parsed)
+
+        lines = fp.getvalue().split(b'\n')
+        assert lines[-1] == b''
+        assert len(lines) == len(parsed) + 1
+
+        for line, msg in zip(lines, parsed):
+            assert line.startswith(b'{"')
+            assert json.loads(line) == json.loads(json.dumps(msg, default=lambda x: eml_parser.export.json_default(x, utc=False)))
+
+        with_attachments = json.loads(lines[[i for i, x in enumerate(parsed) if 'attachment' in x][0]])
+        assert isinstance(with_attachments['attachment'][0]['raw'], str)
+
+    def test_json_default(self):
+        date = datetime.datetime(2020, 1, 1, 12, 0, tzinfo=datetime.timezone(datetime.timedelta(hours=2)))
+
+        assert eml_parser.export.json_default(date) == '2020-01-01T10:00:00+00:00'
+        assert eml_parser.export.json_default(date, utc=False) == '2020-01-01T12:00:00+02:00'
+        assert eml_parser.export.json_default(b'YWJj') == 'YWJj'
+
+        with pytest.raises(TypeError):
+            eml_parser.export.json_default(object())
+
+        with pytest.raises(ValueError):
+            eml_parser.export.NDJSONWriter(io.BytesIO(), backend='ujson')
+
+    def test_orjson_backend(self):
+        pytest.importorskip('orjson')
+        parsed = parse_samples()
+
+        for utc in (False, True):
+            outputs = []
+            for backend in eml_parser.export.BACKENDS:
+                fp = io.BytesIO()
+                writer = eml_parser.export.NDJSONWriter(fp, sort_keys=True, backend=backend, utc=utc)
+                writer.write_many(parsed)
+                assert writer.count == len(parsed)
+                outputs.append(fp.getvalue())
+
+            # both backends produce the same output
+            assert outputs[0] == outputs[1]
+
+        date = datetime.datetime(2020, 1, 1, 12, 0, 0, 5, tzinfo=datetime.timezone(datetime.timedelta(hours=-5)))
+        for backend in eml_parser.export.BACKENDS:
+            fp = io.BytesIO()
+            eml_parser.export.export_ndjson([{'date': date}], fp, backend=backend)
+            assert fp.getvalue() == b'{"date":"2020-01-01T12:00:00.000005-05:00"}\n'
@@ -0,0 +1,67 @@
+import email.message
+import hashlib
+import os
+import pathlib
+
+import pytest
+
+import eml_parser.eml_parser
+import eml_parser.hashing
+
+my_execution_dir = pathlib.Path(__file__).resolve().parent
+parent_dir = my_execution_dir.parent
+samples_dir = pathlib.Path(parent_dir, 'samples')
+
+
+class TestHashing:
+    def test_hash_bytes(self):
+        data = bytes(range(256)) * 4099  # not a multiple of the chunk size
+
+        assert eml_parser.hashing.hash_bytes(data) == {k: hashlib.new(k, data).hexdigest() for k in ('md5', 'sha1', 'sha256', 'sha512')}
+        assert eml_parser.hashing.hash_bytes(b'', ['sha256']) == {'sha256': hashlib.sha256(b'').hexdigest()}
+
+    def test_hash_text(self):
+        text = 'Lorem ipsüm dolor sit amét, 5€ ' * 20000
+
+        assert eml_parser.hashing.hash_text(text) == hashlib.sha256(text.encode('utf-8')).hexdigest()
+        assert eml_parser.hashing.hash_text('', 'md5') == hashlib.md5(b'').hexdigest()
+
+    def test_hasher(self):
+        data = b'a' * 1000
+        expected = {'sha1': hashlib.sha1(data).hexdigest(), 'sha256': hashlib.sha256(data).hexdigest()}
+
+        hasher = eml_parser.hashing.Hasher(['sha1', 'sha256'], thread_threshold=100)
+        assert hasher.hash(data) == expected
+        assert hasher.submit(data).result() == expected  # hashed in a worker thread
+        assert hasher.submit(data[:10]).result() == {k: hashlib.new(k, data[:10]).hexdigest() for k in expected}
+
+        with pytest.raises(ValueError):
+            eml_parser.hashing.Hasher(['no-such-hash'])
+
+    def test_parser_hash_algorithms(self):
+        raw_email = pathlib.Path(samples_dir, 'sample_attachments.eml').read_bytes()
+
+        ep_all = eml_parser.eml_parser.EmlParser()
+        ep = eml_parser.eml_parser.EmlParser(hash_algorithms=['sha256'])
+
+        for attachment, attachment_all in zip(ep.decode_email_bytes(raw_email)['attachment'],
+                                              ep_all.decode_email_bytes(raw_email)['attachment']):
+            assert attachment['hash'] == {'sha256': attachment_all['hash']['sha256']}
+
+    def test_hash_after_fork(self):
+        """Attachments hashed in the worker thread pool of the parent must not hang forked worker processes."""
+        data = os.urandom(2 * 1024 * 1024)
+
+        msg = email.message.EmailMessage()
+        msg['From'] = 'john.doe@example.com'
+        msg['Subject'] = 'large attachment'
+        msg.set_content('See attachment.')
+        msg.add_attachment(data, maintype='application', subtype='octet-stream', filename='large.bin')
+        raw_email = msg.as_bytes()
+
+        ep = eml_parser.eml_parser.EmlParser(hash_algorithms=['sha256'])
+        # creates the thread pool in this process
+        assert ep.decode_email_bytes(raw_email)['attachment'][0]['hash'] == {'sha256': hashlib.sha256(data).hexdigest()}
+
+        results = list(ep.decode_many([raw_email, raw_email], workers=2))
+        assert [x['attachment'][0]['hash']['sha256'] for _, x in results] == [hashlib.sha256(data).hexdigest()] * 2
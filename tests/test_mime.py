@@ -0,0 +1,89 @@
+import base64
+import concurrent.futures
+import io
+import pathlib
+import pickle
+import struct
+import zipfile
+
+import pytest
+
+import eml_parser.eml_parser
+import eml_parser.mime
+
+my_execution_dir = pathlib.Path(__file__).resolve().parent
+parent_dir = my_execution_dir.parent
+samples_dir = pathlib.Path(parent_dir, 'samples')
+
+
+def _ooxml(part: str) -> bytes:
+    fp = io.BytesIO()
+    with zipfile.ZipFile(fp, 'w') as zf:
+        zf.writestr('[Content_Types].xml', '<Types/>')
+        zf.writestr(part, '<document/>')
+
+    return fp.getvalue()
+
+
+class TestMime:
+    def test_detect_signature(self):
+        pe = bytearray(512)
+        pe[:2] = b'MZ'
+        pe[0x3c:0x40] = struct.pack('<I', 0x80)
+        pe[0x80:0x84] = b'PE\x00\x00'
+        pe[0x80 + 22:0x80 + 24] = struct.pack('<H', 0x2000)
+        pe[0x80 + 24:0x80 + 26] = struct.pack('<H', 0x20b)
+
+        elf = b'\x7fELF\x02\x01\x01' + b'\x00' * 9 + struct.pack('<H', 3) + b'\x00' * 46
+
+        test_input = {b'%PDF-1.5\n%...': ('PDF document, version 1.5', 'application/pdf'),
+                      b'\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR': ('PNG image data', 'image/png'),
+                      b'\xff\xd8\xff\xe0\x00\x10JFIF': ('JPEG image data', 'image/jpeg'),
+                      b'GIF89a\x01\x00': ('GIF image data, version 89a', 'image/gif'),
+                      b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1' + b'\x00' * 16: ('Composite Document File V2 Document', 'application/CDFV2'),
+                      _ooxml('word/document.xml'): ('Microsoft Word 2007+', 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'),
+                      _ooxml('xl/workbook.xml'): ('Microsoft Excel 2007+', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+                      _ooxml('other.xml'): ('Zip archive data', 'application/zip'),
+                      elf: ('ELF 64-bit LSB', 'application/x-sharedlib'),
+                      bytes(pe): ('PE32+ executable (DLL)', 'application/vnd.microsoft.portable-executable'),
+                      }
+
+        for data, expected in test_input.items():
+            assert eml_parser.mime.detect_signature(data) == expected
+            assert eml_parser.mime.MimeDetector(signatures=True).detect(data) == expected
+
+        assert eml_parser.mime.detect_signature(b'plain text') is None
+
+        # text starting with "MZ" and MS-DOS headers without a (complete) PE header are left to libmagic
+        assert eml_parser.mime.detect_signature(b'MZ is the code of Mizoram, ' * 10) is None
+        assert eml_parser.mime.detect_signature(bytes(pe[:0x90])) is None
+        no_pe = bytearray(pe)
+        no_pe[0x3c:0x40] = struct.pack('<I', 0xffffff00)
+        assert eml_parser.mime.detect_signature(bytes(no_pe)) is None
+
+    def test_mime_detector(self):
+        if eml_parser.mime.magic is None:
+            pytest.skip('file-magic is not installed')
+
+        ep = eml_parser.eml_parser.EmlParser(include_attachment_data=True)
+        parsed = ep.decode_email_bytes(pathlib.Path(samples_dir, 'sample_attachments.eml').read_bytes())
+        assert parsed['attachment']
+
+        detector = eml_parser.mime.MimeDetector()
+        for attachment in parsed['attachment']:
+            data = base64.b64decode(attachment['raw'])
+            detected = eml_parser.mime.magic.detect_from_content(data)
+
+            assert detector.detect(data) == (detected.name, detected.mime_type)
+            assert (attachment['mime_type'], attachment['mime_type_short']) == (detected.name, detected.mime_type)
+
+        # handles are created per thread
+        with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(executor.map(detector.detect, [b'%PDF-1.5\n'] * 8))
+        assert len(set(results)) == 1
+
+        restored = pickle.loads(pickle.dumps(eml_parser.mime.MimeDetector(1024, signatures=True)))
+        assert (restored.prefix_size, restored.signatures) == (1024, True)
+
+        with pytest.raises(ValueError):
+            eml_parser.mime.MimeDetector(0)
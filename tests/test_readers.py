@@ -0,0 +1,112 @@
+import mailbox
+import pathlib
+
+import eml_parser
+import eml_parser.readers
+
+my_execution_dir = pathlib.Path(__file__).resolve().parent
+parent_dir = my_execution_dir.parent
+samples_dir = pathlib.Path(parent_dir, 'samples')
+
+
+def create_mbox(path: pathlib.Path) -> list:
+    box = mailbox.mbox(str(path))
+    samples = []
+
+    for k in sorted(samples_dir.iterdir()):
+        raw_email = k.read_bytes()
+        box.add(raw_email)
+        samples.append(raw_email)
+
+    box.flush()
+    box.close()
+
+    return samples
+
+
+class TestReaders:
+    def test_iter_mbox(self, tmp_path):
+        path = tmp_path / 'test.mbox'
+        create_mbox(path)
+        raw_mbox = path.read_bytes()
+
+        expected = [x.as_bytes() for x in mailbox.mbox(str(path))]
+        messages = list(eml_parser.readers.iter_mbox(path))
+
+        assert len(messages) == len(expected)
+        for (offset, raw_email), good in zip(messages, expected):
+            assert raw_mbox[offset:offset + 5] == b'From '
+            assert eml_parser.EmlParser().decode_email_bytes(raw_email)['header']['subject'] == eml_parser.EmlParser().decode_email_bytes(good)['header']['subject']
+
+        # resume at an offset, or after it
+        assert list(eml_parser.readers.iter_mbox(path, offset=messages[3][0])) == messages[3:]
+        assert list(eml_parser.readers.iter_mbox(path, offset=messages[3][0] + 1)) == messages[4:]
+        assert list(eml_parser.readers.iter_mbox(path, offset=len(raw_mbox))) == []
+
+        empty = tmp_path / 'empty.mbox'
+        empty.write_bytes(b'')
+        assert list(eml_parser.readers.iter_mbox(empty)) == []
+
+    def test_iter_mbox_mboxrd(self, tmp_path):
+        path = tmp_path / 'test.mbox'
+        path.write_bytes(b'From a@example.com Mon Jan  1 00:00:00 2024\nSubject: a\n\n>From here\n>>From there\n\n'
+                         b'From b@example.com Mon Jan  1 00:00:00 2024\r\nSubject: b\r\n\r\nbody\r\n')
+
+        assert list(eml_parser.readers.iter_mbox(path)) == [(0, b'Subject: a\n\n>From here\n>>From there\n'),
+                                                            (path.read_bytes().index(b'From b@'), b'Subject: b\r\n\r\nbody\r\n')]
+        assert list(eml_parser.readers.iter_mbox(path, mboxrd=True))[0] == (0, b'Subject: a\n\nFrom here\n>From there\n')
+
+    def test_iter_maildir(self, tmp_path):
+        box = mailbox.Maildir(str(tmp_path / 'maildir'))
+        folder = box.add_folder('archive')
+        samples = sorted(samples_dir.iterdir())
+
+        for k in samples[:4]:
+            box.add(k.read_bytes())
+        folder.add(samples[4].read_bytes())
+
+        paths = list(eml_parser.readers.iter_maildir(tmp_path / 'maildir'))
+        assert len(paths) == 4
+        assert len(list(eml_parser.readers.iter_maildir(tmp_path / 'maildir', folders=True))) == 5
+
+        relative_path = paths[1].relative_to(tmp_path / 'maildir').as_posix()
+        assert list(eml_parser.readers.iter_maildir(tmp_path / 'maildir', start_after=relative_path)) == paths[2:]
+
+        # resume across Maildir++ folders, which are listed after the root folder
+        all_paths = list(eml_parser.readers.iter_maildir(tmp_path / 'maildir', folders=True))
+        assert all_paths[:4] == paths
+        assert all_paths[4].relative_to(tmp_path / 'maildir').as_posix().startswith('.archive/')
+
+        for index, path in enumerate(all_paths):
+            relative_path = path.relative_to(tmp_path / 'maildir').as_posix()
+            assert list(eml_parser.readers.iter_maildir(tmp_path / 'maildir', folders=True, start_after=relative_path)) == all_paths[index + 1:]
+
+        # the last processed e-mail may have been removed (or moved from new to cur)
+        assert list(eml_parser.readers.iter_maildir(tmp_path / 'maildir', folders=True, start_after='cur/0')) == all_paths
+        assert list(eml_parser.readers.iter_maildir(tmp_path / 'maildir', folders=True, start_after='new/~')) == all_paths[4:]
+        assert list(eml_parser.readers.iter_maildir(tmp_path / 'maildir', folders=True, start_after='.archive/new/~')) == []
+
+        results = dict(eml_parser.readers.decode_maildir(eml_parser.EmlParser(), tmp_path / 'maildir', workers=1))
+        assert sorted(results) == sorted(x.relative_to(tmp_path / 'maildir').as_posix() for x in paths)
+
+    def test_decode_mbox(self, tmp_path):
+        path = tmp_path / 'test.mbox'
+        create_mbox(path)
+
+        ep = eml_parser.EmlParser()
+        offsets = [offset for offset, _ in eml_parser.readers.iter_mbox(path)]
+        serial = list(eml_parser.readers.decode_mbox(ep, path, workers=1))
+        assert [offset for offset, _ in serial] == offsets
+
+        parallel = list(eml_parser.readers.decode_mbox(ep, path, workers=2, ordered=False, chunksize=3))
+        assert sorted(offset for offset, _ in parallel) == offsets
+        assert [x['header']['subject'] for _, x in sorted(parallel, key=lambda x: x[0])] == [x['header']['subject'] for _, x in serial]
+
+    def test_decode_keyed(self):
+        paths = sorted(samples_dir.iterdir())
+        items = [(path.name, path) for path in paths] + [('broken', b'')]
+
+        ep = eml_parser.EmlParser()
+        results = dict(eml_parser.readers.decode_keyed(ep, items, workers=2, ordered=False))
+        assert set(results) == {path.name for path in paths} | {'broken'}
+        assert results['sample_large.eml']['attachment'][0]['filename'] == 'lorem_ipsum.png'
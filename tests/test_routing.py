@@ -3,18 +3,26 @@ import os.path
 
 import eml_parser.eml_parser
 import eml_parser.routing
+from tests import legacy_routing
 
 my_execution_dir = os.path.dirname(os.path.realpath(__file__))
 parent_dir = os.path.split(my_execution_dir)[0]
 samples_dir = os.path.join(parent_dir, 'samples')
 
 
+def _sorted_routing(parsed_routing: dict) -> dict:
+    """Sort the lists of a parsed received line, as their order is not defined."""
+    return {k: sorted(v) if k in ('from', 'by', 'for') and isinstance(v, list) else v for k, v in parsed_routing.items()}
+
+
 class TestRouting:
     def test_noparenthesis(self):
         test_input = {'(test)': '',
                       '((test))': '',
                       '(((test) (bla)))': '',
                       '(test) foo': ' foo',
+                      '(a (b) c': '(a  c',
+                      'a) (b (c)) d': 'a)  d',
                       }
 
         for test, expected_result in test_input.items():
@@ -85,3 +93,42 @@ class TestRouting:
             # make sure all keys from generated output are also in the test case
             for k in test_output:
                 assert k in test[1]
+
+    def test_parserouting_cache(self):
+        ep = eml_parser.eml_parser.EmlParser()
+        ep_nocache = eml_parser.eml_parser.EmlParser(routing_cache_size=0)
+
+        with open(os.path.join(samples_dir, 'sample.eml'), 'rb') as fhdl:
+            raw_email = fhdl.read()
+
+        expected = ep_nocache.decode_email_bytes(raw_email)['header']['received']
+        assert ep.decode_email_bytes(raw_email)['header']['received'] == expected
+        misses = ep.routing_cache.info()['misses']
+        assert misses > 0
+
+        # the cached results must not be modified by the caller
+        assert ep.decode_email_bytes(raw_email)['header']['received'] == expected
+        assert ep.routing_cache.info()['hits'] == misses
+        assert ep.routing_cache.info()['misses'] == misses
+
+        line = 'from mx.example.com (mx.example.com [192.0.2.1]) by mail.example.org with esmtps id 1 for <jane@example.org>; tue, 1 jan 2019 10:00:00 +0000'
+        ep.parserouting(line)['from'].append('modified')
+        assert 'modified' not in ep.parserouting(line)['from']
+
+    def test_parserouting_legacy(self):
+        with open(os.path.join(my_execution_dir, 'received_lines.txt'), 'r', encoding='utf-8') as fhdl:
+            lines = fhdl.read().splitlines()
+
+        assert lines
+        for line in lines:
+            assert _sorted_routing(eml_parser.routing.parserouting(line)) == _sorted_routing(legacy_routing.legacy_parserouting(line))
+
+    def test_parserouting_comments(self):
+        # from/by/with/for words in comments or as part of a token are not field borders
+        line = 'from mx.example.com (helo from.example.com with esmtp) by x-by.example.org (envelope-from <a@example.com>) with esmtp for <b@example.org>; tue, 1 jan 2019 10:00:00 +0000'
+        test_output = eml_parser.routing.parserouting(line)
+
+        assert sorted(test_output['from']) == ['from.example.com', 'mx.example.com']
+        assert sorted(test_output['by']) == ['example.com', 'x-by.example.org']
+        assert test_output['with'] == 'esmtp'
+        assert test_output['for'] == ['b@example.org']
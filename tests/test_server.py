@@ -0,0 +1,145 @@
+import http.client
+import io
+import json
+import os
+import pathlib
+import signal
+import socket
+import threading
+
+import pytest
+
+import eml_parser
+import eml_parser.export
+import eml_parser.server
+
+my_execution_dir = pathlib.Path(__file__).resolve().parent
+parent_dir = my_execution_dir.parent
+samples_dir = pathlib.Path(parent_dir, 'samples')
+
+
+@pytest.fixture(scope='module')
+def server():
+    server = eml_parser.server.ParseServer(('127.0.0.1', 0), workers=2, max_request_size=1024 * 1024)
+    server.warm_up()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    yield server
+
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+def read_response(reader) -> tuple:
+    status = int(reader.readline().split()[1])
+    headers = {}
+
+    for line in iter(reader.readline, b'\r\n'):
+        name, value = line.decode('ascii').split(':', 1)
+        headers[name.lower()] = value.strip()
+
+    return status, reader.read(int(headers['content-length']))
+
+
+def expected_result(raw_email: bytes) -> dict:
+    return json.loads(eml_parser.export.NDJSONWriter(io.BytesIO(), backend='json').dumps(eml_parser.EmlParser().decode_email_bytes(raw_email)))
+
+
+class TestServer:
+    def test_parse(self, server):
+        raw_email = pathlib.Path(samples_dir, 'sample.eml').read_bytes()
+        conn = http.client.HTTPConnection(*server.server_address[:2])
+
+        # the connection is kept alive between requests
+        for _ in range(2):
+            conn.request('POST', '/parse', body=raw_email)
+            response = conn.getresponse()
+            assert response.status == 200
+            assert response.getheader('Content-Type') == 'application/json'
+            assert json.loads(response.read()) == expected_result(raw_email)
+
+        conn.request('GET', '/stats')
+        response = conn.getresponse()
+        stats = json.loads(response.read())
+        assert stats['parsed'] >= 2
+        assert stats['workers'] == 2
+        assert stats['in_flight'] == 0
+
+        conn.request('GET', '/nothing')
+        response = conn.getresponse()
+        assert response.status == 404
+        response.read()
+
+        conn.close()
+
+        # the body is not read if it is too large
+        with socket.create_connection(server.server_address[:2]) as sock:
+            sock.sendall(b'POST /parse HTTP/1.1\r\nHost: localhost\r\nContent-Length: %d\r\n\r\n' % (1024 * 1024 + 1))
+            status, body = read_response(sock.makefile('rb'))
+            assert status == 413
+            assert 'error' in json.loads(body)
+
+    def test_pipelining(self, server):
+        samples = [k.read_bytes() for k in sorted(samples_dir.iterdir())[:3]]
+        request = b''.join(b'POST /parse HTTP/1.1\r\nHost: localhost\r\nContent-Length: %d\r\n\r\n%s' % (len(k), k) for k in samples)
+
+        with socket.create_connection(server.server_address[:2]) as sock:
+            sock.sendall(request)
+            reader = sock.makefile('rb')
+
+            for raw_email in samples:
+                status, body = read_response(reader)
+                assert status == 200
+                assert json.loads(body) == expected_result(raw_email)
+
+    def test_unix_socket(self, tmp_path):
+        path = str(tmp_path / 'eml_parser.sock')
+        raw_email = pathlib.Path(samples_dir, 'sample.eml').read_bytes()
+        server = eml_parser.server.UnixParseServer(path, eml_parser.EmlParser(include_part_id=True), workers=1)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.connect(path)
+                sock.sendall(b'POST /parse HTTP/1.1\r\nHost: localhost\r\nContent-Length: %d\r\n\r\n%s' % (len(raw_email), raw_email))
+
+                status, body = read_response(sock.makefile('rb'))
+                assert status == 200
+                assert 'part_id' in json.loads(body)['body'][0]
+        finally:
+            server.shutdown()
+            server.server_close()
+            thread.join()
+
+        assert not pathlib.Path(path).exists()
+
+    def test_worker_killed(self):
+        raw_email = pathlib.Path(samples_dir, 'sample.eml').read_bytes()
+        server = eml_parser.server.ParseServer(('127.0.0.1', 0), workers=1)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+
+        try:
+            pid = server.executor.submit(eml_parser.server._warm_up_worker, 0).result()
+            os.kill(pid, signal.SIGKILL)
+
+            statuses = []
+            for _ in range(2):
+                connection = http.client.HTTPConnection(*server.server_address[:2])
+                connection.request('POST', '/parse', body=raw_email)
+                response = connection.getresponse()
+                statuses.append(response.status)
+                body = response.read()
+                connection.close()
+
+            # the request in flight fails as a server error, the next one is parsed by a new pool
+            assert statuses == [503, 200]
+            assert json.loads(body) == expected_result(raw_email)
+            assert server.stats.to_dict()['pool_restarts'] == 1
+        finally:
+            server.shutdown()
+            server.server_close()
+            thread.join()